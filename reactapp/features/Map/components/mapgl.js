@@ -37,6 +37,9 @@ const onMapLoad = (event) => {
   });
 };
 
+const CONUS_HYDROFABRIC_URL =
+  'pmtiles://https://communityhydrofabric.s3.us-east-1.amazonaws.com/map/merged.pmtiles';
+
 const MapComponent = () => {
   const { state: hydroFabricState, actions: hydroFabricActions } = useHydroFabricContext();
   const { state: modelRunsState } = useModelRunsContext();
@@ -52,6 +55,8 @@ const MapComponent = () => {
   const [catchmentsFilterIds, setCatchmentsFilterIds] = useState(null);
   const [flowPathsFilterIds, setFlowPathsFilterIds] = useState(null);
   const [nexusFilterIds, setNexusFilterIds] = useState(null);
+  // The run's own PMTiles archive when one was built, else the CONUS one.
+  const [hydrofabricUrl, setHydrofabricUrl] = useState(CONUS_HYDROFABRIC_URL);
 
   // Derived booleans from store
   const isClustered = hydroFabricState.nexus.geometry.clustered;
@@ -122,9 +127,20 @@ const MapComponent = () => {
     };
   }, [nexusFilterIds, theme]);
 
+  // Unclustered nexus points are drawn from the run's vector tiles, so the
+  // map only fetches the points in view; clustering needs every point
+  // client-side and uses the GeoJSON source.
+  const nexusTilesUrl = modelRunsState.base_model_id
+    ? appAPI.getVectorTileUrl(modelRunsState.base_model_id, 'nexus')
+    : null;
+
   // Memoized nexus layers
   const nexusLayers = useMemo(() => {
-    if (!nexusPoints || isNexusHidden) return null;
+    if (isNexusHidden || (isClustered && !nexusPoints)) return null;
+
+    const nexusSource = isClustered
+      ? { source: 'nexus-points' }
+      : { source: 'nexus-tiles', 'source-layer': 'nexus' };
 
     const baseLayers = [];
     const highlightLayer = (
@@ -132,7 +148,7 @@ const MapComponent = () => {
         key="nexus-highlight"
         id="nexus-highlight"
         type="circle"
-        source="nexus-points"
+        {...nexusSource}
         filter={selectedNexusId ? [
           'all',
           ['!', ['has', 'point_count']],
@@ -220,7 +236,7 @@ const MapComponent = () => {
           key="all-points"
           id="all-points"
           type="circle"
-          source="nexus-points"
+          {...nexusSource}
           paint={{
             'circle-color': theme === 'dark' ? '#4f5b67' : '#1f78b4',
             'circle-radius': 7,
@@ -243,7 +259,8 @@ const MapComponent = () => {
 
     if (!modelRunsState.base_model_id) return;
 
-    appAPI.getGeoSpatialData({ model_run_id: modelRunsState.base_model_id })
+    // The nexus GeoJSON is only fetched for the clustered view (see below).
+    appAPI.getGeoSpatialData({ model_run_id: modelRunsState.base_model_id, nexus: 'none' })
       .then((response) => {
         if (response.error) {
           toast.error("Error fetching Model Run Data", { autoClose: 1000 });
@@ -258,10 +275,14 @@ const MapComponent = () => {
         }
 
         toast.success("Successfully retrieved Model Run Data", { autoClose: 1000 });
-        setNexusPoints(response.nexus);
         setCatchmentsFilterIds(response.catchments);
         setFlowPathsFilterIds(response.flow_paths_ids);
         setNexusFilterIds(response.nexus_ids);
+        setHydrofabricUrl(
+          response.pmtiles
+            ? appAPI.getRunPMTilesUrl(modelRunsState.base_model_id)
+            : CONUS_HYDROFABRIC_URL
+        );
 
         if (response.bounds && mapRef.current) {
           mapRef.current.fitBounds(response.bounds, {
@@ -279,6 +300,25 @@ const MapComponent = () => {
     };
   }, [theme, modelRunsState.base_model_id]);
 
+  // Clustering needs every nexus point, so fetch the nexus GeoJSON only while it is on.
+  useEffect(() => {
+    setNexusPoints(null);
+    if (!modelRunsState.base_model_id || !isClustered) return;
+    let cancelled = false;
+
+    appAPI.getGeoSpatialData({ model_run_id: modelRunsState.base_model_id })
+      .then((response) => {
+        if (!cancelled && !response.error) setNexusPoints(response.nexus);
+      })
+      .catch((error) => {
+        console.error('Nexus data fetch failed:', error);
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [isClustered, modelRunsState.base_model_id]);
+
 
   // ------------------------------------
   // ON CLICK: update state based on clicked layer
@@ -320,7 +360,8 @@ const MapComponent = () => {
           hydroFabricActions.show_nexus_geometry();
         }
 
-        if (feature.properties.ngen_usgs !== 'none') {
+        // Tile features carry no gauge; NexusSelect then sets it from getNexusTimeSeries.
+        if (feature.properties.ngen_usgs && feature.properties.ngen_usgs !== 'none') {
           hydroFabricActions.set_teehr_id(feature.properties.ngen_usgs);
         }
         return;
@@ -373,9 +414,10 @@ const MapComponent = () => {
       onLoad={onMapLoad}
     >
       <Source
+        key={hydrofabricUrl}
         id="conus"
         type="vector"
-        url="pmtiles://https://communityhydrofabric.s3.us-east-1.amazonaws.com/map/merged.pmtiles"
+        url={hydrofabricUrl}
       >
         {catchmentConfig && <Layer {...catchmentConfig} />}
         {flowPathsConfig && <Layer {...flowPathsConfig} />}
@@ -397,7 +439,8 @@ const MapComponent = () => {
         />
       </Source>
 
-      <Source
+      {isClustered ? (
+        <Source
           key={`nexus-source-${isClustered}`}
           id="nexus-points"
           type="geojson"
@@ -408,6 +451,19 @@ const MapComponent = () => {
         >
           {nexusLayers}
         </Source>
+      ) : (
+        nexusTilesUrl && (
+          <Source
+            key={nexusTilesUrl}
+            id="nexus-tiles"
+            type="vector"
+            tiles={[nexusTilesUrl]}
+            maxzoom={14}
+          >
+            {nexusLayers}
+          </Source>
+        )
+      )}
 
       {/* {nexusPoints && (
         <Source
@@ -9,6 +9,9 @@ const appAPI = {
     getCatchmentTimeSeries: (params) => {
         return apiClient.get(`${APP_ROOT_URL}getCatchmentTimeSeries/`, { params });
     },
+    getTimeSeriesBatch: (params) => {
+        return apiClient.get(`${APP_ROOT_URL}getTimeSeriesBatch/`, { params });
+    },
     getTrouteVariables: (params) => {
         return apiClient.get(`${APP_ROOT_URL}getTrouteVariables/`, { params });
     },
@@ -21,9 +24,21 @@ const appAPI = {
     getTeehrVariables: (params) => {
         return apiClient.get(`${APP_ROOT_URL}getTeehrVariables/`, { params });
     },
+    // Metrics of every location of a run's TEEHR configuration, as columns.
+    getTeehrMetricsLayer: (params) => {
+        return apiClient.get(`${APP_ROOT_URL}getTeehrMetricsLayer/`, { params });
+    },
     getGeoSpatialData: (params) => {
         return apiClient.get(`${APP_ROOT_URL}getGeoSpatialData/`, {params});
     },
+    // MapLibre tile URL template of a hydrofabric layer ("nexus", "divides" or "flowpaths") of a run.
+    getVectorTileUrl: (modelRunId, layer) => {
+        return `${window.location.origin}${APP_ROOT_URL}tiles/${encodeURIComponent(modelRunId)}/${layer}/{z}/{x}/{y}.pbf`;
+    },
+    // pmtiles:// URL of a run's hydrofabric archive (getGeoSpatialData reports whether it exists).
+    getRunPMTilesUrl: (modelRunId) => {
+        return `pmtiles://${window.location.origin}${APP_ROOT_URL}pmtiles/${encodeURIComponent(modelRunId)}.pmtiles`;
+    },
     getModelRuns: () => {
         return apiClient.get(`${APP_ROOT_URL}getModelRuns/`);
     },
@@ -0,0 +1,219 @@
+"""Benchmark the TEEHR joined-timeseries query before/after filter pushdown.
+
+Builds a synthetic TEEHR-shaped warehouse (one Parquet data file per
+location, configuration and time chunk) and times the joined query of
+``WarehouseReader.get_joined_timeseries`` against the previous form of the
+query, which joined the full ``iceberg_scan`` of each table and filtered
+afterwards. For each it reports the median latency and the number of data
+files DuckDB read (``Total Files Read`` of each ``ICEBERG_SCAN`` in its
+profile), and checks that both return the same rows.
+
+Not collected by pytest. Building the warehouse needs ``pyiceberg``
+(``pip install pyiceberg``); DuckDB needs the ``sqlite`` and ``iceberg``
+extensions, found through ``DUCKDB_HOME`` as in the app::
+
+    python tests/bench_joined_timeseries.py --locations 200 --repeat 20
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tethysapp.ngiab.teehr_warehouse import WarehouseReader  # noqa: E402
+
+VARIABLE = "streamflow_hourly_inst"
+CONFIGURATIONS = {"ngen_ngiab": "ngen", "nwm30_retrospective": "nwm30"}
+
+# The joined query before the pushdown rewrite: full scans joined, then filtered.
+LEGACY_SQL = (
+    "SELECT p.value_time AS value_time, p.value AS primary_value, s.value AS secondary_value "
+    "FROM iceberg_scan('{pri}') p "
+    "JOIN iceberg_scan('{xwalk}') x ON x.primary_location_id = p.location_id "
+    "JOIN iceberg_scan('{sec}') s ON s.location_id = x.secondary_location_id "
+    " AND s.value_time = p.value_time AND s.variable_name = p.variable_name "
+    "WHERE p.location_id = ? AND p.variable_name = ? AND s.configuration_name = ? "
+    "ORDER BY p.value_time"
+)
+
+
+def build_warehouse(root: Path, locations: int, hours: int, chunks: int) -> None:
+    """Write a TEEHR-shaped Iceberg warehouse (SQLite catalog) under ``root``."""
+    try:
+        from pyiceberg.catalog.sql import SqlCatalog
+    except ImportError:
+        sys.exit("Building the synthetic warehouse needs pyiceberg: pip install pyiceberg")
+
+    local = root / "local"
+    local.mkdir(parents=True)
+    (local / "version").write_text("0.6.2\n")
+    catalog = SqlCatalog(
+        "local", uri=f"sqlite:///{local}/local_catalog.db", warehouse=f"file://{local}"
+    )
+    catalog.create_namespace("teehr")
+    staging = root / "staging"
+    staging.mkdir()
+
+    def add_table(name, tables):
+        table = catalog.create_table(f"teehr.{name}", schema=tables[0].schema)
+        paths = []
+        for i, data in enumerate(tables):
+            path = staging / f"{name}-{i:06d}.parquet"
+            pq.write_table(data, path, row_group_size=2048)
+            paths.append(f"file://{path}")
+        table.add_files(paths)
+
+    usgs_ids = [f"usgs-{i:06d}" for i in range(locations)]
+    add_table(
+        "location_crosswalks",
+        [
+            pa.table(
+                {
+                    "primary_location_id": usgs_ids * len(CONFIGURATIONS),
+                    "secondary_location_id": [
+                        f"{prefix}-{i}" for prefix in CONFIGURATIONS.values() for i in range(locations)
+                    ],
+                }
+            )
+        ],
+    )
+    times = np.arange(hours).astype("timedelta64[h]") + np.datetime64("2020-01-01T00:00", "us")
+    rng = np.random.default_rng(0)
+    primary, secondary = [], []
+    bounds = np.linspace(0, hours, chunks + 1).astype(int)
+    for i, usgs_id in enumerate(usgs_ids):
+        observed = (np.abs(np.sin(np.arange(hours) / 50.0 + i)) * 10 + rng.random(hours)).astype("float32")
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            n = hi - lo
+            primary.append(
+                pa.table(
+                    {
+                        "value_time": times[lo:hi],
+                        "configuration_name": ["usgs_observations"] * n,
+                        "variable_name": [VARIABLE] * n,
+                        "value": observed[lo:hi],
+                        "location_id": [usgs_id] * n,
+                    }
+                )
+            )
+            for configuration, prefix in CONFIGURATIONS.items():
+                simulated = observed[lo:hi] * rng.uniform(0.8, 1.2) + rng.random(n).astype("float32")
+                secondary.append(
+                    pa.table(
+                        {
+                            "value_time": times[lo:hi],
+                            "configuration_name": [configuration] * n,
+                            "variable_name": [VARIABLE] * n,
+                            "value": simulated.astype("float32"),
+                            "location_id": [f"{prefix}-{i}"] * n,
+                        }
+                    )
+                )
+    add_table("primary_timeseries", primary)
+    add_table("secondary_timeseries", secondary)
+
+
+def _files_read(profile_path: Path) -> int:
+    """Sum ``Total Files Read`` over the ICEBERG_SCAN operators of a DuckDB JSON profile."""
+    total = 0
+    stack = [json.loads(profile_path.read_text())]
+    while stack:
+        node = stack.pop()
+        info = node.get("extra_info") or {}
+        if info.get("Function") == "ICEBERG_SCAN":
+            total += int(info.get("Total Files Read", 0))
+        stack.extend(node.get("children", []))
+    return total
+
+
+class _ProfiledReader(WarehouseReader):
+    """A reader that counts the Iceberg data files read by each query it runs."""
+
+    def __init__(self, warehouse_path, profile_path: Path):
+        super().__init__(warehouse_path)
+        self.profile_path = profile_path
+        self.files_read = 0
+        self._conn.execute("SET enable_profiling = 'json'")
+        self._conn.execute("SET profiling_mode = 'detailed'")
+        self._conn.execute(f"SET profiling_output = '{profile_path}'")
+
+    def _execute(self, sql, params=None):
+        # Results are materialized by execute(), so the profile is complete here.
+        cursor = super()._execute(sql, params)
+        self.files_read += _files_read(self.profile_path)
+        return cursor
+
+
+def run(warehouse: Path, locations: int, repeat: int, profile_path: Path):
+    rng = np.random.default_rng(1)
+    targets = [f"usgs-{i:06d}" for i in rng.integers(0, locations, size=repeat)]
+    reader = _ProfiledReader(warehouse, profile_path)
+    catalog = reader._freeze_catalog()
+    legacy_sql = LEGACY_SQL.format(
+        pri=catalog["primary_timeseries"],
+        xwalk=catalog["location_crosswalks"],
+        sec=catalog["secondary_timeseries"],
+    )
+
+    def legacy(usgs_id):
+        return reader._execute(legacy_sql, [usgs_id, VARIABLE, "ngen_ngiab"]).fetchall()
+
+    def pushdown(usgs_id):
+        return reader._execute(
+            *reader._joined_timeseries_sql(catalog, "p.value_time", "ngen_ngiab", VARIABLE, usgs_id)
+        ).fetchall()
+
+    for usgs_id in targets[:3]:
+        assert legacy(usgs_id) == pushdown(usgs_id), f"results differ for {usgs_id}"
+
+    results = {}
+    for name, query in (("before", legacy), ("after", pushdown)):
+        latencies, files = [], []
+        for usgs_id in targets:
+            reader.files_read = 0
+            started = time.perf_counter()
+            query(usgs_id)
+            latencies.append(time.perf_counter() - started)
+            files.append(reader.files_read)
+        results[name] = (statistics.median(latencies), statistics.mean(files))
+    reader.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--hours", type=int, default=24 * 365)
+    parser.add_argument("--chunks", type=int, default=4, help="data files per location and configuration")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warehouse", type=Path, help="reuse (or create) the synthetic warehouse here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        warehouse = args.warehouse or Path(tmp) / "warehouse"
+        if not (warehouse / "local" / "local_catalog.db").exists():
+            started = time.perf_counter()
+            build_warehouse(warehouse, args.locations, args.hours, args.chunks)
+            print(f"built warehouse in {time.perf_counter() - started:.1f}s: {warehouse}")
+        data_files = args.locations * args.chunks
+        print(
+            f"{data_files} primary and {data_files * len(CONFIGURATIONS)} secondary data files, "
+            f"{args.hours} hours per location"
+        )
+        results = run(warehouse, args.locations, args.repeat, Path(tmp) / "profile.json")
+    print(f"{'query':<8}{'median ms':>12}{'files read':>12}")
+    for name, (latency, files) in results.items():
+        print(f"{name:<8}{latency * 1000:>12.1f}{files:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+from shapely.geometry import Point
+
+from tethysapp.ngiab.arrow_ipc import (
+    ARROW_STREAM_MIME,
+    geodataframe_table,
+    read_ipc_stream,
+    series_table,
+    table_columns,
+    table_metadata,
+    to_ipc_stream,
+    wants_arrow,
+    with_metadata,
+)
+
+
+def test_wants_arrow_parses_accept_header():
+    assert wants_arrow(ARROW_STREAM_MIME)
+    assert wants_arrow(f"application/json;q=0.5, {ARROW_STREAM_MIME};q=1")
+    assert not wants_arrow("application/json, text/plain, */*")
+    assert not wants_arrow(None)
+
+
+def test_series_table_round_trips_through_ipc():
+    table = series_table(
+        [
+            ("cat-1-Q_OUT", ["2020-01-01 00:00:00", "2020-01-01 01:00:00"], np.array([1.0, 2.0])),
+            ("nex-3-Streamflow", ["2020-01-01 00:00:00"], [3]),
+        ]
+    )
+    table = with_metadata(table, {"layout": {"yaxis": "Q_OUT"}})
+    result = read_ipc_stream(to_ipc_stream(table))
+
+    assert result.column_names == ["series", "time", "value"]
+    assert pa.types.is_timestamp(result.schema.field("time").type)
+    assert result["series"].to_pylist() == ["cat-1-Q_OUT", "cat-1-Q_OUT", "nex-3-Streamflow"]
+    assert result["value"].to_pylist() == [1.0, 2.0, 3.0]
+    assert table_metadata(result) == {"layout": {"yaxis": "Q_OUT"}}
+
+
+def test_series_table_empty():
+    result = read_ipc_stream(to_ipc_stream(series_table([])))
+    assert result.num_rows == 0
+    assert result.column_names == ["series", "time", "value"]
+
+
+def test_geodataframe_table_uses_geoarrow_wkb():
+    gdf = gpd.GeoDataFrame(
+        {"id": ["nex-1", "nex-2"]},
+        geometry=[Point(0, 0), Point(1, 1)],
+        crs="EPSG:4326",
+    )
+    result = read_ipc_stream(to_ipc_stream(geodataframe_table(gdf)))
+    field = result.schema.field("geometry")
+    assert field.metadata[b"ARROW:extension:name"] == b"geoarrow.wkb"
+    assert list(gpd.GeoSeries.from_wkb(result["geometry"].to_pylist())) == list(gdf.geometry)
+    assert result["id"].to_pylist() == ["nex-1", "nex-2"]
+
+
+def test_table_columns_maps_nan_to_none():
+    table = pa.table({"id": ["a", "b"], "value": [1.5, np.nan], "lon": pa.array([None, 2.0])})
+    assert table_columns(table) == {"id": ["a", "b"], "value": [1.5, None], "lon": [None, 2.0]}
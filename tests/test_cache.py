@@ -0,0 +1,44 @@
+"""Tests for the byte-budget LRU cache."""
+
+from tethysapp.ngiab.cache import ByteBudgetLRU
+
+
+def _load(value, calls):
+    def loader():
+        calls.append(value)
+        return value
+
+    return loader
+
+
+def test_hits_and_version_misses():
+    cache = ByteBudgetLRU(100)
+    calls = []
+    assert cache.get_or_load("run", 1, _load("a", calls), sizeof=len) == "a"
+    assert cache.get_or_load("run", 1, _load("b", calls), sizeof=len) == "a"
+    assert cache.get_or_load("run", 2, _load("c", calls), sizeof=len) == "c"
+    assert calls == ["a", "c"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 2, 1, 1)
+
+
+def test_evicts_least_recently_used_beyond_budget():
+    cache = ByteBudgetLRU(10)
+    calls = []
+    cache.get_or_load("a", 0, _load("x" * 4, calls), sizeof=len)
+    cache.get_or_load("b", 0, _load("y" * 4, calls), sizeof=len)
+    cache.get_or_load("a", 0, _load("unused", calls), sizeof=len)  # a is now most recent
+    cache.get_or_load("c", 0, _load("z" * 4, calls), sizeof=len)  # evicts b
+    assert cache.stats()["evictions"] == 1
+    cache.get_or_load("a", 0, _load("unused", calls), sizeof=len)
+    cache.get_or_load("b", 0, _load("y" * 4, calls), sizeof=len)
+    assert calls == ["xxxx", "yyyy", "zzzz", "yyyy"]
+
+
+def test_values_over_budget_are_not_cached():
+    cache = ByteBudgetLRU(3)
+    calls = []
+    for _ in range(2):
+        assert cache.get_or_load("big", 0, _load("toolong", calls), sizeof=len) == "toolong"
+    assert calls == ["toolong", "toolong"]
+    assert cache.stats()["entries"] == 0
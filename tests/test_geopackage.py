@@ -0,0 +1,37 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from tethysapp.ngiab.geopackage import layer_columns, read_layer
+
+
+@pytest.fixture
+def gpkg(tmp_path):
+    path = str(tmp_path / "hf.gpkg")
+    gpd.GeoDataFrame(
+        {"id": ["nex-1", "nex-2"], "toid": ["wb-1", "wb-2"], "poi_id": [7, 8]},
+        geometry=[Point(-87.56, 33.21), Point(-80.0, 40.0)],
+        crs="EPSG:4326",
+    ).to_crs("EPSG:5070").to_file(path, layer="nexus")
+    return path
+
+
+def test_read_layer_projects_columns(gpkg):
+    assert layer_columns(gpkg, "nexus") == ["id", "toid", "poi_id"]
+    gdf = read_layer(gpkg, "nexus", columns=["toid", "id", "missing"])
+    assert isinstance(gdf, gpd.GeoDataFrame)
+    assert sorted(gdf.columns) == ["geometry", "id", "toid"]
+    assert gdf.crs.to_epsg() == 5070
+
+
+def test_read_layer_filters_by_bbox_in_another_crs(gpkg):
+    gdf = read_layer(gpkg, "nexus", columns=["id"], bbox=(-88, 33, -87, 34), bbox_crs="EPSG:4326")
+    assert gdf["id"].tolist() == ["nex-1"]
+    assert read_layer(gpkg, "nexus", bbox=(0, 0, 1, 1), bbox_crs="EPSG:4326").empty
+
+
+def test_read_layer_attributes_only(gpkg):
+    df = read_layer(gpkg, "nexus", columns=["id"], read_geometry=False)
+    assert not isinstance(df, gpd.GeoDataFrame) and isinstance(df, pd.DataFrame)
+    assert df["id"].tolist() == ["nex-1", "nex-2"]
@@ -0,0 +1,73 @@
+"""Tests for the cached run-output directory index."""
+
+import os
+import time
+
+import pytest
+
+from tethysapp.ngiab import output_index
+from tethysapp.ngiab.output_index import get_output_index, scan_output_dir
+
+
+def _touch(path, size=0):
+    path.write_bytes(b"x" * size)
+
+
+def _settle(directory, age_s=60):
+    """Backdate the directory mtime so the index is cached (not treated as racy)."""
+    stamp = time.time() - age_s
+    os.utime(directory, (stamp, stamp))
+
+
+@pytest.fixture(autouse=True)
+def _clear_indexes():
+    output_index.clear_output_indexes()
+    yield
+    output_index.clear_output_indexes()
+
+
+def test_scan_output_dir_classifies_files(tmp_path):
+    _touch(tmp_path / "cat-2.csv", 5)
+    _touch(tmp_path / "cat-1.csv")
+    _touch(tmp_path / "nex-3_output.csv")
+    _touch(tmp_path / "nex-4.csv")
+    _touch(tmp_path / "tnx-1000000001_output.csv")
+    _touch(tmp_path / "cat-9.parquet")
+    (tmp_path / "cat-dir.csv").mkdir()
+
+    index = scan_output_dir(str(tmp_path))
+    assert index.catchment_ids == ["cat-1", "cat-2"]
+    assert index.nexus_ids == ["nex-3", "nex-4"]
+    assert index.catchments["cat-2"].size == 5
+    assert index.catchments["cat-2"].path == str(tmp_path / "cat-2.csv")
+
+
+def test_scan_output_dir_missing_directory_is_empty(tmp_path):
+    index = scan_output_dir(str(tmp_path / "missing"))
+    assert index.catchment_ids == [] and index.nexus_ids == []
+
+
+def test_get_output_index_is_cached_until_directory_changes(tmp_path, monkeypatch):
+    _touch(tmp_path / "cat-1.csv")
+    _settle(tmp_path, age_s=120)
+    first = get_output_index(str(tmp_path))
+    assert get_output_index(str(tmp_path)) is first
+
+    scans = []
+    monkeypatch.setattr(
+        output_index, "scan_output_dir", lambda d: scans.append(d) or scan_output_dir(d)
+    )
+    assert get_output_index(str(tmp_path)) is first
+    assert scans == []
+
+    _touch(tmp_path / "cat-2.csv")
+    _settle(tmp_path, age_s=60)
+    second = get_output_index(str(tmp_path))
+    assert scans == [str(tmp_path)]
+    assert second.catchment_ids == ["cat-1", "cat-2"]
+
+
+def test_recently_modified_directory_is_not_cached(tmp_path):
+    _touch(tmp_path / "cat-1.csv")
+    first = get_output_index(str(tmp_path))
+    assert get_output_index(str(tmp_path)) is not first
@@ -0,0 +1,145 @@
+"""Tests for tethysapp.ngiab.output_store."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import xarray as xr
+
+from tethysapp.ngiab.output_store import (
+    OutputStoreError,
+    catchment_store_variables,
+    is_store_current,
+    read_catchment_store,
+    read_troute_store,
+    write_catchment_store,
+    write_troute_store,
+)
+
+
+def _write_catchment_csv(directory, catchment_id, offset=0.0, variables=("Q_OUT", "RAIN_RATE")):
+    times = pd.date_range("2022-08-24 13:00:00", periods=4, freq="h").strftime("%Y-%m-%d %H:%M:%S")
+    df = pd.DataFrame({"Time": times})
+    for i, variable in enumerate(variables):
+        df[variable] = [offset + i + step * 0.5 for step in range(4)]
+    df.to_csv(directory / f"{catchment_id}.csv")
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    out = tmp_path / "outputs" / "ngen"
+    out.mkdir(parents=True)
+    for n in range(3):
+        _write_catchment_csv(out, f"cat-{100 + n}", offset=n * 10)
+    # Nexus outputs live in the same directory and must be ignored.
+    (out / "nex-1_output.csv").write_text("0,2022-08-24 13:00:00,1.0\n")
+    return out
+
+
+def test_store_round_trips_catchment_csv(output_dir, tmp_path):
+    store = write_catchment_store(str(output_dir), str(tmp_path / "cache" / "catchments.parquet"))
+    assert catchment_store_variables(store) == ["Q_OUT", "RAIN_RATE"]
+    times, values = read_catchment_store(store, "cat-101", "RAIN_RATE")
+    expected = pd.read_csv(output_dir / "cat-101.csv")
+    assert times == expected["Time"].tolist()
+    assert values == pytest.approx(expected["RAIN_RATE"].tolist())
+
+
+def test_unknown_catchment_reads_empty(output_dir, tmp_path):
+    store = write_catchment_store(str(output_dir), str(tmp_path / "catchments.parquet"))
+    assert read_catchment_store(store, "cat-999", "Q_OUT") == ([], [])
+
+
+def test_no_catchment_files_returns_none(tmp_path):
+    assert write_catchment_store(str(tmp_path), str(tmp_path / "catchments.parquet")) is None
+
+
+def test_mismatched_variables_raise(output_dir, tmp_path, monkeypatch):
+    _write_catchment_csv(output_dir, "cat-200", variables=("OTHER",))
+    monkeypatch.setattr("tethysapp.ngiab.output_store._FILES_PER_BATCH", 1)
+    store = tmp_path / "catchments.parquet"
+    with pytest.raises(OutputStoreError):
+        write_catchment_store(str(output_dir), str(store))
+    assert not store.exists()
+
+
+def test_store_goes_stale_when_outputs_change(output_dir, tmp_path):
+    store = write_catchment_store(str(output_dir), str(tmp_path / "catchments.parquet"))
+    assert is_store_current(store, str(output_dir))
+    _write_catchment_csv(output_dir, "cat-300")
+    st = os.stat(store)
+    os.utime(output_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert not is_store_current(store, str(output_dir))
+
+
+def test_troute_store_is_feature_major_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("tethysapp.ngiab.output_store._FEATURES_PER_BATCH", 2)
+    times = pd.date_range("2022-08-24 13:00:00", periods=4, freq="h")
+    paths = []
+    for n, chunk in enumerate((times[:2], times[2:])):
+        path = tmp_path / f"troute_{n}.nc"
+        flow = np.arange(3 * len(chunk), dtype=np.float32).reshape(3, len(chunk)) + 10 * n
+        if n == 0:
+            flow[0, 0] = np.nan
+        xr.Dataset(
+            {"flow": (("feature_id", "time"), flow), "time_step": (("time",), np.arange(len(chunk)))},
+            coords={"feature_id": [30, 10, 20], "time": chunk},
+        ).to_netcdf(path)
+        paths.append(str(path))
+
+    store = write_troute_store("NetCDF", paths, str(tmp_path / "cache" / "troute.parquet"))
+    assert pq.read_schema(store).names == ["feature_id", "time", "flow"]
+    ids = pq.read_table(store, columns=["feature_id"])["feature_id"].to_pylist()
+    assert ids == sorted(ids) and len(ids) == 12
+
+    expected_times = times.strftime("%Y-%m-%d %H:%M:%S").tolist()
+    assert read_troute_store(store, 30, "flow") == (expected_times, [-9999.0, 1.0, 10.0, 11.0])
+    assert read_troute_store(store, 30, "flow", start=times[1], end=times[2]) == (
+        expected_times[1:3],
+        [1.0, 10.0],
+    )
+    assert read_troute_store(store, 99, "flow") == ([], [])
+
+
+def test_troute_store_from_csv(tmp_path):
+    path = tmp_path / "troute.csv"
+    pd.DataFrame(
+        {
+            "featureID": [20, 10, 20],
+            "Type": ["wb"] * 3,
+            "current_time": ["2022-08-24 13:00:00", "2022-08-24 13:00:00", "2022-08-24 14:00:00"],
+            "flow": [1.0, 2.0, 3.0],
+        }
+    ).to_csv(path, index=False)
+    store = write_troute_store("CSV", [str(path)], str(tmp_path / "troute.parquet"))
+    assert read_troute_store(store, 20, "flow") == (
+        ["2022-08-24 13:00:00", "2022-08-24 14:00:00"],
+        [1.0, 3.0],
+    )
+
+
+def test_troute_csv_store_is_built_in_reach_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr("tethysapp.ngiab.output_store._FEATURES_PER_BATCH", 2)
+    monkeypatch.setattr("tethysapp.ngiab.output_store._CSV_ROWS_PER_READ", 2)
+    times = ["2022-08-24 13:00:00", "2022-08-24 14:00:00", "2022-08-24 15:00:00"]
+    paths = []
+    for n, chunk in enumerate((times[:2], times[1:])):
+        path = tmp_path / f"troute_{n}.csv"
+        pd.DataFrame(
+            {
+                "featureID": [30, 10, 20] * len(chunk),
+                "Type": ["wb"] * 3 * len(chunk),
+                "current_time": [t for t in chunk for _ in range(3)],
+                "flow": [10.0 * n + i for i in range(3 * len(chunk))],
+            }
+        ).to_csv(path, index=False)
+        paths.append(str(path))
+
+    store = write_troute_store("CSV", paths, str(tmp_path / "cache" / "troute.parquet"))
+    ids = pq.read_table(store, columns=["feature_id"])["feature_id"].to_pylist()
+    assert ids == [10, 10, 10, 20, 20, 20, 30, 30, 30]
+    # 14:00 is in both chunks; the first chunk's value is kept.
+    assert read_troute_store(store, 30, "flow") == (times, [0.0, 3.0, 13.0])
+    assert os.listdir(tmp_path / "cache") == ["troute.parquet"]
@@ -0,0 +1,41 @@
+import gzip
+import json
+import os
+
+from tethysapp.ngiab.payload_cache import (
+    gzip_payload,
+    json_with_raw,
+    load_payload,
+    payload_paths,
+    store_payload,
+)
+
+
+def test_store_and_load_payload(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert load_payload(cache_dir, "geospatial", "abc") is None
+
+    store_payload(cache_dir, "geospatial", "abc", b'{"a": 1}')
+    assert load_payload(cache_dir, "geospatial", "abc") == b'{"a": 1}'
+    assert gzip.decompress(load_payload(cache_dir, "geospatial", "abc", gzipped=True)) == b'{"a": 1}'
+    # A freshly encoded response is byte-identical to the cached copy.
+    assert load_payload(cache_dir, "geospatial", "abc", gzipped=True) == gzip_payload(b'{"a": 1}')
+    assert load_payload(cache_dir, "geospatial", "other") is None
+
+
+def test_store_payload_replaces_older_tokens(tmp_path):
+    cache_dir = str(tmp_path)
+    store_payload(cache_dir, "geospatial", "old", b"{}")
+    store_payload(cache_dir, "other", "old", b"{}")
+    store_payload(cache_dir, "geospatial", "new", b"[]")
+
+    assert not any(os.path.exists(path) for path in payload_paths(cache_dir, "geospatial", "old"))
+    assert all(os.path.exists(path) for path in payload_paths(cache_dir, "other", "old"))
+    assert load_payload(cache_dir, "geospatial", "new") == b"[]"
+
+
+def test_json_with_raw_embeds_encoded_value():
+    raw = json.dumps({"type": "FeatureCollection", "features": []})
+    payload = json_with_raw({"bounds": [1, 2], "nexus": None}, "nexus", raw)
+    assert json.loads(payload) == {"bounds": [1, 2], "nexus": json.loads(raw)}
+    assert json.loads(json_with_raw({}, "nexus", "[]")) == {"nexus": []}
@@ -0,0 +1,54 @@
+import gzip
+
+import pytest
+from pmtiles.reader import MemorySource, Reader
+
+from tethysapp.ngiab.pmtiles import parse_byte_range, write_pmtiles
+
+
+def read_pmtiles(path):
+    """Return ``(header, metadata, get_tile)`` of an archive, with tiles decompressed."""
+    with open(path, "rb") as f:
+        reader = Reader(MemorySource(f.read()))
+
+    def get_tile(z, x, y):
+        data = reader.get(z, x, y)
+        return gzip.decompress(data) if data is not None else None
+
+    return reader.header(), reader.metadata(), get_tile
+
+
+def test_write_pmtiles_round_trip(tmp_path):
+    path = str(tmp_path / "run.pmtiles")
+    tiles = [(0, 0, 0, b"root"), (1, 0, 0, b"same"), (1, 0, 1, b"same"), (1, 1, 1, b""), (2, 3, 1, b"deep")]
+    written = write_pmtiles(path, tiles, {"name": "run"}, (-88.0, 33.0, -87.0, 34.0), 0, 2)
+    assert written == 4
+
+    header, metadata, get_tile = read_pmtiles(path)
+    assert metadata == {"name": "run"}
+    assert (header["min_zoom"], header["max_zoom"], header["tile_type"].name) == (0, 2, "MVT")
+    assert (header["min_lon_e7"], header["max_lat_e7"]) == (-880000000, 340000000)
+    assert (header["addressed_tiles_count"], header["tile_contents_count"]) == (4, 3)
+    assert header["tile_entries_count"] == 3  # the two identical, consecutive tiles share a run
+    assert header["clustered"]
+    assert get_tile(0, 0, 0) == b"root"
+    assert get_tile(1, 0, 0) == get_tile(1, 0, 1) == b"same"
+    assert get_tile(1, 1, 1) is None
+    assert get_tile(2, 3, 1) == b"deep"
+
+
+def test_write_pmtiles_without_tiles_writes_nothing(tmp_path):
+    path = tmp_path / "empty.pmtiles"
+    assert write_pmtiles(str(path), [(0, 0, 0, b"")], {}, (-88.0, 33.0, -87.0, 34.0), 0, 0) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parse_byte_range():
+    assert parse_byte_range(None, 100) is None
+    assert parse_byte_range("bytes=0-126", 1000) == (0, 126)
+    assert parse_byte_range("bytes=10-", 100) == (10, 99)
+    assert parse_byte_range("bytes=-10", 100) == (90, 99)
+    assert parse_byte_range("bytes=90-200", 100) == (90, 99)
+    assert parse_byte_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_byte_range("bytes=100-", 100)
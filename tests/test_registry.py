@@ -0,0 +1,156 @@
+"""Tests for tethysapp.ngiab.registry."""
+
+import json
+import os
+import threading
+
+from tethysapp.ngiab.registry import JsonRegistry, SqliteRegistry, get_registry
+
+
+def _write(path, runs, key="model_runs"):
+    path.write_text(json.dumps({key: runs}))
+
+
+def _touch_write(path, runs):
+    """Rewrite the registry and move its mtime forward so the change is always seen."""
+    _write(path, runs)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_get_returns_entry_by_id(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}, {"id": "b", "label": "B", "path": "/b"}])
+    registry = JsonRegistry(str(conf), "model_runs")
+    assert registry.get("b")["path"] == "/b"
+    assert registry.get("missing") is None
+    assert [e["id"] for e in registry.entries()] == ["a", "b"]
+
+
+def test_file_is_parsed_once_while_unchanged(tmp_path, monkeypatch):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}])
+    registry = JsonRegistry(str(conf), "model_runs")
+    registry.get("a")
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("registry re-parsed an unchanged file")
+
+    monkeypatch.setattr(json, "load", _fail)
+    assert registry.get("a")["label"] == "A"
+    assert registry.data()["model_runs"][0]["id"] == "a"
+
+
+def test_file_change_is_picked_up(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}])
+    registry = JsonRegistry(str(conf), "model_runs")
+    assert registry.get("b") is None
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}, {"id": "b", "label": "B", "path": "/b"}])
+    # Force a distinct mtime even on filesystems with coarse timestamps.
+    st = os.stat(conf)
+    os.utime(conf, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert registry.get("b")["label"] == "B"
+
+
+def test_get_registry_is_shared_per_path(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [])
+    assert get_registry(str(conf), "model_runs") is get_registry(str(conf), "model_runs")
+    other = tmp_path / "other.json"
+    _write(other, [])
+    assert get_registry(str(other), "model_runs") is not get_registry(str(conf), "model_runs")
+
+
+def test_get_by_label_returns_first_match(tmp_path):
+    conf = tmp_path / "datastream_ngiab.json"
+    _write(conf, [{"id": "1", "label": "x"}, {"id": "2", "label": "x"}], key="datastream")
+    registry = JsonRegistry(str(conf), "datastream")
+    assert registry.get_by_label("x")["id"] == "1"
+    assert registry.get_by_label("y") is None
+
+
+def test_concurrent_json_adds_keep_every_entry(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [])
+    registry = JsonRegistry(str(conf), "model_runs")
+    threads = [
+        threading.Thread(target=registry.add, args=({"id": str(i), "label": f"run{i}"},))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    on_disk = json.loads(conf.read_text())["model_runs"]
+    assert sorted(e["id"] for e in on_disk) == sorted(str(i) for i in range(20))
+    assert registry.get("7")["label"] == "run7"
+
+
+def test_json_add_keeps_file_mode_and_leaves_no_lock_file(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [])
+    os.chmod(conf, 0o664)
+    JsonRegistry(str(conf), "model_runs").add({"id": "a", "label": "A"})
+    assert os.stat(conf).st_mode & 0o777 == 0o664
+    assert os.listdir(tmp_path) == ["ngiab_visualizer.json"]
+
+
+def test_sqlite_registry_imports_json_once_and_adds(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}])
+    db = str(tmp_path / "registry.sqlite3")
+    registry = SqliteRegistry(db, "model_runs", source_path=str(conf))
+    assert registry.get("a")["path"] == "/a"
+    registry.add({"id": "b", "label": "B", "path": "/b"})
+    # A second registry on the same database sees both without re-importing duplicates.
+    other = SqliteRegistry(db, "model_runs", source_path=str(conf))
+    assert [e["id"] for e in other.entries()] == ["a", "b"]
+    assert other.get_by_label("B")["id"] == "b"
+    # add() does not rewrite the JSON file.
+    assert [e["id"] for e in json.loads(conf.read_text())["model_runs"]] == ["a"]
+    # Runs added to the JSON file later are picked up; runs added by the app are kept.
+    _touch_write(conf, [{"id": "a", "label": "A", "path": "/a"}, {"id": "c", "label": "C", "path": "/c"}])
+    assert [e["id"] for e in other.entries()] == ["a", "b", "c"]
+
+
+def test_sqlite_registry_exports_to_json(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    conf.write_text(json.dumps({"model_runs": [{"id": "a", "label": "A"}], "other": 1}))
+    registry = SqliteRegistry(str(tmp_path / "registry.sqlite3"), "model_runs", source_path=str(conf))
+    registry.add({"id": "b", "label": "B"})
+    assert registry.export_json() == 2
+    data = json.loads(conf.read_text())
+    assert data == {"model_runs": [{"id": "a", "label": "A"}, {"id": "b", "label": "B"}], "other": 1}
+    # Exported runs are mirrored from the file from now on, removals included.
+    _touch_write(conf, [{"id": "a", "label": "A"}])
+    assert [e["id"] for e in registry.entries()] == ["a"]
+
+
+def test_sqlite_registry_mirrors_json_edits_and_removals(tmp_path):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "run", "path": "/a"}, {"id": "b", "label": "B", "path": "/b"}])
+    registry = SqliteRegistry(str(tmp_path / "registry.sqlite3"), "model_runs", source_path=str(conf))
+    assert registry.get_by_label("run")["id"] == "a"
+    # viewOnTethys.sh -o: the old entry is deleted and one with the same label added.
+    _touch_write(
+        conf,
+        [
+            {"id": "b", "label": "B", "path": "/b", "teehr_configuration_name": "ngen_b"},
+            {"id": "a2", "label": "run", "path": "/a"},
+        ],
+    )
+    assert [e["id"] for e in registry.entries()] == ["b", "a2"]
+    assert registry.get("a") is None
+    assert registry.get_by_label("run")["id"] == "a2"
+    assert registry.get("b")["teehr_configuration_name"] == "ngen_b"
+
+
+def test_get_registry_honours_sqlite_backend(tmp_path, monkeypatch):
+    conf = tmp_path / "ngiab_visualizer.json"
+    _write(conf, [{"id": "a", "label": "A", "path": "/a"}])
+    monkeypatch.setenv("NGIAB_REGISTRY_BACKEND", "sqlite")
+    registry = get_registry(str(conf), "model_runs")
+    assert isinstance(registry, SqliteRegistry)
+    assert registry.db_path == str(tmp_path / "ngiab_registry.sqlite3")
+    assert registry.get("a")["label"] == "A"
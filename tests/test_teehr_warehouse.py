@@ -14,15 +14,22 @@ Then run tests::
     TEEHR_TEST_WAREHOUSE=/home/aquagio/ngiab pytest tests/test_teehr_warehouse.py
 """
 
+import json
 import math
 import os
 import shutil
+from datetime import datetime
 from pathlib import Path
 
+import pandas as pd
+import pyarrow.compute as pc
 import pytest
 
+from tethysapp.ngiab import teehr_warehouse
 from tethysapp.ngiab.teehr_warehouse import (
+    METRIC_COLUMNS,
     SUPPORTED_TEEHR_VERSIONS,
+    CrosswalkIndex,
     UnsupportedWarehouseVersion,
     WarehouseReader,
     WarehouseUnreachable,
@@ -78,6 +85,13 @@ def reader(warehouse_path):
         yield r
 
 
+def _register_runs(monkeypatch, tmp_path, runs):
+    """Point VISUALIZER_CONF at a registry file listing ``runs``."""
+    conf = tmp_path / "ngiab_visualizer.json"
+    conf.write_text(json.dumps({"model_runs": runs}))
+    monkeypatch.setenv("VISUALIZER_CONF", str(conf))
+
+
 def _usgs_id_with_metrics(reader, config_name):
     """Pick a USGS id the warehouse has non-empty ngen_metrics rows for."""
     for usgs in reader.list_usgs_locations_for_run(config_name):
@@ -215,9 +229,168 @@ def test_list_crosswalks_prefix_filter(reader):
     assert all(p[1].startswith("nwm30-") for p in nwm_pairs)
 
 
+def test_pool_readers_share_one_connection(warehouse_path):
+    pool = teehr_warehouse.WarehouseConnectionPool(warehouse_path)
+    try:
+        with WarehouseReader.from_pool(pool) as a, WarehouseReader.from_pool(pool) as b:
+            assert a._conn is not b._conn
+            assert a.teehr_version == b.teehr_version
+            assert a.snapshot_token() == b.snapshot_token()
+        with WarehouseReader(warehouse_path) as direct, WarehouseReader.from_pool(pool) as pooled:
+            assert pooled.list_crosswalks() == direct.list_crosswalks()
+        assert pool.connects == 1
+    finally:
+        pool.close()
+
+
+def test_pool_reconnects_when_catalog_changes_or_connection_breaks(warehouse_path, tmp_path):
+    copy = tmp_path / "wh"
+    shutil.copytree(warehouse_path, copy, symlinks=True)
+    pool = teehr_warehouse.WarehouseConnectionPool(copy)
+    try:
+        with WarehouseReader.from_pool(pool) as reader:
+            token = reader.snapshot_token()
+        catalog = copy / "local" / "local_catalog.db"
+        shutil.copyfile(catalog, tmp_path / "catalog.db")
+        os.replace(tmp_path / "catalog.db", catalog)  # regenerated: new inode
+        with WarehouseReader.from_pool(pool) as reader:
+            assert reader.snapshot_token() == token
+        assert pool.connects == 2
+
+        pool._conn.close()  # fails the health check
+        with WarehouseReader.from_pool(pool) as reader:
+            assert reader.snapshot_token() == token
+        assert pool.connects == 3
+    finally:
+        pool.close()
+
+
+def test_pool_maps_open_errors(tmp_path):
+    pool = teehr_warehouse.WarehouseConnectionPool(tmp_path / "missing")
+    with pytest.raises(WarehouseUnreachable):
+        WarehouseReader.from_pool(pool)
+    (tmp_path / "missing" / "local").mkdir(parents=True)
+    (tmp_path / "missing" / "local" / "local_catalog.db").write_bytes(b"")
+    with pytest.raises(UnsupportedWarehouseVersion):
+        WarehouseReader.from_pool(pool)
+
+
+class _StubReader:
+    """Just enough of a WarehouseReader for ``_cached_query``."""
+
+    warehouse_path = "/stub"
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._call_catalog = None
+        self.calls = []
+
+    def _freeze_catalog(self):
+        return self._call_catalog or dict(self.catalog)
+
+    @teehr_warehouse._cached_query("ngen_metrics")
+    def metrics(self, location, start=None):
+        self.calls.append(self._freeze_catalog()["ngen_metrics"])
+        return [{"location": location, "start": start}]
+
+
+def test_cached_query_is_keyed_by_arguments_and_table_snapshot():
+    teehr_warehouse.clear_query_cache()
+    before = teehr_warehouse.query_cache_stats()
+    stub = _StubReader({"ngen_metrics": "m1.json", "primary_timeseries": "p1.json"})
+    first = stub.metrics("usgs-1")
+    assert stub.metrics("usgs-1") is first
+    stub.metrics("usgs-1", start=datetime(2020, 1, 1))
+    assert len(stub.calls) == 2
+
+    stub.catalog["primary_timeseries"] = "p2.json"  # a table the query does not read
+    assert stub.metrics("usgs-1") is first
+    stub.catalog["ngen_metrics"] = "m2.json"  # a new commit to ngen_metrics
+    assert stub.metrics("usgs-1") is not first
+    assert stub.calls[-1] == "m2.json"
+    assert stub._call_catalog is None
+    stats = teehr_warehouse.query_cache_stats()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (2, 3)
+
+
+def test_repeated_warehouse_queries_are_served_from_cache(reader):
+    usgs = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    teehr_warehouse.clear_query_cache()
+    hits = teehr_warehouse.query_cache_stats()["hits"]
+    first = reader.get_metrics_for_location("ngen_ngiab", usgs)
+    assert reader.get_metrics_for_location("ngen_ngiab", usgs) is first
+    assert teehr_warehouse.query_cache_stats()["hits"] == hits + 1
+
+
+def test_crosswalk_index_from_pairs():
+    index = CrosswalkIndex.from_pairs(
+        "snap",
+        [
+            ("usgs-1", "ngen-10"),
+            ("usgs-1", "nwm30-100"),
+            ("usgs-2", "ngen-10"),
+            ("usgs-2", "nwm30-200"),
+            ("usgs-2", "ngen-20"),
+        ],
+    )
+    # The last pair of a duplicated id wins, as in the dict comprehensions it replaced.
+    assert index.primary_for("ngen-10") == "usgs-2"
+    assert index.secondary_for("usgs-2", "nwm30") == "nwm30-200"
+    assert index.secondary_for("usgs-2", "ngen") == "ngen-20"
+    assert index.secondary_for("usgs-1", "ngen") == "ngen-10"
+    assert index.primary_for("ngen-0") is None
+    assert index.secondary_for("usgs-1", "nwm21") is None
+
+
+def test_crosswalk_index_matches_list_crosswalks(reader):
+    index = reader.crosswalk_index()
+    assert index.snapshot == reader.snapshot_token()
+    for primary, secondary in reader.list_crosswalks(secondary_prefix="ngen"):
+        assert index.primary_for(secondary) is not None
+    assert len(index.primary_by_secondary) == len({s for _, s in reader.list_crosswalks()})
+
+
+def test_get_crosswalk_index_reopens_only_when_catalog_changes(warehouse_path, tmp_path, monkeypatch):
+    copy = tmp_path / "wh"
+    shutil.copytree(warehouse_path, copy, symlinks=True)
+    teehr_warehouse.clear_crosswalk_indexes()
+    first = teehr_warehouse.get_crosswalk_index(copy)
+
+    opened = []
+    monkeypatch.setattr(
+        teehr_warehouse.WarehouseReader,
+        "crosswalk_index",
+        lambda self: opened.append(1) or first,
+    )
+    assert teehr_warehouse.get_crosswalk_index(copy) is first
+    # Touching the catalog without a commit re-reads the snapshot, not the crosswalks.
+    catalog = copy / "local" / "local_catalog.db"
+    stat = catalog.stat()
+    os.utime(catalog, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert teehr_warehouse.get_crosswalk_index(copy) is first
+    assert opened == []
+
+
 # ---- utils.py integration helpers ---------------------------------------
 
 
+def test_usgs_lookups_use_crosswalk_index(reader, warehouse_path, monkeypatch):
+    secondary_pairs = reader.list_crosswalks(secondary_prefix="ngen")
+    if not secondary_pairs:
+        pytest.skip("fixture warehouse has no ngen crosswalks")
+    primary, secondary = secondary_pairs[0]
+    nexus_id = secondary.replace("ngen-", "nex-", 1)
+    monkeypatch.setenv("TEEHR_WAREHOUSE_PATH", str(warehouse_path))
+    teehr_warehouse.clear_crosswalk_indexes()
+
+    assert ngiab_utils.get_usgs_from_ngen_id("any", nexus_id) == primary
+    assert ngiab_utils.get_usgs_from_ngen_id("any", "nex-missing") is None
+    gdf = ngiab_utils.append_ngen_usgs_column(pd.DataFrame({"id": [nexus_id, "nex-missing"]}), "any")
+    gdf = ngiab_utils.append_nwm_usgs_column(gdf, "any")
+    assert gdf["ngen_usgs"].tolist() == [primary, "none"]
+    assert gdf["nwm_usgs"].iloc[1] == "none"
+
+
 def test_sanitize_stem_rules():
     assert ngiab_utils._sanitize_stem("AWI_16_2863657_007") == "awi_16_2863657_007"
     assert ngiab_utils._sanitize_stem("my-run.v2") == "my_run_v2"
@@ -226,9 +399,7 @@ def test_sanitize_stem_rules():
 
 def test_detect_legacy_teehr_layout_false_when_run_missing(tmp_path, monkeypatch):
     """Unknown run id -> False, not an exception."""
-    monkeypatch.setattr(
-        ngiab_utils, "_get_list_model_runs", lambda: {"model_runs": []}
-    )
+    _register_runs(monkeypatch, tmp_path, [])
     assert ngiab_utils._detect_legacy_teehr_layout("does-not-exist") is False
 
 
@@ -236,71 +407,53 @@ def test_detect_legacy_teehr_layout_true_when_metrics_csv_present(tmp_path, monk
     run_dir = tmp_path / "run_A"
     (run_dir / "teehr").mkdir(parents=True)
     (run_dir / "teehr" / "metrics.csv").write_text("metric,primary_location_id\n")
-    monkeypatch.setattr(
-        ngiab_utils,
-        "_get_list_model_runs",
-        lambda: {"model_runs": [{"id": "run_A", "path": str(run_dir)}]},
-    )
+    _register_runs(monkeypatch, tmp_path, [{"id": "run_A", "path": str(run_dir)}])
     assert ngiab_utils._detect_legacy_teehr_layout("run_A") is True
 
 
-def test_resolve_configuration_name_prefers_manifest_field(monkeypatch):
+def test_resolve_configuration_name_prefers_manifest_field(tmp_path, monkeypatch):
     """Persisted teehr_configuration_name wins over derivation."""
-    monkeypatch.setattr(
-        ngiab_utils,
-        "_get_list_model_runs",
-        lambda: {
-            "model_runs": [
-                {
-                    "id": "my_run",
-                    "path": "/data/renamed_dir",
-                    "teehr_configuration_name": "ngen_original_stem",
-                }
-            ]
-        },
+    _register_runs(
+        monkeypatch,
+        tmp_path,
+        [
+            {
+                "id": "my_run",
+                "path": "/data/renamed_dir",
+                "teehr_configuration_name": "ngen_original_stem",
+            }
+        ],
     )
     assert ngiab_utils._resolve_configuration_name("my_run") == "ngen_original_stem"
 
 
 def test_resolve_configuration_name_falls_back_to_derivation(
-    warehouse_path, monkeypatch
+    warehouse_path, tmp_path, monkeypatch
 ):
     """With no persisted field, derive from basename and validate via warehouse."""
     monkeypatch.setenv("TEEHR_WAREHOUSE_PATH", str(warehouse_path))
-    monkeypatch.setattr(
-        ngiab_utils,
-        "_get_list_model_runs",
-        lambda: {
-            "model_runs": [
-                {"id": "my_run", "path": "/home/aquagio/ngiab"}
-            ]
-        },
+    _register_runs(
+        monkeypatch, tmp_path, [{"id": "my_run", "path": "/home/aquagio/ngiab"}]
     )
     # Fixture warehouse was built with --data_folder_stem ngiab.
     assert ngiab_utils._resolve_configuration_name("my_run") == "ngen_ngiab"
 
 
 def test_resolve_configuration_name_fallback_returns_none_when_derivation_misses(
-    warehouse_path, monkeypatch
+    warehouse_path, tmp_path, monkeypatch
 ):
     """Fallback that derives a nonexistent config name returns None (not a false match)."""
     monkeypatch.setenv("TEEHR_WAREHOUSE_PATH", str(warehouse_path))
-    monkeypatch.setattr(
-        ngiab_utils,
-        "_get_list_model_runs",
-        lambda: {
-            "model_runs": [
-                {"id": "my_run", "path": "/somewhere/different_basename"}
-            ]
-        },
+    _register_runs(
+        monkeypatch,
+        tmp_path,
+        [{"id": "my_run", "path": "/somewhere/different_basename"}],
     )
     assert ngiab_utils._resolve_configuration_name("my_run") is None
 
 
-def test_resolve_configuration_name_unknown_run_id_returns_none(monkeypatch):
-    monkeypatch.setattr(
-        ngiab_utils, "_get_list_model_runs", lambda: {"model_runs": []}
-    )
+def test_resolve_configuration_name_unknown_run_id_returns_none(tmp_path, monkeypatch):
+    _register_runs(monkeypatch, tmp_path, [])
     assert ngiab_utils._resolve_configuration_name("nothing") is None
 
 
@@ -329,6 +482,32 @@ def test_get_metrics_for_location_unknown_location_returns_empty(reader):
     assert reader.get_metrics_for_location("ngen_ngiab", "usgs-not-real") == []
 
 
+def test_get_metrics_layer_one_row_per_location(reader):
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    table = reader.get_metrics_layer("ngen_ngiab")
+    assert table.column_names == ["primary_location_id", *METRIC_COLUMNS]
+    ids = table.column("primary_location_id").to_pylist()
+    assert ids == sorted(set(ids)) and loc in ids
+    row = table.filter(pc.equal(table["primary_location_id"], loc)).to_pylist()[0]
+    per_location = {m["metric"]: m["ngen_ngiab"] for m in reader.get_metrics_for_location("ngen_ngiab", loc)}
+    for metric in METRIC_COLUMNS:
+        assert row[metric] == pytest.approx(per_location[metric], nan_ok=True)
+
+
+def test_get_metrics_layer_with_geometry(reader):
+    table = reader.get_metrics_layer("ngen_ngiab", include_geometry=True)
+    assert table.column_names[-2:] == ["longitude", "latitude"]
+    assert table.num_rows == reader.get_metrics_layer("ngen_ngiab").num_rows
+    located = table.filter(pc.is_valid(table["longitude"]))
+    assert located.num_rows > 0
+    for lon, lat in zip(located["longitude"].to_pylist(), located["latitude"].to_pylist()):
+        assert -180 <= lon <= 180 and -90 <= lat <= 90
+
+
+def test_get_metrics_layer_unknown_configuration_is_empty(reader):
+    assert reader.get_metrics_layer("ngen_not_real").num_rows == 0
+
+
 # ---- get_joined_timeseries (drift guard) --------------------------------
 
 
@@ -387,6 +566,76 @@ def test_get_joined_timeseries_returns_two_series(reader):
             assert set(pt.keys()) == {"x", "y"}
 
 
+def test_get_joined_timeseries_max_points_keeps_series_paired(reader):
+    """Downsampled series stay paired point-for-point and keep their endpoints."""
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    full = reader.get_joined_timeseries("ngen_ngiab", "streamflow_hourly_inst", loc)
+    n = len(full[0]["data"])
+    if n <= 20:
+        pytest.skip("fixture series too short to downsample")
+    reduced = reader.get_joined_timeseries(
+        "ngen_ngiab", "streamflow_hourly_inst", loc, max_points=10
+    )
+    primary_x = [pt["x"] for pt in reduced[0]["data"]]
+    assert primary_x == [pt["x"] for pt in reduced[1]["data"]]
+    assert len(primary_x) <= 20
+    assert primary_x[0] == full[0]["data"][0]["x"]
+    assert primary_x[-1] == full[0]["data"][-1]["x"]
+
+
+def test_get_joined_timeseries_columnar_matches_records(reader):
+    """The columnar format carries the same points as the default records."""
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    records = reader.get_joined_timeseries("ngen_ngiab", "streamflow_hourly_inst", loc)
+    columnar = reader.get_joined_timeseries(
+        "ngen_ngiab", "streamflow_hourly_inst", loc, series_format="columnar"
+    )
+    assert [s["label"] for s in columnar] == [s["label"] for s in records]
+    for rec, col in zip(records, columnar):
+        assert col["data"]["x"] == [pt["x"] for pt in rec["data"]]
+        assert col["data"]["y"] == [pt["y"] for pt in rec["data"]]
+
+
+def test_get_joined_timeseries_time_window(reader):
+    """``start``/``end`` keep only the (inclusive) window, in both outputs."""
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    full = reader.get_joined_timeseries("ngen_ngiab", "streamflow_hourly_inst", loc)
+    xs = [pt["x"] for pt in full[0]["data"]]
+    if len(xs) < 10:
+        pytest.skip("fixture series too short to window")
+    start, end = (datetime.strptime(xs[i], "%Y-%m-%d %H:%M:%S") for i in (3, 8))
+    windowed = reader.get_joined_timeseries(
+        "ngen_ngiab", "streamflow_hourly_inst", loc, start=start, end=end
+    )
+    assert [pt["x"] for pt in windowed[0]["data"]] == xs[3:9]
+    assert [pt["x"] for pt in windowed[1]["data"]] == xs[3:9]
+    table = reader.get_joined_timeseries_table(
+        "ngen_ngiab", "streamflow_hourly_inst", loc, start=start, end=end
+    )
+    assert table.num_rows == 2 * 6
+
+
+def test_snapshot_token_is_stable(reader):
+    token = reader.snapshot_token()
+    assert token == reader.snapshot_token()
+    assert len(token) == 40
+
+
+def test_get_joined_timeseries_table_matches_records(reader):
+    """The Arrow table holds the same two series as the JSON records."""
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    records = reader.get_joined_timeseries("ngen_ngiab", "streamflow_hourly_inst", loc)
+    table = reader.get_joined_timeseries_table("ngen_ngiab", "streamflow_hourly_inst", loc)
+    assert table.column_names == ["series", "time", "value"]
+    series = table["series"].to_pylist()
+    values = table["value"].to_pylist()
+    for rec in records:
+        assert [v for s, v in zip(series, values) if s == rec["label"]] == [
+            pt["y"] for pt in rec["data"]
+        ]
+    assert reader.get_joined_timeseries_table("ngen_ngiab", "streamflow_hourly_inst", "usgs-none") is None
+
+
 # ---- Drift guard: recompute metrics from our join and compare ----------
 
 # Tolerance rationale: Spark (teehr side) and DuckDB + pandas (our side) accumulate
@@ -486,3 +735,78 @@ def test_joined_timeseries_matches_ngen_metrics_drift_guard(reader):
         "join semantics in get_joined_timeseries no longer match teehr's "
         "joined_timeseries_view(). Details:\n  " + "\n  ".join(mismatches)
     )
+
+
+# ---- compute_metrics ----------------------------------------------------
+
+
+def test_compute_metrics_matches_ngen_metrics(reader):
+    """Full-period metrics computed in DuckDB agree with teehr's ngen_metrics."""
+    computed = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst").to_pylist()
+    assert computed
+    teehr = {row["primary_location_id"]: row for row in reader.get_metrics_layer("ngen_ngiab").to_pylist()}
+    for row in computed:
+        expected = teehr[row["primary_location_id"]]
+        for metric in METRIC_COLUMNS:
+            assert math.isclose(row[metric], expected[metric], rel_tol=METRIC_RTOL, abs_tol=METRIC_ATOL)
+
+
+def test_compute_metrics_for_one_location_and_window(reader):
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    everything = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst")
+    one = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc).to_pylist()
+    assert [row["primary_location_id"] for row in one] == [loc]
+    assert one[0] == pytest.approx(
+        everything.filter(pc.equal(everything["primary_location_id"], loc)).to_pylist()[0]
+    )
+
+    series = reader.get_joined_timeseries("ngen_ngiab", "streamflow_hourly_inst", loc)
+    times = [pt["x"] for pt in series[0]["data"]]
+    start, end = datetime.fromisoformat(times[10]), datetime.fromisoformat(times[59])
+    windowed = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc, start=start, end=end)
+    assert windowed["sample_size"].to_pylist() == [50]
+    primary = [pt["y"] for pt in series[0]["data"][10:60]]
+    secondary = [pt["y"] for pt in series[1]["data"][10:60]]
+    assert windowed["nash_sutcliffe_efficiency"][0].as_py() == pytest.approx(
+        _nash_sutcliffe(primary, secondary), rel=1e-6
+    )
+
+
+def test_compute_metrics_grouped_by_period(reader):
+    loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+    total = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc)["sample_size"][0].as_py()
+    monthly = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc, group_by="month")
+    periods = monthly["period"].to_pylist()
+    assert periods == sorted(periods) and all(len(p) == 7 and p[4] == "-" for p in periods)
+    assert sum(monthly["sample_size"].to_pylist()) == total
+    yearly = reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc, group_by="water_year")
+    assert sum(yearly["sample_size"].to_pylist()) == total
+    with pytest.raises(ValueError):
+        reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc, group_by="decade")
+
+
+def test_metric_periods_are_utc_whatever_the_host_time_zone(warehouse_path, monkeypatch):
+    connect = teehr_warehouse.duckdb.connect
+
+    def connect_in_denver(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.execute("SET TimeZone='America/Denver'")  # as on a host in Mountain time
+        return conn
+
+    monkeypatch.setattr(teehr_warehouse.duckdb, "connect", connect_in_denver)
+    periods = teehr_warehouse.METRIC_PERIODS
+    with WarehouseReader(warehouse_path) as reader:
+        with teehr_warehouse._utc_time_zone(reader._conn) as conn:
+            for value_time, month, water_year in (
+                ("2022-09-30 23:30:00+00", "2022-09", 2022),
+                ("2022-10-01 00:30:00+00", "2022-10", 2023),  # 2022-09-30 18:30 in Denver
+            ):
+                row = conn.execute(
+                    f"SELECT {periods['month']}, {periods['water_year']} "
+                    f"FROM (SELECT TIMESTAMPTZ '{value_time}' AS value_time) p"
+                ).fetchone()
+                assert row == (month, water_year)
+        # Other queries (e.g. get_joined_timeseries) keep the connection's zone.
+        loc = _usgs_id_with_metrics(reader, "ngen_ngiab")
+        reader.compute_metrics("ngen_ngiab", "streamflow_hourly_inst", loc, group_by="month")
+        assert reader._conn.execute("SELECT current_setting('TimeZone')").fetchone() == ("America/Denver",)
@@ -0,0 +1,94 @@
+"""Tests for tethysapp.ngiab.timeseries."""
+
+from datetime import datetime
+
+import numpy as np
+
+from tethysapp.ngiab.timeseries import (
+    downsample,
+    lttb_indices,
+    minmax_indices,
+    parse_max_points,
+    parse_series_format,
+    parse_time_window,
+    series_payload,
+)
+
+
+def _signal(n=10_000):
+    x = np.linspace(0, 20 * np.pi, n)
+    y = np.sin(x)
+    y[n // 2 + 7] = 25.0  # a single flood peak
+    return y
+
+
+def test_parse_max_points():
+    assert parse_max_points("500") == 500
+    assert parse_max_points(None) is None
+    assert parse_max_points("abc") is None
+    assert parse_max_points("0") is None
+
+
+def test_lttb_keeps_endpoints_and_peak():
+    y = _signal()
+    idx = lttb_indices(y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert len(y) // 2 + 7 in idx
+
+
+def test_lttb_ignores_nan_when_finite_values_exist():
+    y = _signal(1000)
+    y[10:20] = np.nan
+    idx = lttb_indices(y, 50)
+    assert not np.isnan(y[idx[1:-1]]).any()
+
+
+def test_minmax_keeps_global_extremes():
+    y = _signal()
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 100
+    assert np.argmax(y) in idx
+    assert np.argmin(y) in idx
+
+
+def test_downsample_short_series_is_untouched():
+    times, values = ["a", "b", "c"], [1.0, 2.0, 3.0]
+    assert downsample(times, values, 10) == (times, values)
+    assert downsample(times, values, None) == (times, values)
+
+
+def test_downsample_returns_matching_lists():
+    y = _signal(5000)
+    times = [f"t{i}" for i in range(len(y))]
+    out_times, out_values = downsample(times, y.tolist(), 300, "minmax")
+    assert len(out_times) == len(out_values) <= 300
+    assert out_times[0] == "t0" and out_times[-1] == "t4999"
+    assert isinstance(out_values[0], float)
+
+
+def test_downsample_tiny_limits_keep_at_most_max_points():
+    y = _signal(100_000)
+    times = list(range(len(y)))
+    for method in ("lttb", "minmax"):
+        for max_points in (1, 2, 3):
+            out_times, _ = downsample(times, y, max_points, method)
+            assert len(out_times) <= max_points
+            assert out_times[0] == 0 and (max_points == 1 or out_times[-1] == len(y) - 1)
+
+
+def test_series_payload_formats():
+    times, values = np.array(["t0", "t1"]), np.array([1.5, 2.5])
+    assert series_payload(times, values) == [{"x": "t0", "y": 1.5}, {"x": "t1", "y": 2.5}]
+    assert series_payload(times, values, "columnar") == {"x": ["t0", "t1"], "y": [1.5, 2.5]}
+    assert parse_series_format("columnar") == "columnar"
+    assert parse_series_format(None) == parse_series_format("bogus") == "records"
+
+
+def test_parse_time_window():
+    assert parse_time_window("2022-08-24", "2022-08-25T06:00:00Z") == (
+        datetime(2022, 8, 24),
+        datetime(2022, 8, 25, 6),
+    )
+    assert parse_time_window(None, "not-a-date") == (None, None)
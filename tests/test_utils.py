@@ -0,0 +1,375 @@
+"""Tests for the run-output helpers in tethysapp.ngiab.utils."""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from shapely.geometry import Point
+
+from tethysapp.ngiab import utils as ngiab_utils
+
+TIMES = ["2022-08-24 13:00:00", "2022-08-24 14:00:00", "2022-08-24 15:00:00"]
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    """A registered run ``run_A`` with two catchment and one nexus output."""
+    run = tmp_path / "run_A"
+    (run / "config").mkdir(parents=True)
+    (run / "config" / "realization.json").write_text(
+        json.dumps({"output_root": "/ngen/ngen/data/outputs/ngen"})
+    )
+    out = run / "outputs" / "ngen"
+    out.mkdir(parents=True)
+    for n, cat in enumerate(("cat-1", "cat-2")):
+        pd.DataFrame(
+            {"Time": TIMES, "Q_OUT": [n + 0.5, n + 1.5, n + 2.5], "RAIN_RATE": [0.0, 0.1, 0.2]}
+        ).to_csv(out / f"{cat}.csv")
+    pd.DataFrame([[0, t, float(i)] for i, t in enumerate(TIMES)]).to_csv(
+        out / "nex-3_output.csv", header=False, index=False
+    )
+    conf = tmp_path / "ngiab_visualizer.json"
+    conf.write_text(json.dumps({"model_runs": [{"id": "run_A", "label": "A", "path": str(run)}]}))
+    monkeypatch.setenv("VISUALIZER_CONF", str(conf))
+    monkeypatch.delenv("NGIAB_CACHE_DIR", raising=False)
+    return run
+
+
+# ---- read_catchment_series / read_nexus_series --------------------------
+
+
+def test_read_catchment_series_defaults_to_first_variable(run_dir):
+    variables, variable, times, values = ngiab_utils.read_catchment_series("run_A", "cat-2")
+    assert variables == ["Q_OUT", "RAIN_RATE"]
+    assert variable == "Q_OUT"
+    assert times == TIMES
+    assert values == [1.5, 2.5, 3.5]
+
+
+def test_read_catchment_series_prefers_current_store(run_dir):
+    ngiab_utils.build_catchment_store("run_A")
+    assert ngiab_utils.get_catchment_store_path("run_A") is not None
+    _, variable, times, values = ngiab_utils.read_catchment_series("run_A", "cat-1", "RAIN_RATE")
+    assert variable == "RAIN_RATE"
+    assert times == TIMES
+    assert values == [0.0, 0.1, 0.2]  # float64, as read from the CSV
+
+
+def test_read_catchment_series_ignores_store_older_than_csv(run_dir):
+    store_path = ngiab_utils.build_catchment_store("run_A")
+    out = run_dir / "outputs" / "ngen"
+    dir_mtime = os.stat(out).st_mtime_ns
+    pd.DataFrame({"Time": TIMES, "Q_OUT": [99.0] * 3, "RAIN_RATE": [0.0] * 3}).to_csv(out / "cat-1.csv")
+    store_mtime = os.stat(store_path).st_mtime_ns
+    os.utime(out / "cat-1.csv", ns=(store_mtime + 10**9, store_mtime + 10**9))
+    os.utime(out, ns=(dir_mtime, dir_mtime))  # rewritten in place: listing unchanged
+    assert ngiab_utils.get_catchment_store_path("run_A") == store_path
+
+    assert ngiab_utils.read_catchment_series("run_A", "cat-1")[3] == [99.0] * 3
+    series, _ = ngiab_utils.read_time_series_batch("run_A", ["cat-1", "cat-2"])
+    assert [s[3] for s in series] == [[99.0] * 3, [1.5, 2.5, 3.5]]
+
+
+def test_read_nexus_series_missing_file_returns_none(run_dir):
+    assert ngiab_utils.read_nexus_series("run_A", "nex-404") is None
+    assert ngiab_utils.read_nexus_series("run_A", "nex-3") == (TIMES, [0.0, 1.0, 2.0])
+
+
+# ---- read_time_series_batch ---------------------------------------------
+
+
+def test_batch_reads_mixed_ids_in_order_and_reports_missing(run_dir):
+    series, missing = ngiab_utils.read_time_series_batch(
+        "run_A", ["nex-3", "cat-404", "cat-2", "cat-1"], "RAIN_RATE"
+    )
+    assert [s[0] for s in series] == ["nex-3", "cat-2", "cat-1"]
+    assert series[0][1] == "Streamflow"
+    assert series[1][1] == "RAIN_RATE"
+    assert missing == ["cat-404"]
+
+
+def test_batch_reads_repeated_ids_once(run_dir):
+    series, missing = ngiab_utils.read_time_series_batch(
+        "run_A", ["cat-2", "cat-404", "cat-2", "cat-1", "cat-404"], "RAIN_RATE"
+    )
+    assert [s[0] for s in series] == ["cat-2", "cat-1"]
+    assert missing == ["cat-404"]
+
+
+def test_batch_with_no_ids(run_dir):
+    assert ngiab_utils.read_time_series_batch("run_A", []) == ([], [])
+
+
+# ---- time windows ---------------------------------------------------------
+
+
+WINDOW = (datetime(2022, 8, 24, 14), None)
+
+
+def test_read_catchment_series_window_csv_and_store(run_dir):
+    _, _, times, values = ngiab_utils.read_catchment_series("run_A", "cat-1", "Q_OUT", *WINDOW)
+    assert times == TIMES[1:]
+    assert values == [1.5, 2.5]
+
+    ngiab_utils.build_catchment_store("run_A")
+    _, _, times, values = ngiab_utils.read_catchment_series(
+        "run_A", "cat-1", "Q_OUT", None, datetime(2022, 8, 24, 14)
+    )
+    assert times == TIMES[:2]
+    assert values == [0.5, 1.5]
+
+
+def test_read_nexus_series_window(run_dir):
+    assert ngiab_utils.read_nexus_series("run_A", "nex-3", *WINDOW) == (TIMES[1:], [1.0, 2.0])
+
+
+def test_read_troute_series_netcdf_window(run_dir):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    xr.Dataset(
+        {"flow": (("feature_id", "time"), np.array([[1.0, np.nan, 3.0], [4.0, 5.0, 6.0]]))},
+        coords={"feature_id": [10, 20], "time": pd.to_datetime(TIMES)},
+    ).to_netcdf(troute / "troute_output.nc")
+
+    assert ngiab_utils.read_troute_series("run_A", "10", "flow") == (TIMES, [1.0, -9999.0, 3.0])
+    assert ngiab_utils.read_troute_series("run_A", "20", "flow", *WINDOW) == (TIMES[1:], [5.0, 6.0])
+
+
+def test_troute_reader_netcdf_and_csv(run_dir):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    nc_path = troute / "troute_output.nc"
+    xr.Dataset(
+        {
+            "flow": (("feature_id", "time"), np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])),
+            "depth": (("feature_id", "time"), np.zeros((2, 3))),
+            "time_step": (("time",), np.arange(3)),
+            "reach_length": (("feature_id",), np.array([100.0, 200.0])),
+        },
+        coords={"feature_id": [10, 20], "time": pd.to_datetime(TIMES)},
+    ).to_netcdf(nc_path)
+
+    reader = ngiab_utils.get_troute_reader("run_A")
+    assert reader.file_type == "NetCDF"
+    assert ngiab_utils.get_troute_reader("run_A") is reader
+    assert sorted(reader.variables()) == ["depth", "flow"]
+    assert reader.has_feature("20") and not reader.has_feature("30")
+    assert reader.series("20", "flow") == (TIMES, [4.0, 5.0, 6.0])
+
+    pd.DataFrame(
+        {
+            "featureID": [20, 10, 20],
+            "Type": ["wb"] * 3,
+            "current_time": [TIMES[0], TIMES[0], TIMES[1]],
+            "flow": [4.0, 1.0, 5.0],
+        }
+    ).to_csv(troute / "troute_output.csv", index=False)
+    reader = ngiab_utils.get_troute_reader("run_A")
+    assert reader.file_type == "CSV"
+    assert reader.variables() == ["flow"]
+    assert reader.has_feature(10) and not reader.has_feature(30)
+    assert reader.series("20", "flow") == (TIMES[:2], [4.0, 5.0])
+    with pytest.raises(KeyError):
+        reader.series("30", "flow")
+
+
+def test_replaced_troute_reader_stays_readable(run_dir):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+
+    def write_chunk(name, times):
+        xr.Dataset(
+            {"flow": (("feature_id", "time"), np.ones((1, len(times))))},
+            coords={"feature_id": [10], "time": pd.to_datetime(times)},
+        ).to_netcdf(troute / name)
+
+    write_chunk("troute_202208241300.nc", TIMES[:2])
+    reader = ngiab_utils.get_troute_reader("run_A")
+    with reader:
+        assert reader.series("10", "flow") == (TIMES[:2], [1.0, 1.0])
+        # t-route writes another chunk while a request still holds the old reader.
+        write_chunk("troute_202208241500.nc", TIMES[2:])
+        assert ngiab_utils.get_troute_reader("run_A") is not reader
+        assert reader.series("10", "flow") == (TIMES[:2], [1.0, 1.0])
+        assert reader._datasets is not None
+    # The replaced reader closes its files once the request is done with it.
+    assert reader._datasets is None
+
+
+def test_troute_readers_are_bounded(run_dir, monkeypatch):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    xr.Dataset(
+        {"flow": (("feature_id", "time"), np.ones((1, 3)))},
+        coords={"feature_id": [10], "time": pd.to_datetime(TIMES)},
+    ).to_netcdf(troute / "troute_output.nc")
+    monkeypatch.setattr(ngiab_utils, "TROUTE_MAX_READERS", 1)
+    monkeypatch.setenv("NGIAB_CACHE_DIR", str(run_dir / "cache"))
+    monkeypatch.setattr(ngiab_utils, "_troute_readers", ngiab_utils.OrderedDict())
+    monkeypatch.setattr(
+        ngiab_utils, "_find_troute_files", lambda model_id: ("NetCDF", [str(troute / "troute_output.nc")])
+    )
+    first = ngiab_utils.get_troute_reader("run_A")
+    assert ngiab_utils.get_troute_reader("run_A") is first
+    ngiab_utils.get_troute_reader("run_B")
+    assert list(ngiab_utils._troute_readers) == ["run_B"]
+    assert ngiab_utils.get_troute_reader("run_A") is not first
+
+
+def test_troute_reader_metadata_does_not_load_outputs(run_dir, monkeypatch):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    pd.DataFrame(
+        {"featureID": [30, 10, 30], "Type": ["wb"] * 3, "current_time": TIMES, "flow": [1.0] * 3}
+    ).to_csv(troute / "troute_output.csv", index=False)
+
+    def _fail(*args):
+        raise AssertionError("t-route outputs were loaded")
+
+    monkeypatch.setattr(ngiab_utils, "_get_cached_troute_df", _fail)
+    reader = ngiab_utils.get_troute_reader("run_A")
+    assert reader.variables() == ["flow"]
+    assert reader.feature_ids().tolist() == [10, 30]
+    assert reader.has_feature("30")
+    assert not reader.has_feature("20") and not reader.has_feature("40")
+
+
+def test_troute_reader_concatenates_chunks(run_dir):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    # Two chunks sharing the boundary time; the second one is missing reach 20.
+    for name, times, ids in (
+        ("troute_202208241400.nc", TIMES[1:], [10]),
+        ("troute_202208241300.nc", TIMES[:2], [10, 20]),
+    ):
+        xr.Dataset(
+            {"flow": (("feature_id", "time"), np.full((len(ids), len(times)), float(len(name))))},
+            coords={"feature_id": ids, "time": pd.to_datetime(times)},
+        ).to_netcdf(troute / name)
+    reader = ngiab_utils.get_troute_reader("run_A")
+    assert len(reader.file_paths) == 2
+    assert reader.feature_ids().tolist() == [10, 20]
+    times, values = reader.series("10", "flow")
+    assert times == TIMES and len(values) == 3
+    assert reader.series("20", "flow") == (TIMES[:2], [22.0, 22.0])
+    assert reader.series("10", "flow", datetime(2022, 8, 24, 15), None)[0] == TIMES[2:]
+    with pytest.raises(KeyError):
+        reader.series("30", "flow")
+
+    df = ngiab_utils.get_troute_df("run_A")
+    assert sorted(set(df.index.get_level_values("feature_id"))) == [10, 20]
+
+
+def test_troute_reader_uses_current_store(run_dir, monkeypatch):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    xr.Dataset(
+        {"flow": (("feature_id", "time"), np.array([[1.0, 2.0, 3.0]]))},
+        coords={"feature_id": [10], "time": pd.to_datetime(TIMES)},
+    ).to_netcdf(troute / "troute_output.nc")
+    reader = ngiab_utils.get_troute_reader("run_A")
+    assert not reader.has_store()
+
+    monkeypatch.setattr(ngiab_utils, "TROUTE_STORE_AUTOBUILD", True)
+    expected = reader.series("10", "flow")
+    for thread in list(threading.enumerate()):
+        if thread.name == "troute-store-run_A":
+            thread.join()
+    assert reader.has_store()
+
+    monkeypatch.setattr(ngiab_utils, "_select_troute_chunk", None)  # must not be used
+    assert reader.series("10", "flow") == expected
+    with pytest.raises(KeyError):
+        reader.series("30", "flow")
+
+
+def test_failed_troute_store_build_is_retried_after_delay(monkeypatch):
+    monkeypatch.setattr(ngiab_utils, "_troute_store_failures", {})
+    calls = []
+
+    def build(model_id):
+        calls.append(model_id)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    monkeypatch.setattr(ngiab_utils, "build_troute_store", build)
+    ngiab_utils.schedule_troute_store_build("run_A").join()
+    assert "run_A" not in ngiab_utils._troute_store_builds
+    assert ngiab_utils.schedule_troute_store_build("run_A") is None
+
+    monkeypatch.setattr(ngiab_utils, "TROUTE_STORE_RETRY_SECONDS", 0)
+    ngiab_utils.schedule_troute_store_build("run_A").join()
+    assert calls == ["run_A", "run_A"]
+    assert ngiab_utils._troute_store_failures == {}
+
+
+def test_get_troute_df_is_cached_until_file_changes(run_dir, monkeypatch):
+    troute = run_dir / "outputs" / "troute"
+    troute.mkdir(parents=True)
+    csv_path = troute / "troute_output.csv"
+    pd.DataFrame(
+        {"featureID": [10, 10], "Type": ["wb", "wb"], "current_time": TIMES[:2], "flow": [1.0, None]}
+    ).to_csv(csv_path, index=False)
+    monkeypatch.setattr(ngiab_utils, "_troute_cache", ngiab_utils.ByteBudgetLRU(10**8))
+
+    first = ngiab_utils.get_troute_df("run_A")
+    assert ngiab_utils.get_troute_df("run_A") is first
+    assert ngiab_utils.read_troute_series("run_A", "10", "flow") == (TIMES[:2], [1.0, -9999.0])
+    assert ngiab_utils.troute_cache_stats()["hits"] == 2
+
+    pd.DataFrame(
+        {"featureID": [10], "Type": ["wb"], "current_time": TIMES[:1], "flow": [7.0]}
+    ).to_csv(csv_path, index=False)
+    assert ngiab_utils.get_troute_df("run_A")["flow"].tolist() == [7.0]
+    # DataFrame load, the reader's feature row index, then the reload.
+    assert ngiab_utils.troute_cache_stats()["misses"] == 3
+
+
+# ---- id listings ---------------------------------------------------------
+
+
+def test_id_listings_come_from_output_index(run_dir):
+    assert ngiab_utils.getCatchmentsList("run_A") == ["cat-1", "cat-2"]
+    assert ngiab_utils.getNexusList("run_A") == ["nex-3"]
+    assert ngiab_utils.getCatchmentsIds("run_A") == [
+        {"value": "cat-1", "label": "cat-1"},
+        {"value": "cat-2", "label": "cat-2"},
+    ]
+    assert ngiab_utils.getNexusIDs("run_A") == [{"value": "nex-3", "label": "nex-3"}]
+
+
+# ---- cache validators ----------------------------------------------------
+
+
+def test_run_output_validator_tracks_requested_files(run_dir):
+    before = ngiab_utils.get_run_output_validator("run_A", ["cat-1.csv"])
+    assert before is not None
+    assert ngiab_utils.get_run_output_validator("run_A", ["cat-1.csv"]) == before
+
+    (run_dir / "outputs" / "ngen" / "cat-1.csv").write_text("rewritten")
+    assert ngiab_utils.get_run_output_validator("run_A", ["cat-1.csv"])[0] != before[0]
+    assert ngiab_utils.get_run_output_validator("run_missing") is None
+
+
+def test_run_pmtiles_is_current_until_geopackage_changes(run_dir):
+    assert ngiab_utils.build_run_pmtiles("run_A") is None  # no GeoPackage yet
+    assert ngiab_utils.get_run_pmtiles_path("run_A") is None
+
+    gpkg = run_dir / "config" / "hf.gpkg"
+    gpd.GeoDataFrame({"id": ["nex-3"]}, geometry=[Point(-87.5, 33.2)], crs="EPSG:4326").to_file(
+        gpkg, layer="nexus"
+    )
+    pmtiles_path = ngiab_utils.build_run_pmtiles("run_A")
+    assert pmtiles_path == str(run_dir / ".ngiab_cache" / "hydrofabric.pmtiles")
+    assert ngiab_utils.get_run_pmtiles_path("run_A") == pmtiles_path
+
+    later = os.stat(pmtiles_path).st_mtime + 10
+    os.utime(gpkg, (later, later))
+    assert ngiab_utils.get_run_pmtiles_path("run_A") is None
+    assert ngiab_utils.get_run_pmtiles_path("unknown") is None
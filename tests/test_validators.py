@@ -0,0 +1,35 @@
+"""Tests for the response cache validators."""
+
+from tethysapp.ngiab.validators import combine_validators, stat_validator
+
+
+def test_stat_validator_changes_with_content(tmp_path):
+    path = tmp_path / "cat-1.csv"
+    path.write_text("a")
+    first = stat_validator([str(path)])
+    assert first is not None
+    assert stat_validator([str(path)]) == first
+
+    path.write_text("ab")
+    second = stat_validator([str(path)])
+    assert second[0] != first[0]
+
+
+def test_stat_validator_tracks_missing_paths(tmp_path):
+    present = tmp_path / "a"
+    present.write_text("a")
+    missing = tmp_path / "b"
+    before = stat_validator([str(present), str(missing)])
+    missing.write_text("b")
+    assert stat_validator([str(present), str(missing)])[0] != before[0]
+    assert stat_validator([str(tmp_path / "none")]) is None
+
+
+def test_combine_validators(tmp_path):
+    path = tmp_path / "a"
+    path.write_text("a")
+    files = stat_validator([str(path)])
+    combined = combine_validators(files, ("snapshot-1", None))
+    assert combined[1] == files[1]
+    assert combined[0] != combine_validators(files, ("snapshot-2", None))[0]
+    assert combine_validators(None, None) is None
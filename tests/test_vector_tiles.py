@@ -0,0 +1,117 @@
+import geopandas as gpd
+import mapbox_vector_tile
+import pytest
+from shapely.geometry import LineString, Point, Polygon
+
+from tethysapp.ngiab.vector_tiles import (
+    EXTENT,
+    build_pmtiles,
+    cached_tile,
+    encode_tile,
+    is_valid_tile,
+    render_tile,
+    tile_bounds,
+)
+
+
+def decode_tile(data):
+    return mapbox_vector_tile.decode(data, default_options={"y_coord_down": True})
+
+
+def _shoelace(ring):
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-20037508.34, -20037508.34, 20037508.34, 20037508.34))
+    minx, miny, maxx, maxy = tile_bounds(1, 1, 0)
+    assert (minx, miny) == pytest.approx((0, 0)) and maxx == maxy
+    assert is_valid_tile(3, 7, 7) and not is_valid_tile(3, 8, 0) and not is_valid_tile(-1, 0, 0)
+
+
+def test_encode_layer_geometries_and_properties():
+    square = Polygon([(10, 10), (20, 10), (20, 20), (10, 20)])  # negative area in tile coordinates
+    tile = decode_tile(
+        encode_tile(
+            {
+                "demo": [
+                    (Point(5, 6), {"id": "nex-1", "order": 3, "area": 1.5, "ok": True, "x": None}),
+                    (LineString([(0, 0), (0, 0), (3, 4)]), {"id": "wb-1"}),
+                    (square, {"id": "cat-1"}),
+                    (Polygon(), {"id": "empty"}),
+                ]
+            }
+        )
+    )
+    layer = tile["demo"]
+    assert layer["version"] == 2 and layer["extent"] == EXTENT
+    point, line, polygon = (feature["geometry"] for feature in layer["features"])
+    assert point == {"type": "Point", "coordinates": [5, 6]}
+    assert layer["features"][0]["properties"] == {"id": "nex-1", "order": 3, "area": 1.5, "ok": True}
+    assert line == {"type": "LineString", "coordinates": [[0, 0], [3, 4]]}
+    ring = [tuple(point) for point in polygon["coordinates"][0][:-1]]
+    assert polygon["type"] == "Polygon" and len(ring) == 4 and _shoelace(ring) > 0
+
+
+@pytest.fixture
+def hydrofabric(tmp_path):
+    # Two nexuses and one flowpath around Tuscaloosa, AL, stored in CONUS Albers like the hydrofabric.
+    gpkg = str(tmp_path / "hf.gpkg")
+    nexus = gpd.GeoDataFrame(
+        {"id": ["nex-1", "nex-2"], "toid": ["wb-1", "wb-2"]},
+        geometry=[Point(-87.56, 33.21), Point(-87.50, 33.25)],
+        crs="EPSG:4326",
+    ).to_crs("EPSG:5070")
+    nexus.to_file(gpkg, layer="nexus")
+    gpd.GeoDataFrame(
+        {"id": ["wb-1"]},
+        geometry=[LineString([(-87.56, 33.21), (-87.53, 33.23), (-87.50, 33.25)])],
+        crs="EPSG:4326",
+    ).to_crs("EPSG:5070").to_file(gpkg, layer="flowpaths")
+    return gpkg
+
+
+def test_render_tile_reads_only_features_in_view(hydrofabric):
+    # z8 tile containing both points; the z12 tile contains only nex-1.
+    tile = decode_tile(render_tile(hydrofabric, "nexus", 8, 65, 102))
+    assert sorted(f["properties"]["id"] for f in tile["nexus"]["features"]) == ["nex-1", "nex-2"]
+
+    x, y = 1051, 1647
+    tile = decode_tile(render_tile(hydrofabric, "nexus", 12, x, y))
+    assert [f["properties"] for f in tile["nexus"]["features"]] == [{"id": "nex-1", "toid": "wb-1"}]
+    assert all(0 <= c <= EXTENT for c in tile["nexus"]["features"][0]["geometry"]["coordinates"])
+
+    lines = decode_tile(render_tile(hydrofabric, "flowpaths", 8, 65, 102))["flowpaths"]["features"]
+    assert lines[0]["geometry"]["type"] == "LineString" and len(lines[0]["geometry"]["coordinates"]) >= 2
+    assert render_tile(hydrofabric, "nexus", 8, 0, 0) == b""
+
+
+def test_cached_tile_renders_once_per_token(tmp_path):
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"tile"
+
+    cache_dir = str(tmp_path)
+    assert cached_tile(cache_dir, "a", "nexus", 1, 0, 0, render) == b"tile"
+    assert cached_tile(cache_dir, "a", "nexus", 1, 0, 0, render) == b"tile"
+    assert len(calls) == 1
+    cached_tile(cache_dir, "b", "nexus", 1, 0, 0, render)
+    assert len(calls) == 2
+    assert not (tmp_path / "tiles-a").exists()
+
+
+def test_build_pmtiles_renders_run_layers(hydrofabric, tmp_path):
+    from test_pmtiles import read_pmtiles
+
+    path = str(tmp_path / "hf.pmtiles")
+    assert build_pmtiles(hydrofabric, path, max_zoom=8) == 9  # one tile per zoom
+    header, metadata, get_tile = read_pmtiles(path)
+    assert {layer["id"] for layer in metadata["vector_layers"]} == {"nexus", "conus_flowpaths"}
+    assert header["min_lon_e7"] == pytest.approx(-87.56e7, rel=1e-6)
+    assert header["clustered"]
+    tile = decode_tile(get_tile(8, 65, 102))
+    assert set(tile) == {"nexus", "conus_flowpaths"}
+    assert len(tile["nexus"]["features"]) == 2
+    assert get_tile(8, 0, 0) is None
@@ -0,0 +1,124 @@
+"""Arrow IPC encoding for the time-series and geospatial endpoints.
+
+Clients that send ``Accept: application/vnd.apache.arrow.stream`` get the
+same data as the JSON endpoints, encoded as an Arrow IPC stream instead of
+one JSON object per point. Series are returned in long form::
+
+    series (dictionary<string>) | time (timestamp) | value (float64)
+
+Everything that is not per-point (labels, layout, metrics, bounds, ...) goes
+into the schema metadata under the ``ngiab`` key as a JSON document, so a
+client reads one self-describing message.
+"""
+
+import json
+from typing import Iterable, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ARROW_STREAM_MIME = "application/vnd.apache.arrow.stream"
+METADATA_KEY = b"ngiab"
+# Time format the JSON endpoints use; string times are parsed with it.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def wants_arrow(accept: Optional[str]) -> bool:
+    """Return True if an ``Accept`` header asks for an Arrow IPC stream."""
+    if not accept:
+        return False
+    return any(
+        part.split(";", 1)[0].strip() == ARROW_STREAM_MIME for part in accept.split(",")
+    )
+
+
+def _chunks(values) -> list:
+    if isinstance(values, pa.ChunkedArray):
+        return values.chunks
+    if isinstance(values, pa.Array):
+        return [values]
+    return [pa.array(values)]
+
+
+def _time_chunks(times) -> list:
+    chunks = _chunks(times)
+    return [
+        pc.strptime(chunk, format=TIME_FORMAT, unit="s")
+        if pa.types.is_string(chunk.type) or pa.types.is_large_string(chunk.type)
+        else chunk
+        for chunk in chunks
+    ]
+
+
+def series_table(series: Iterable[Tuple[str, Sequence, Sequence]]) -> pa.Table:
+    """Build the long-form table of ``(label, times, values)`` series.
+
+    ``times`` may be strings in ``TIME_FORMAT`` or datetimes; ``times`` and
+    ``values`` may be lists, NumPy arrays or Arrow (chunked) arrays, which
+    are used without copying.
+    """
+    labels, times, values = [], [], []
+    for label, series_times, series_values in series:
+        time_chunks = _time_chunks(series_times)
+        labels.append(pa.array([label] * sum(len(chunk) for chunk in time_chunks), pa.string()))
+        times.extend(time_chunks)
+        values.extend(chunk.cast(pa.float64()) for chunk in _chunks(series_values))
+    if not times:
+        return pa.table(
+            {
+                "series": pa.array([], pa.dictionary(pa.int32(), pa.string())),
+                "time": pa.array([], pa.timestamp("s")),
+                "value": pa.array([], pa.float64()),
+            }
+        )
+    time_type = times[0].type
+    return pa.table(
+        {
+            "series": pa.concat_arrays(labels).dictionary_encode(),
+            "time": pa.chunked_array([chunk.cast(time_type) for chunk in times], time_type),
+            "value": pa.chunked_array(values, pa.float64()),
+        }
+    )
+
+
+def with_metadata(table: pa.Table, metadata: Optional[dict]) -> pa.Table:
+    """Attach ``metadata`` (JSON-serialisable) to the table schema."""
+    if not metadata:
+        return table
+    existing = dict(table.schema.metadata or {})
+    existing[METADATA_KEY] = json.dumps(metadata, default=str).encode()
+    return table.replace_schema_metadata(existing)
+
+
+def table_metadata(table: pa.Table) -> dict:
+    """Return the ``ngiab`` metadata of a table (empty when absent)."""
+    raw = (table.schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def to_ipc_stream(table: pa.Table) -> bytes:
+    """Serialise ``table`` as an Arrow IPC stream."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_ipc_stream(data: bytes) -> pa.Table:
+    """Read an Arrow IPC stream back into a table."""
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def geodataframe_table(gdf) -> pa.Table:
+    """Convert a GeoDataFrame to an Arrow table with a GeoArrow WKB geometry column."""
+    return pa.table(gdf.to_arrow(index=False, geometry_encoding="WKB"))
+
+
+def table_columns(table: pa.Table) -> dict:
+    """Return ``{column: [values]}`` for a JSON response; NaN becomes None."""
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_floating(column.type):
+            column = pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column)
+        columns[name] = column.to_pylist()
+    return columns
@@ -0,0 +1,84 @@
+"""Process-level caches for data loaded from run outputs.
+
+``ByteBudgetLRU`` keeps loaded objects (DataFrames, datasets) in memory up
+to a byte budget and evicts the least recently used ones beyond it. Each
+entry carries a ``version`` (typically the source file's mtime and size): a
+lookup with a different version is a miss and reloads, so a rewritten file
+is never served from the cache.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class ByteBudgetLRU:
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    Values larger than the whole budget are returned but not cached.
+    Concurrent misses on the same key may load it more than once; the last
+    load wins.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        version: Hashable,
+        loader: Callable[[], Any],
+        sizeof: Callable[[Any], int],
+    ) -> Any:
+        """Return the cached value of ``key`` at ``version``, loading it on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        self.put(key, version, value, sizeof(value))
+        return value
+
+    def put(self, key: Hashable, version: Hashable, value: Any, nbytes: int):
+        """Insert ``value`` and evict least recently used entries beyond the budget."""
+        with self._lock:
+            self._discard(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (version, value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,21 +1,36 @@
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+import functools
+import hashlib
 import logging
-import pandas as pd
 import os
-import json
-import geopandas as gpd
+import re
+from botocore.exceptions import ClientError, BotoCoreError
+import pyarrow as pa
+import pyproj
 from tethys_sdk.routing import controller
 from .utils import (
-    get_base_output,
+    BATCH_MAX_IDS,
     getCatchmentsIds,
     getNexusIDs,
     getNexusList,
-    check_troute_id,
-    get_troute_vars,
-    get_troute_df,
+    get_troute_reader,
     get_usgs_from_ngen_id,
     getCatchmentsList,
+    read_catchment_series,
+    read_nexus_layer,
+    read_nexus_series,
+    read_troute_series,
+    read_time_series_batch,
     find_gpkg_file_path,
+    get_run_cache_dir,
+    get_run_entry_validator,
+    get_run_pmtiles_file,
+    get_run_pmtiles_path,
+    get_run_output_validator,
+    get_teehr_validator,
+    get_troute_validator,
     append_ngen_usgs_column,
     append_nwm_usgs_column,
     get_model_runs_selectable,
@@ -24,6 +39,27 @@ from .utils import (
     _open_warehouse,
     _teehr_warehouse_path,
 )
+from .arrow_ipc import (
+    ARROW_STREAM_MIME,
+    geodataframe_table,
+    series_table,
+    table_columns,
+    to_ipc_stream,
+    wants_arrow,
+    with_metadata,
+)
+from .payload_cache import gzip_payload, json_with_raw, load_payload, store_payload
+from .pmtiles import parse_byte_range
+from .vector_tiles import TILE_LAYERS, TILE_MIME, cached_tile, is_valid_tile, render_tile
+from .validators import combine_validators, stat_validator
+from .timeseries import (
+    DOWNSAMPLE_METHODS,
+    downsample,
+    parse_max_points,
+    parse_series_format,
+    parse_time_window,
+    series_payload,
+)
 from .teehr_warehouse import (
     ConfigurationNotFound,
     TeehrWarehouseError,
@@ -32,6 +68,23 @@ from .teehr_warehouse import (
     WarehouseMountMirrorBroken,
     WarehouseUnreachable,
 )
+from .datastream_utils import (
+    list_public_s3_folders,
+    get_select_from_s3,
+    remove_forcings_from_forecast_list,
+    make_datastream_conf,
+    download_and_extract_tar_from_s3,
+    get_dates_select_from_s3,
+    get_datastream_model_runs_selectable,
+    check_if_datastream_data_exists,
+    get_datastream_id_from_conf_file,
+    check_if_s3_file_exists
+)
+from .app import App
+
+# the following error is fixed with this lines
+# https://stackoverflow.com/a/79163867
+pyproj.network.set_network_enabled(False)
 
 logger = logging.getLogger(__name__)
 
@@ -58,27 +111,182 @@ def _teehr_status_for(exc: TeehrWarehouseError):
         return ("TEEHR warehouse appears empty. Run TEEHR to populate it.", "info")
     # Generic fallback
     return ("TEEHR warehouse could not be read.", "error")
-from .datastream_utils import (
-    list_public_s3_folders,
-    get_select_from_s3,
-    remove_forcings_from_forecast_list,
-    make_datastream_conf,
-    download_and_extract_tar_from_s3,
-    get_dates_select_from_s3,
-    get_datastream_model_runs_selectable,
-    check_if_datastream_data_exists,
-    get_datastream_id_from_conf_file,
-    check_if_s3_file_exists
-)
 
-from .app import App
-from botocore.exceptions import ClientError, BotoCoreError
 
-# the following error is fixed with this lines
-# https://stackoverflow.com/a/79163867
-import pyproj
+def _downsample_args(request):
+    """Return ``(max_points, method)`` from the ``max_points``/``downsample`` query parameters.
 
-pyproj.network.set_network_enabled(False)
+    ``max_points`` is optional; without it series are returned in full.
+    """
+    method = request.GET.get("downsample", "lttb")
+    if method not in DOWNSAMPLE_METHODS:
+        method = "lttb"
+    return parse_max_points(request.GET.get("max_points")), method
+
+
+def _request_validator(request, source_validator):
+    """Return ``source_validator(request)``, computed once per request (None on error)."""
+    if not hasattr(request, "_ngiab_validator"):
+        try:
+            request._ngiab_validator = source_validator(request)
+        except Exception as exc:
+            logger.info("Cannot compute cache validator for %s (%s)", request.path, exc)
+            request._ngiab_validator = None
+    return request._ngiab_validator
+
+
+def _conditional(source_validator, negotiates_encoding=False):
+    """Answer conditional GETs of a controller from ``source_validator(request)``.
+
+    ``source_validator`` returns a ``validators.Validator`` for the files (or
+    warehouse snapshot) the response is built from, or None when there is
+    nothing to validate against. The ETag also covers the full query string
+    and the negotiated format, so each variant of a response validates on its
+    own. Responses are marked ``Cache-Control: private, no-cache``: browsers
+    keep them but revalidate on every use, which costs a ``stat`` and a 304.
+
+    Controllers that gzip their own responses pass ``negotiates_encoding``:
+    the content-encoding is then part of the ETag as well, and every
+    response (304s included) varies on ``Accept-Encoding``.
+    """
+    vary = ("Accept", "Accept-Encoding") if negotiates_encoding else ("Accept",)
+
+    def _validator(request):
+        return _request_validator(request, source_validator)
+
+    def _etag(request, *args, **kwargs):
+        validator = _validator(request)
+        if validator is None:
+            return None
+        variant = "arrow" if _wants_arrow(request) else "json"
+        if negotiates_encoding and variant == "json" and _accepts_gzip(request):
+            variant += "+gzip"
+        return hashlib.sha1(
+            f"{validator[0]}|{request.get_full_path()}|{variant}".encode()
+        ).hexdigest()
+
+    def _last_modified(request, *args, **kwargs):
+        validator = _validator(request)
+        return None if validator is None else validator[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=_etag, last_modified_func=_last_modified)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if _validator(request) is not None:
+                patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, vary)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _request_ids(request):
+    """Return the distinct ids of a ``getTimeSeriesBatch`` request, in request order.
+
+    Ids are comma-separated and/or given as repeated ``ids`` parameters.
+    """
+    return list(
+        dict.fromkeys(
+            feature_id.strip()
+            for value in request.GET.getlist("ids")
+            for feature_id in value.split(",")
+            if feature_id.strip()
+        )
+    )
+
+
+def _catchment_validator(request):
+    return get_run_output_validator(
+        request.GET.get("model_run_id"), [f"{request.GET.get('catchment_id')}.csv"]
+    )
+
+
+def _nexus_validator(request):
+    # The response carries the nexus' USGS gauge from the warehouse crosswalk.
+    return combine_validators(
+        get_run_output_validator(
+            request.GET.get("model_run_id"), [f"{request.GET.get('nexus_id')}_output.csv"]
+        ),
+        get_teehr_validator(),
+    )
+
+
+def _batch_validator(request):
+    if len(_request_ids(request)) > BATCH_MAX_IDS:
+        return None  # rejected by getTimeSeriesBatch
+    file_names = [
+        f"{feature_id}_output.csv" if feature_id.startswith("nex-") else f"{feature_id}.csv"
+        for feature_id in _request_ids(request)
+    ]
+    return get_run_output_validator(request.GET.get("model_run_id"), file_names)
+
+
+def _troute_validator(request):
+    return get_troute_validator(request.GET.get("model_run_id"))
+
+
+def _geospatial_validator(request):
+    model_run_id = request.GET.get("model_run_id")
+    gpkg_file_path = find_gpkg_file_path(model_run_id)
+    pmtiles_file = get_run_pmtiles_file(model_run_id)
+    return combine_validators(
+        stat_validator([gpkg_file_path] if gpkg_file_path else []),
+        stat_validator([pmtiles_file] if pmtiles_file else []),
+        get_run_output_validator(model_run_id),
+        get_teehr_validator(),
+    )
+
+
+def _teehr_timeseries_validator(request):
+    return get_teehr_validator()
+
+
+def _teehr_variables_validator(request):
+    return combine_validators(
+        get_run_entry_validator(request.GET.get("model_run_id")),
+        get_teehr_validator(),
+    )
+
+
+def _time_window(request):
+    """Return ``(start, end)`` from the ``start``/``end`` query parameters (ISO 8601, inclusive)."""
+    return parse_time_window(request.GET.get("start"), request.GET.get("end"))
+
+
+def _wants_arrow(request):
+    """True when the client sent ``Accept: application/vnd.apache.arrow.stream``."""
+    return wants_arrow(request.META.get("HTTP_ACCEPT"))
+
+
+def _arrow_response(table, metadata=None):
+    """Return ``table`` as an Arrow IPC stream; ``metadata`` goes into the schema."""
+    return HttpResponse(
+        to_ipc_stream(with_metadata(table, metadata)),
+        content_type=ARROW_STREAM_MIME,
+    )
+
+
+_GEOSPATIAL_PAYLOAD = "geospatial"
+# The payload without the nexus GeoJSON (``nexus=none``).
+_GEOSPATIAL_IDS_PAYLOAD = "geospatial_ids"
+_ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+def _accepts_gzip(request):
+    return bool(_ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", "")))
+
+
+def _json_payload_response(payload, gzipped=False):
+    """Return already encoded JSON bytes; ``gzipped`` payloads are gzip-encoded."""
+    response = HttpResponse(payload, content_type="application/json")
+    if gzipped:
+        response["Content-Encoding"] = "gzip"
+    return response
 
 
 @controller
@@ -109,62 +317,67 @@ def getModelRuns(request):
 
 
 @controller
+@_conditional(_catchment_validator)
 def getCatchmentTimeSeries(request):
     model_run_id = request.GET.get("model_run_id")
     catchment_id = request.GET.get("catchment_id")
     variable_column = request.GET.get("variable_column")
-    base_output_path = get_base_output(model_run_id)
-
-    catchment_output_file_path = os.path.join(
-        base_output_path,
-        "{}.csv".format(catchment_id),
-    )
-
-    df = pd.read_csv(catchment_output_file_path)
-    list_variables = df.columns.tolist()[2:]  # remove time and timestep
-    time_col = df.iloc[:, 1]
-    if variable_column is None:
-        second_col = df.iloc[:, 2]
-    else:
-        second_col = df[variable_column]
-
-    data = [
-        {"x": time, "y": val}
-        for time, val in zip(time_col.tolist(), second_col.tolist())
-    ]
-
-    return JsonResponse(
-        {
-            "data": [
-                {
-                    "label": f"{catchment_id}-{variable_column if variable_column else list_variables[0]}",
-                    "data": data,
-                }
-            ],
-            "variables": [
-                {"value": variable, "label": variable.lower().replace("_", " ")}
-                for variable in list_variables
-            ],
-            "variable": (
-                # {"value": variable_column, "label": variable_column.lower()}
-                variable_column
-                if variable_column
-                else list_variables[0]
-            ),
-            "layout": {
-                "yaxis": variable_column,
-                "xaxis": "",
-                "title": "",
-            },
-            "catchment_ids": getCatchmentsIds(model_run_id),
-        }
+    max_points, method = _downsample_args(request)
+    start, end = _time_window(request)
+    list_variables, _, times, values = read_catchment_series(
+        model_run_id, catchment_id, variable_column, start, end
     )
+    times, values = downsample(times, values, max_points, method)
+    label = f"{catchment_id}-{variable_column if variable_column else list_variables[0]}"
+    response_object = {
+        "variables": [
+            {"value": variable, "label": variable.lower().replace("_", " ")}
+            for variable in list_variables
+        ],
+        "variable": (
+            # {"value": variable_column, "label": variable_column.lower()}
+            variable_column
+            if variable_column
+            else list_variables[0]
+        ),
+        "layout": {
+            "yaxis": variable_column,
+            "xaxis": "",
+            "title": "",
+        },
+        "catchment_ids": getCatchmentsIds(model_run_id),
+    }
+    if _wants_arrow(request):
+        return _arrow_response(series_table([(label, times, values)]), response_object)
+    data = series_payload(times, values, parse_series_format(request.GET.get("format")))
+    response_object["data"] = [{"label": label, "data": data}]
+    return JsonResponse(response_object)
 
 
 @controller
+@_conditional(_geospatial_validator, negotiates_encoding=True)
 def getGeoSpatialData(request):
     response_object = {}
     model_run_id = request.GET.get("model_run_id")
+    arrow = _wants_arrow(request)
+    gzipped = not arrow and _accepts_gzip(request)
+    # ``nexus=none`` leaves the nexus GeoJSON out, for maps that draw the
+    # nexus layer from getVectorTile instead.
+    with_nexus = request.GET.get("nexus") != "none"
+    payload_name = _GEOSPATIAL_PAYLOAD if with_nexus else _GEOSPATIAL_IDS_PAYLOAD
+
+    # The JSON payload is cached on disk under the response's validator token.
+    cache_dir = token = None
+    validator = None if arrow else _request_validator(request, _geospatial_validator)
+    if validator is not None:
+        try:
+            cache_dir, token = get_run_cache_dir(model_run_id), validator[0]
+        except Exception as e:
+            logger.info("No payload cache for run %s (%s)", model_run_id, e)
+    if cache_dir is not None:
+        payload = load_payload(cache_dir, payload_name, token, gzipped)
+        if payload is not None:
+            return _json_payload_response(payload, gzipped)
 
     # gepackage_file_name = find_gpkg_file(model_run_id)
     try:
@@ -172,7 +385,7 @@ def getGeoSpatialData(request):
     except Exception as e:
         return JsonResponse({"error": "Failed to read GeoPackage file."})
     # Append ngen_usgs and nwm_usgs columns
-    gdf = gpd.read_file(gepackage_file_path, layer="nexus")
+    gdf = read_nexus_layer(gepackage_file_path)
     gdf = append_ngen_usgs_column(gdf, model_run_id)
     gdf = append_nwm_usgs_column(gdf, model_run_id)
 
@@ -182,82 +395,216 @@ def getGeoSpatialData(request):
     flow_paths_ids = gdf["toid"].tolist()
     bounds = gdf.total_bounds.tolist()
 
-    data = json.loads(gdf.to_json())
-
-    response_object["nexus"] = data
     response_object["nexus_ids"] = getNexusList(model_run_id)
     response_object["bounds"] = bounds
     # response_object["teerh"] = teerh_data
     response_object["catchments"] = getCatchmentsList(model_run_id)
     response_object["flow_paths_ids"] = flow_paths_ids
-    return JsonResponse(response_object)
+    # Whether getRunPMTiles can serve the run's own hydrofabric tiles.
+    response_object["pmtiles"] = get_run_pmtiles_path(model_run_id) is not None
+    if arrow:
+        # Nexus features as rows with a GeoArrow WKB geometry column.
+        return _arrow_response(geodataframe_table(gdf), response_object)
+    payload = json_with_raw(response_object, "nexus", gdf.to_json() if with_nexus else "null")
+    if cache_dir is not None:
+        try:
+            store_payload(cache_dir, payload_name, token, payload)
+        except OSError as e:
+            logger.warning("Cannot cache the geospatial payload of run %s: %s", model_run_id, e)
+    # Encoded as a cache hit would be, so both carry the same ETag and bytes.
+    return _json_payload_response(gzip_payload(payload) if gzipped else payload, gzipped)
+
+
+def _tile_validator(request):
+    # The run id of a tile is part of its URL path, not of the query string.
+    gpkg_file_path = find_gpkg_file_path(request.resolver_match.kwargs["model_run_id"])
+    return stat_validator([gpkg_file_path] if gpkg_file_path else [])
+
+
+@controller(url="tiles/{model_run_id}/{layer}/{z}/{x}/{y}.pbf")
+@_conditional(_tile_validator)
+def getVectorTile(request, model_run_id, layer, z, x, y):
+    """Serve one Mapbox Vector Tile of a hydrofabric layer of the run's GeoPackage."""
+    try:
+        z, x, y = int(z), int(x), int(y)
+    except ValueError:
+        return JsonResponse({"error": "Invalid tile coordinates."}, status=404)
+    if layer not in TILE_LAYERS or not is_valid_tile(z, x, y):
+        return JsonResponse({"error": "Unknown tile."}, status=404)
+    try:
+        gepackage_file_path = find_gpkg_file_path(model_run_id)
+    except IndexError:  # the run has no GeoPackage under config/
+        gepackage_file_path = None
+    if gepackage_file_path is None:
+        return JsonResponse({"error": "Failed to read GeoPackage file."}, status=404)
+
+    def render():
+        return render_tile(gepackage_file_path, layer, z, x, y)
+
+    validator = _request_validator(request, _tile_validator)
+    if validator is None:
+        tile = render()
+    else:
+        tile = cached_tile(get_run_cache_dir(model_run_id), validator[0], layer, z, x, y, render)
+    return HttpResponse(tile, content_type=TILE_MIME)
+
+
+def _pmtiles_validator(request):
+    pmtiles_path = get_run_pmtiles_path(request.resolver_match.kwargs["model_run_id"])
+    return stat_validator([pmtiles_path]) if pmtiles_path else None
+
+
+@controller(url="pmtiles/{model_run_id}.pmtiles")
+@_conditional(_pmtiles_validator)
+def getRunPMTiles(request, model_run_id):
+    """Serve the run's hydrofabric PMTiles archive, with HTTP range support."""
+    pmtiles_path = get_run_pmtiles_path(model_run_id)
+    if pmtiles_path is None:
+        return JsonResponse({"error": "No map tiles were built for this run."}, status=404)
+    size = os.path.getsize(pmtiles_path)
+    try:
+        byte_range = parse_byte_range(request.META.get("HTTP_RANGE"), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    if byte_range is None:
+        response = FileResponse(open(pmtiles_path, "rb"), content_type="application/octet-stream")
+    else:
+        first, last = byte_range
+        with open(pmtiles_path, "rb") as f:
+            f.seek(first)
+            data = f.read(last - first + 1)
+        response = HttpResponse(data, status=206, content_type="application/octet-stream")
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
 
 
 @controller
+@_conditional(_nexus_validator)
 def getNexusTimeSeries(request):
     model_run_id = request.GET.get("model_run_id")
     nexus_id = request.GET.get("nexus_id")
-    base_output_path = get_base_output(model_run_id)
-
-    nexus_output_file_path = os.path.join(
-        base_output_path,
-        "{}_output.csv".format(nexus_id),
-    )
     usgs_id = get_usgs_from_ngen_id(model_run_id, nexus_id)
     data_key = []
-    
-    if os.path.exists(nexus_output_file_path):
-        try:
-            df = pd.read_csv(nexus_output_file_path, header=None)
-            time_col = df.iloc[:, 1]
-            streamflow_cms_col = df.iloc[:, 2]
-            data = [
-                {"x": time, "y": streamflow}
-                for time, streamflow in zip(time_col.tolist(), streamflow_cms_col.tolist())
-            ]
-            data_key =[
-                {
-                "label": f"{nexus_id}-Streamflow",
-                "data": data,
-                }
-            ]
-        except Exception as e:
-            print(f"Error reading CSV file: {e}")
-            data_key = []
-        
-    else:
-        data_key = []
-    
+    arrow_series = []
+
+    try:
+        series = read_nexus_series(model_run_id, nexus_id, *_time_window(request))
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        series = None
+    if series is not None:
+        max_points, method = _downsample_args(request)
+        time_col, streamflow_cms_col = downsample(*series, max_points, method)
+        arrow_series.append((f"{nexus_id}-Streamflow", time_col, streamflow_cms_col))
+        data = series_payload(
+            time_col, streamflow_cms_col, parse_series_format(request.GET.get("format"))
+        )
+        data_key =[
+            {
+            "label": f"{nexus_id}-Streamflow",
+            "data": data,
+            }
+        ]
+
+    response_object = {
+        "layout": {
+            "yaxis": "Streamflow",
+            "xaxis": "",
+            "title": "",
+        },
+        "nexus_ids": getNexusIDs(model_run_id),
+        "usgs_id": usgs_id,
+    }
+    if _wants_arrow(request):
+        return _arrow_response(series_table(arrow_series), response_object)
+    response_object["data"] = data_key
+    return JsonResponse(response_object)
+
+
+@controller
+@_conditional(_batch_validator)
+def getTimeSeriesBatch(request):
+    """
+    Return the series of many catchments and/or nexuses of one run.
+
+    Query-string parameters
+    -----------------------
+    model_run_id    – registered run id
+    ids             – comma-separated (or repeated) ids, e.g. cat-1,cat-2,nex-3;
+                      repeated ids are returned once, more than BATCH_MAX_IDS is a 400
+    variable_column – (optional) catchment variable; defaults to the first one
+    start, end      – (optional) ISO 8601 times restricting every series (inclusive)
+    max_points      – (optional) downsample each series to at most this many points
+    downsample      – (optional) "lttb" (default) or "minmax"
+    """
+    model_run_id = request.GET.get("model_run_id")
+    variable_column = request.GET.get("variable_column")
+    ids = _request_ids(request)
+    if len(ids) > BATCH_MAX_IDS:
+        return JsonResponse(
+            {"error": f"Too many ids: at most {BATCH_MAX_IDS} can be requested at once."}, status=400
+        )
+    max_points, method = _downsample_args(request)
+    series_format = parse_series_format(request.GET.get("format"))
+    start, end = _time_window(request)
+    series, missing = read_time_series_batch(model_run_id, ids, variable_column, start, end)
+    series = [
+        (feature_id, variable) + downsample(times, values, max_points, method)
+        for feature_id, variable, times, values in series
+    ]
+    layout = {"yaxis": variable_column, "xaxis": "", "title": ""}
+    if _wants_arrow(request):
+        return _arrow_response(
+            series_table(
+                (f"{feature_id}-{variable}", times, values)
+                for feature_id, variable, times, values in series
+            ),
+            {
+                "ids": {f"{feature_id}-{variable}": feature_id for feature_id, variable, _, _ in series},
+                "missing": missing,
+                "layout": layout,
+            },
+        )
     return JsonResponse(
         {
-            "data": data_key,
-            "layout": {
-                "yaxis": "Streamflow",
-                "xaxis": "",
-                "title": "",
-            },
-            "nexus_ids": getNexusIDs(model_run_id),
-            "usgs_id": usgs_id,
+            "data": [
+                {
+                    "id": feature_id,
+                    "label": f"{feature_id}-{variable}",
+                    "data": series_payload(times, values, series_format),
+                }
+                for feature_id, variable, times, values in series
+            ],
+            "missing": missing,
+            "layout": layout,
         }
     )
 
 
 @controller
+@_conditional(_troute_validator)
 def getTrouteVariables(request):
     vars = []
     model_run_id = request.GET.get("model_run_id")
     troute_id = request.GET.get("troute_id")
     clean_troute_id = troute_id.split("-")[1]
-    df = get_troute_df(model_run_id)
+    reader = get_troute_reader(model_run_id)
 
-    if df is None:
+    if reader is None:
         vars = []
     else:
         try:
-            if check_troute_id(df, clean_troute_id):
-                vars = get_troute_vars(df)
-            else:
-                vars = []
+            with reader:
+                if reader.has_feature(clean_troute_id):
+                    vars = [
+                        {"value": variable, "label": variable.lower()}
+                        for variable in reader.variables()
+                    ]
+                else:
+                    vars = []
         except Exception:
             vars = []
 
@@ -265,74 +612,67 @@ def getTrouteVariables(request):
 
 
 @controller
+@_conditional(_troute_validator)
 def getTrouteTimeSeries(request):
     model_run_id = request.GET.get("model_run_id")
     troute_id = request.GET.get("troute_id")
     clean_troute_id = troute_id.split("-")[1]
     variable_column = request.GET.get("troute_variable")
-    df = get_troute_df(model_run_id)
+    label = f"{troute_id}-{variable_column}"
+    max_points, method = _downsample_args(request)
+    start, end = _time_window(request)
 
     try:
-        if isinstance(df.index, pd.MultiIndex):
-            # Multi-indexed DataFrame: Slice using `feature_id` in the multi-index
-            df_sliced_by_id = df.xs(int(clean_troute_id), level="feature_id")
-            time_col = df_sliced_by_id.index.get_level_values("time")
+        series = read_troute_series(model_run_id, clean_troute_id, variable_column, start, end)
+        if series is None:
+            time_list, var_list = [], []
         else:
-            # Flat-indexed DataFrame: Filter using `featureID` column
-            df_sliced_by_id = df[df["featureID"] == int(clean_troute_id)]
-            time_col = df_sliced_by_id["current_time"]
-
-        var_col = df_sliced_by_id[variable_column]
-
-        data = [
-            {
-                "x": (
-                    time.strftime("%Y-%m-%d %H:%M:%S")
-                    if isinstance(time, pd.Timestamp)
-                    else str(time)
-                ),
-                "y": val,
-            }
-            for time, val in zip(time_col.tolist(), var_col.tolist())
-        ]
+            time_list, var_list = downsample(*series, max_points, method)
     except Exception as e:
         print(f"Error: {e}")
-        data = []
-
+        time_list, var_list = [], []
+
+    layout = {
+        "yaxis": variable_column.title(),
+        "xaxis": "",
+        "title": "",
+    }
+    if _wants_arrow(request):
+        return _arrow_response(series_table([(label, time_list, var_list)]), {"layout": layout})
     return JsonResponse(
         {
             "data": [
                 {
-                    "label": f"{troute_id}-{variable_column}",
-                    "data": data,
+                    "label": label,
+                    "data": series_payload(
+                        time_list, var_list, parse_series_format(request.GET.get("format"))
+                    ),
                 }
             ],
-            "layout": {
-                "yaxis": variable_column.title(),
-                "xaxis": "",
-                "title": "",
-            },
+            "layout": layout,
         }
     )
 
 
-def _empty_ts_response(variable, status_message, status_severity):
-    return JsonResponse(
-        {
-            "metrics": [],
-            "data": [],
-            "layout": {
-                "yaxis": (variable or "").title(),
-                "xaxis": "",
-                "title": "",
-            },
-            "teehr_status": status_message,
-            "teehr_status_severity": status_severity,
-        }
-    )
+def _empty_ts_response(variable, status_message, status_severity, arrow=False):
+    response_object = {
+        "metrics": [],
+        "layout": {
+            "yaxis": (variable or "").title(),
+            "xaxis": "",
+            "title": "",
+        },
+        "teehr_status": status_message,
+        "teehr_status_severity": status_severity,
+    }
+    if arrow:
+        return _arrow_response(series_table([]), response_object)
+    response_object["data"] = []
+    return JsonResponse(response_object)
 
 
 @controller
+@_conditional(_teehr_timeseries_validator)
 def getTeehrTimeSeries(request):
     # Inputs: model_run_id (the registered run), teehr_id (USGS gauge like
     # "usgs-02464000"), teehr_variable ("<config>-<variable>" e.g.
@@ -344,44 +684,69 @@ def getTeehrTimeSeries(request):
     parts = teehr_config_variable.split("-", 1)
     teehr_configuration = parts[0] if parts and parts[0] else None
     teehr_variable = parts[1] if len(parts) > 1 else None
+    arrow = _wants_arrow(request)
     if not teehr_configuration or not teehr_variable:
         return _empty_ts_response(
             teehr_variable,
             "No TEEHR configuration selected.",
             "info",
+            arrow,
         )
     if not _teehr_warehouse_path():
         return _empty_ts_response(
             teehr_variable,
             "TEEHR warehouse is not configured. See setup docs.",
             "info",
+            arrow,
         )
+    max_points, method = _downsample_args(request)
+    start, end = _time_window(request)
     try:
         with _open_warehouse() as reader:
-            data = reader.get_joined_timeseries(
-                teehr_configuration, teehr_variable, teehr_id
-            )
+            if arrow:
+                data = reader.get_joined_timeseries_table(
+                    teehr_configuration,
+                    teehr_variable,
+                    teehr_id,
+                    max_points=max_points,
+                    downsample_method=method,
+                    start=start,
+                    end=end,
+                )
+            else:
+                data = reader.get_joined_timeseries(
+                    teehr_configuration,
+                    teehr_variable,
+                    teehr_id,
+                    max_points=max_points,
+                    downsample_method=method,
+                    start=start,
+                    end=end,
+                    series_format=parse_series_format(request.GET.get("format")),
+                )
             metrics = reader.get_metrics_for_location(teehr_configuration, teehr_id)
     except TeehrWarehouseError as exc:
         msg, severity = _teehr_status_for(exc)
         logger.warning("getTeehrTimeSeries warehouse error: %s", exc)
-        return _empty_ts_response(teehr_variable, msg, severity)
+        return _empty_ts_response(teehr_variable, msg, severity, arrow)
 
     if not data:
         return _empty_ts_response(
             teehr_variable,
             "No TEEHR data for this location in the configured warehouse.",
             "info",
+            arrow,
         )
-    return JsonResponse(
-        {
-            "metrics": metrics,
-            "data": data,
-            "layout": {"yaxis": teehr_variable.title(), "xaxis": "", "title": ""},
-            "teehr_status": None,
-            "teehr_status_severity": None,
-        }
-    )
+    response_object = {
+        "metrics": metrics,
+        "layout": {"yaxis": teehr_variable.title(), "xaxis": "", "title": ""},
+        "teehr_status": None,
+        "teehr_status_severity": None,
+    }
+    if arrow:
+        return _arrow_response(data, response_object)
+    response_object["data"] = data
+    return JsonResponse(response_object)
 
 
 def _empty_variables_response(status_message, status_severity):
@@ -395,6 +760,7 @@ def _empty_variables_response(status_message, status_severity):
 
 
 @controller
+@_conditional(_teehr_variables_validator)
 def getTeehrVariables(request):
     model_run_id = request.GET.get("model_run_id")
 
@@ -439,6 +805,62 @@ def getTeehrVariables(request):
     )
 
 
+def _empty_metrics_layer_response(config_name, status_message, status_severity, arrow):
+    response_object = {
+        "configuration": config_name,
+        "teehr_status": status_message,
+        "teehr_status_severity": status_severity,
+    }
+    if arrow:
+        return _arrow_response(pa.table({"primary_location_id": pa.array([], pa.string())}), response_object)
+    response_object["columns"] = {}
+    return JsonResponse(response_object)
+
+
+@controller
+@_conditional(_teehr_variables_validator)
+def getTeehrMetricsLayer(request):
+    # Inputs: model_run_id (the registered run) or teehr_configuration (a
+    # configuration name, e.g. "nwm30_retrospective"), and geometry=true to
+    # add each location's longitude/latitude. Returns the ngen_metrics of
+    # every location of the configuration as columns, for color-coding the
+    # gauges on the map in one request.
+    config_name = request.GET.get("teehr_configuration")
+    arrow = _wants_arrow(request)
+    if not _teehr_warehouse_path():
+        return _empty_metrics_layer_response(
+            config_name, "TEEHR warehouse is not configured. See setup docs.", "info", arrow
+        )
+    if not config_name:
+        config_name = _resolve_configuration_name(request.GET.get("model_run_id"))
+    if not config_name:
+        return _empty_metrics_layer_response(
+            None, "No TEEHR evaluation found for this run.", "info", arrow
+        )
+    include_geometry = request.GET.get("geometry", "").lower() in ("1", "true")
+    try:
+        with _open_warehouse() as reader:
+            table = reader.get_metrics_layer(config_name, include_geometry=include_geometry)
+    except TeehrWarehouseError as exc:
+        msg, severity = _teehr_status_for(exc)
+        logger.warning("getTeehrMetricsLayer warehouse error: %s", exc)
+        return _empty_metrics_layer_response(config_name, msg, severity, arrow)
+
+    if table is None or table.num_rows == 0:
+        return _empty_metrics_layer_response(
+            config_name, "No TEEHR metrics for this configuration.", "info", arrow
+        )
+    response_object = {
+        "configuration": config_name,
+        "teehr_status": None,
+        "teehr_status_severity": None,
+    }
+    if arrow:
+        return _arrow_response(table, response_object)
+    response_object["columns"] = table_columns(table)
+    return JsonResponse(response_object)
+
+
 @controller
 def makeDatastreamConf(request):
     """
@@ -460,8 +882,7 @@ def getDataStreamNgiabDates(request):
     ngen_dates = list_public_s3_folders(prefix="v2.2/")
     ngen_dates = [date for date in ngen_dates if date != "ngen.20250429"] # small patch, this date has both the new and old format
     list_dates = get_dates_select_from_s3(ngen_dates)
-    
-    
+
     return JsonResponse({"ngen_dates": list_dates})
 
 @controller
@@ -1,5 +1,4 @@
 import boto3
-import json
 import os
 import tarfile
 import uuid
@@ -10,7 +9,8 @@ from botocore.client import Config
 from botocore.exceptions import ClientError, BotoCoreError
 
 
-from .utils import _get_conf_file
+from .registry import get_registry
+from .utils import _get_model_run_registry
 
 def list_public_s3_folders(
     bucket: str = "ciroh-community-ngen-datastream",
@@ -122,6 +122,12 @@ def _get_datastream_conf_file():
     conf_base_path = os.path.join(conf_dir_base_path, "datastream_ngiab.json")
     return conf_base_path
 
+def _get_datastream_registry():
+    """
+    Return the cached registry for the datastream configuration file.
+    """
+    return get_registry(_get_datastream_conf_file(), "datastream")
+
 def _get_datastream_conf_dir():
     """
     Get the datastream configuration directory.
@@ -134,9 +140,6 @@ def _add_datastream_data_to_conf(label: str, bucket:str, local_path: str, prefix
     """
     Add the datastream data to the configuration file.
     """
-    conf_base_path = _get_datastream_conf_file()
-    with open(conf_base_path, "r") as f:
-        conf = json.load(f)
     unique_id =  uuid.uuid4().hex
     individual_datastream = {
         "label": label,
@@ -146,26 +149,15 @@ def _add_datastream_data_to_conf(label: str, bucket:str, local_path: str, prefix
         "date": "2021-01-01:00:00:00",
         "id": unique_id,
     }
-    conf["datastream"].append(individual_datastream)
-
-    with open(conf_base_path, "w") as f:
-        json.dump(conf, f, indent=4)
+    _get_datastream_registry().add(individual_datastream)
 
     return individual_datastream
 
 def _add_datastream_data_to_model_conf(individual_datastream) -> None:
     """
-    Add the datastream data to the configuration file.
+    Add the datastream data to the model runs configuration file.
     """
-    conf_base_path = _get_conf_file()
-    with open(conf_base_path, "r") as f:
-        conf = json.load(f)
-
-    conf["model_runs"].append(individual_datastream)
-
-    with open(conf_base_path, "w") as f:
-        json.dump(conf, f, indent=4)
-    
+    _get_model_run_registry().add(individual_datastream)
     return
 
 def check_if_s3_file_exists(bucket: str = "ciroh-community-ngen-datastream", tar_key: str= "") -> bool:
@@ -357,10 +349,7 @@ def _get_list_datastream_model_runs():
             ]
         }
     """
-    conf_file = _get_datastream_conf_file()
-    with open(conf_file, "r") as f:
-        data = json.load(f)
-    return data
+    return _get_datastream_registry().data()
 
 def get_datastream_model_runs_selectable():
     datastream_model_runs = _get_list_datastream_model_runs()
@@ -408,12 +397,7 @@ def get_datastream_id_from_conf_file(datastream_folder_name: str) -> str:
     str
         The datastream ID if it exists, None otherwise.
     """
-    conf_file = _get_datastream_conf_file()
-    with open(conf_file, "r") as f:
-        data = json.load(f)
-    
-    for datastream in data["datastream"]:
-        if datastream["label"] == datastream_folder_name:
-            return datastream["id"]
-    
-    return None
\ No newline at end of file
+    datastream = _get_datastream_registry().get_by_label(datastream_folder_name)
+    if datastream is None:
+        return None
+    return datastream["id"]
\ No newline at end of file
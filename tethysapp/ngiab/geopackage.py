@@ -0,0 +1,57 @@
+"""Reading GeoPackage layers through pyogrio's Arrow path.
+
+``read_layer`` reads a layer with ``use_arrow=True`` (GDAL hands the
+features over as Arrow batches instead of one Python object per value),
+reads only the requested columns, filters features by a bounding box through
+the GeoPackage's R-tree index and can skip the geometry entirely for
+attribute-only reads.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import pyogrio
+from pyproj import CRS, Transformer
+
+
+def layer_columns(gpkg_path: str, layer: str) -> Sequence[str]:
+    """Return the attribute columns of a layer (without the geometry)."""
+    return list(pyogrio.read_info(gpkg_path, layer=layer)["fields"])
+
+
+def _layer_bbox(gpkg_path: str, layer: str, bbox, bbox_crs) -> Tuple[float, float, float, float]:
+    """Return ``bbox`` (given in ``bbox_crs``) in the layer's CRS."""
+    layer_crs = pyogrio.read_info(gpkg_path, layer=layer)["crs"]
+    if bbox_crs is None or layer_crs is None or CRS.from_user_input(bbox_crs) == CRS.from_user_input(layer_crs):
+        return tuple(bbox)
+    transformer = Transformer.from_crs(bbox_crs, layer_crs, always_xy=True)
+    return transformer.transform_bounds(*bbox)
+
+
+def read_layer(
+    gpkg_path: str,
+    layer: str,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    bbox_crs=None,
+    read_geometry: bool = True,
+):
+    """Read a GeoPackage layer as a GeoDataFrame (a DataFrame if ``read_geometry`` is False).
+
+    ``columns`` are the attribute columns to read (all if None); names the
+    layer does not have are ignored. ``bbox`` is ``(minx, miny, maxx, maxy)``
+    in ``bbox_crs`` (the layer's CRS if None); only features intersecting it
+    are read.
+    """
+    if columns is not None:
+        available = set(layer_columns(gpkg_path, layer))
+        columns = [column for column in columns if column in available]
+    if bbox is not None:
+        bbox = _layer_bbox(gpkg_path, layer, bbox, bbox_crs)
+    return pyogrio.read_dataframe(
+        gpkg_path,
+        layer=layer,
+        columns=columns,
+        bbox=bbox,
+        read_geometry=read_geometry,
+        use_arrow=True,
+    )
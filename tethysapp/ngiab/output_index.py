@@ -0,0 +1,127 @@
+"""Cached index of a run's ngen output directory.
+
+ngen writes one ``cat-<id>.csv`` per catchment and one ``nex-<id>_output.csv``
+per nexus into a single directory; a VPU run holds tens of thousands of them.
+The id dropdowns and the map need the list of ids on every request, so
+``get_output_index`` scans the directory once with ``os.scandir`` (which gets
+sizes and mtimes without an extra ``stat`` per file on most platforms) and
+keeps the result in memory.
+
+The index is rebuilt when the directory's mtime changes, which happens when
+files are added, removed or renamed. A directory modified within the last
+couple of seconds is rescanned on every call, since a file created in the
+same filesystem timestamp tick as the scan would not bump the mtime again.
+Rewriting an existing file in place does not change the directory mtime, so
+the per-file ``size``/``mtime_ns`` can be stale in that case; the ids never
+are.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+CATCHMENT_PREFIX = "cat-"
+NEXUS_PREFIX = "nex-"
+_NEXUS_SUFFIX = "_output"
+
+
+@dataclass(frozen=True)
+class OutputFile:
+    """One output CSV of a run."""
+
+    path: str
+    size: int
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class OutputIndex:
+    """The catchment and nexus output files of one directory, keyed by id (sorted)."""
+
+    directory: str
+    stamp: Optional[int] = None
+    catchments: Dict[str, OutputFile] = field(default_factory=dict)
+    nexuses: Dict[str, OutputFile] = field(default_factory=dict)
+
+    @property
+    def catchment_ids(self) -> List[str]:
+        return list(self.catchments)
+
+    @property
+    def nexus_ids(self) -> List[str]:
+        return list(self.nexuses)
+
+
+def _output_id(name: str) -> Optional[Tuple[str, str]]:
+    """Return ``(kind, id)`` for an output file name, or None if it is not one."""
+    if not name.endswith(".csv"):
+        return None
+    stem = name[: -len(".csv")]
+    if stem.startswith(CATCHMENT_PREFIX):
+        return "catchment", stem
+    if stem.startswith(NEXUS_PREFIX):
+        if stem.endswith(_NEXUS_SUFFIX):
+            stem = stem[: -len(_NEXUS_SUFFIX)]
+        return "nexus", stem
+    return None
+
+
+def scan_output_dir(directory: str) -> OutputIndex:
+    """Scan ``directory`` into an ``OutputIndex`` (empty if it does not exist)."""
+    try:
+        stamp = os.stat(directory).st_mtime_ns
+    except OSError:
+        return OutputIndex(directory)
+    found = {"catchment": {}, "nexus": {}}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            parsed = _output_id(entry.name)
+            if parsed is None:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            kind, output_id = parsed
+            found[kind][output_id] = OutputFile(entry.path, st.st_size, st.st_mtime_ns)
+    return OutputIndex(
+        directory,
+        stamp,
+        catchments=dict(sorted(found["catchment"].items())),
+        nexuses=dict(sorted(found["nexus"].items())),
+    )
+
+
+# Directories whose mtime is this recent are not trusted to be settled.
+_RACY_WINDOW_NS = 2_000_000_000
+
+_indexes: Dict[str, OutputIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_output_index(directory: str) -> OutputIndex:
+    """Return the cached index of ``directory``, rescanning it if its mtime changed."""
+    try:
+        stamp = os.stat(directory).st_mtime_ns
+    except OSError:
+        with _indexes_lock:
+            _indexes.pop(directory, None)
+        return OutputIndex(directory)
+    index = _indexes.get(directory)
+    if index is not None and index.stamp == stamp:
+        return index
+    index = scan_output_dir(directory)
+    if index.stamp is not None and time.time_ns() - index.stamp > _RACY_WINDOW_NS:
+        with _indexes_lock:
+            _indexes[directory] = index
+    return index
+
+
+def clear_output_indexes():
+    """Drop every cached index (they are rebuilt on next use)."""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,331 @@
+"""Columnar (Parquet) stores built from ngen run outputs.
+
+ngen writes one CSV per catchment (``outputs/ngen/cat-<id>.csv``), each with
+an unnamed step column, a ``Time`` column and one column per output
+variable. Reading a single variable for one catchment means parsing the whole
+file; with ~30k catchments per VPU the per-click cost is dominated by CSV
+parsing.
+
+``write_catchment_store`` rewrites those CSVs into a single Parquet file::
+
+    catchment_id (string) | time (timestamp) | <var> (float64) ...
+
+sorted by ``catchment_id`` then ``time``, so each row group covers a narrow
+id range and ``read_catchment_store`` only decodes the row groups (and the
+columns) a request needs.
+
+t-route writes its outputs time-major (one NetCDF or CSV per output chunk,
+every reach per time step), which makes a per-reach read touch the whole
+file. ``write_troute_store`` rewrites all chunks into the same kind of
+feature-major store::
+
+    feature_id (int64) | time (timestamp) | <var> (float32) ...
+
+sorted by ``feature_id`` then ``time``; ``read_troute_store`` reads one reach
+from the row groups whose ``feature_id`` statistics include it.
+"""
+
+import glob
+import logging
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+CATCHMENT_STORE_NAME = "catchments.parquet"
+CATCHMENT_ID_COLUMN = "catchment_id"
+TROUTE_STORE_NAME = "troute.parquet"
+FEATURE_ID_COLUMN = "feature_id"
+TIME_COLUMN = "time"
+# Time format written by ngen, and the one the charts expect back.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Number of CSV files converted per write batch; bounds memory during builds.
+_FILES_PER_BATCH = 256
+# Number of t-route reaches converted per write batch.
+_FEATURES_PER_BATCH = 4096
+# Number of t-route CSV rows parsed at a time.
+_CSV_ROWS_PER_READ = 1_000_000
+_ROW_GROUP_SIZE = 64 * 1024
+
+
+class OutputStoreError(Exception):
+    """The run's outputs cannot be converted into a store."""
+
+
+def is_store_current(store_path: str, *source_paths: str) -> bool:
+    """Return True if ``store_path`` exists and is newer than all ``source_paths``.
+
+    Adding or removing output files bumps the directory mtime, which makes
+    the store stale until it is rebuilt; pass the files themselves as well
+    when they may be rewritten in place.
+    """
+    try:
+        store_mtime = os.stat(store_path).st_mtime_ns
+        source_mtime = max(os.stat(path).st_mtime_ns for path in source_paths)
+    except FileNotFoundError:
+        return False
+    return store_mtime >= source_mtime
+
+
+def _read_catchment_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    time_name = df.columns[1]
+    variables = df.columns[2:]
+    out = pd.DataFrame(
+        {
+            TIME_COLUMN: pd.to_datetime(df[time_name], format=TIME_FORMAT),
+        }
+    )
+    for variable in variables:
+        # float64, as parsed from the CSV: responses match the CSV path exactly.
+        out[variable] = df[variable].astype(np.float64)
+    out.insert(0, CATCHMENT_ID_COLUMN, os.path.basename(path)[: -len(".csv")])
+    return out
+
+
+def _write_store(frames, store_path: str, description: str) -> int:
+    """Write DataFrames sharing one set of columns into a zstd Parquet store.
+
+    The store is written to a temporary file and moved into place, so readers
+    never see a partial store. Returns the number of rows written.
+
+    Raises:
+        OutputStoreError: the frames do not share the same columns.
+    """
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    tmp_path = f"{store_path}.tmp-{os.getpid()}"
+    schema = None
+    writer = None
+    rows = 0
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if schema is None:
+                schema = table.schema.remove_metadata()
+                writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+            if table.schema.names != schema.names:
+                raise OutputStoreError(
+                    f"{description} do not share the same variables; cannot build a single store."
+                )
+            writer.write_table(table.cast(schema), row_group_size=_ROW_GROUP_SIZE)
+            rows += table.num_rows
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_path, store_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def write_catchment_store(output_dir: str, store_path: str) -> Optional[str]:
+    """Convert ``output_dir/cat-*.csv`` into a Parquet store at ``store_path``.
+
+    Returns the store path, or None when there are no catchment files.
+
+    Raises:
+        OutputStoreError: the CSVs do not share the same set of variables.
+    """
+    files = sorted(glob.glob(os.path.join(output_dir, "cat-*.csv")))
+    if not files:
+        return None
+    frames = (
+        pd.concat(
+            [_read_catchment_csv(path) for path in files[start:start + _FILES_PER_BATCH]],
+            ignore_index=True,
+        )
+        for start in range(0, len(files), _FILES_PER_BATCH)
+    )
+    _write_store(frames, store_path, f"Catchment outputs in {output_dir}")
+    logger.info("Wrote catchment store for %d files to %s", len(files), store_path)
+    return store_path
+
+
+def _troute_csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame(
+        {
+            FEATURE_ID_COLUMN: df["featureID"].astype(np.int64).values,
+            TIME_COLUMN: pd.to_datetime(df["current_time"]).values,
+        }
+    )
+    for variable in df.columns[3:]:  # Skip featureID, Type and time
+        out[variable] = df[variable].astype(np.float32).values
+    return out
+
+
+def _troute_csv_frames(file_paths: List[str], spill_dir: str):
+    """Yield the CSV chunks ``_FEATURES_PER_BATCH`` reaches at a time.
+
+    The CSVs are time-major, so they are read ``_CSV_ROWS_PER_READ`` rows at
+    a time and each piece is split by reach batch into Parquet files under
+    ``spill_dir``; each batch is then read back, deduplicated and sorted.
+    Memory is bounded by one piece and one batch, not by the whole output.
+    """
+    feature_ids = set()
+    for path in file_paths:
+        for piece in pd.read_csv(path, usecols=["featureID"], chunksize=_CSV_ROWS_PER_READ):
+            feature_ids.update(piece["featureID"].astype(np.int64).unique().tolist())
+    batch_starts = np.array(sorted(feature_ids), dtype=np.int64)[::_FEATURES_PER_BATCH]
+
+    spills = defaultdict(list)
+    for path in file_paths:
+        for piece in pd.read_csv(path, chunksize=_CSV_ROWS_PER_READ):
+            out = _troute_csv_frame(piece)
+            batches = np.searchsorted(batch_starts, out[FEATURE_ID_COLUMN].values, side="right") - 1
+            for batch, frame in out.groupby(batches, sort=False):
+                spill_path = os.path.join(spill_dir, f"{batch:06d}-{len(spills[batch]):09d}.parquet")
+                frame.to_parquet(spill_path, index=False)
+                spills[batch].append(spill_path)
+
+    for batch in sorted(spills):
+        # Spills are read back in file order, so earlier chunks win where
+        # chunks overlap, as in ``TrouteReader.series``.
+        out = pd.concat([pd.read_parquet(path) for path in spills[batch]], ignore_index=True)
+        out = out.drop_duplicates([FEATURE_ID_COLUMN, TIME_COLUMN], keep="first")
+        yield out.sort_values([FEATURE_ID_COLUMN, TIME_COLUMN], kind="stable")
+        for path in spills[batch]:
+            os.remove(path)
+
+
+def _troute_netcdf_frames(file_paths: List[str]):
+    datasets = [xr.open_dataset(path) for path in file_paths]
+    try:
+        variables = [
+            name
+            for name, var in datasets[0].data_vars.items()
+            if set(var.dims) == {FEATURE_ID_COLUMN, TIME_COLUMN}
+        ]
+        feature_ids = np.unique(np.concatenate([ds[FEATURE_ID_COLUMN].values for ds in datasets]))
+        for start in range(0, len(feature_ids), _FEATURES_PER_BATCH):
+            batch = feature_ids[start:start + _FEATURES_PER_BATCH]
+            frames = []
+            for ds in datasets:
+                ids = np.intersect1d(batch, ds[FEATURE_ID_COLUMN].values)
+                if len(ids):
+                    frame = ds[variables].sel({FEATURE_ID_COLUMN: ids}).to_dataframe()
+                    frames.append(frame.reset_index()[[FEATURE_ID_COLUMN, TIME_COLUMN] + variables])
+            out = pd.concat(frames, ignore_index=True)
+            out[FEATURE_ID_COLUMN] = out[FEATURE_ID_COLUMN].astype(np.int64)
+            for variable in variables:
+                out[variable] = out[variable].astype(np.float32)
+            out = out.drop_duplicates([FEATURE_ID_COLUMN, TIME_COLUMN], keep="first")
+            yield out.sort_values([FEATURE_ID_COLUMN, TIME_COLUMN], kind="stable")
+    finally:
+        for ds in datasets:
+            ds.close()
+
+
+def write_troute_store(file_type: str, file_paths: List[str], store_path: str) -> Optional[str]:
+    """Convert t-route output chunks (``"CSV"`` or ``"NetCDF"``) into a feature-major store.
+
+    Both are converted ``_FEATURES_PER_BATCH`` reaches at a time, which
+    bounds memory for network-scale outputs; CSV chunks are first split by
+    reach batch into temporary files next to the store. Returns the store
+    path, or None when there are no files.
+    """
+    if not file_paths:
+        return None
+    if file_type == "CSV":
+        store_dir = os.path.dirname(store_path)
+        os.makedirs(store_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix=".troute-spill-", dir=store_dir) as spill_dir:
+            frames = _troute_csv_frames(file_paths, spill_dir)
+            rows = _write_store(frames, store_path, f"t-route outputs {file_paths}")
+    else:
+        frames = _troute_netcdf_frames(file_paths)
+        rows = _write_store(frames, store_path, f"t-route outputs {file_paths}")
+    logger.info("Wrote t-route store (%d rows from %d files) to %s", rows, len(file_paths), store_path)
+    return store_path
+
+
+def catchment_store_variables(store_path: str) -> List[str]:
+    """Return the variable columns of a store (reads the Parquet footer only)."""
+    names = pq.read_schema(store_path).names
+    return [name for name in names if name not in (CATCHMENT_ID_COLUMN, TIME_COLUMN)]
+
+
+def read_catchment_store(
+    store_path: str,
+    catchment_id: str,
+    variable: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[List[str], List[float]]:
+    """Return ``(times, values)`` for one catchment and variable.
+
+    Only the ``time`` and ``variable`` columns are decoded, and row groups
+    whose ``catchment_id`` (or, with ``start``/``end``, ``time``) statistics
+    exclude the request are skipped. ``start`` and ``end`` are inclusive.
+    """
+    filters = [(CATCHMENT_ID_COLUMN, "==", catchment_id)]
+    if start is not None:
+        filters.append((TIME_COLUMN, ">=", start))
+    if end is not None:
+        filters.append((TIME_COLUMN, "<=", end))
+    table = pq.read_table(store_path, columns=[TIME_COLUMN, variable], filters=filters)
+    times = pd.DatetimeIndex(table.column(TIME_COLUMN).to_numpy()).strftime(TIME_FORMAT)
+    values = table.column(variable).to_numpy()
+    return times.tolist(), values.tolist()
+
+
+def read_troute_store(
+    store_path: str,
+    feature_id: int,
+    variable: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[List[str], List[float]]:
+    """Return ``(times, values)`` of one t-route reach; missing values are -9999.
+
+    Only the ``time`` and ``variable`` columns of the row groups whose
+    ``feature_id`` (and ``time``) statistics match the request are decoded.
+    """
+    filters = [(FEATURE_ID_COLUMN, "==", int(feature_id))]
+    if start is not None:
+        filters.append((TIME_COLUMN, ">=", start))
+    if end is not None:
+        filters.append((TIME_COLUMN, "<=", end))
+    table = pq.read_table(store_path, columns=[TIME_COLUMN, variable], filters=filters)
+    times = pd.DatetimeIndex(table.column(TIME_COLUMN).to_numpy()).strftime(TIME_FORMAT)
+    values = table.column(variable).to_pandas().astype(np.float64).fillna(-9999)
+    return times.tolist(), values.tolist()
+
+
+def main(argv=None):
+    """Build the catchment and t-route stores and the map tiles of registered runs.
+
+    ``python -m tethysapp.ngiab.output_store <model_run_id>...``
+    """
+    from .utils import build_catchment_store, build_run_pmtiles, build_troute_store
+
+    run_ids = sys.argv[1:] if argv is None else argv
+    if not run_ids:
+        print("usage: python -m tethysapp.ngiab.output_store <model_run_id> [<model_run_id> ...]")
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    for run_id in run_ids:
+        store_path = build_catchment_store(run_id)
+        print(f"{run_id}: {store_path or 'no catchment outputs found'}")
+        store_path = build_troute_store(run_id)
+        print(f"{run_id}: {store_path or 'no t-route outputs found'}")
+        pmtiles_path = build_run_pmtiles(run_id)
+        print(f"{run_id}: {pmtiles_path or 'no hydrofabric GeoPackage found'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""On-disk cache of encoded response payloads.
+
+Some responses are expensive to build but only depend on files that rarely
+change (``getGeoSpatialData`` reads the GeoPackage, queries the TEEHR
+warehouse twice and reprojects every nexus). Their encoded bytes are kept in
+the run's cache directory as ``<name>-<token>.json`` plus a gzipped copy,
+where ``token`` is the response's cache validator token: a changed source
+gives a new token, so a stale payload is never read, and older payloads of
+the same name are removed when a new one is stored.
+"""
+
+import glob
+import gzip
+import json
+import os
+from typing import Optional, Tuple
+
+_SUFFIX = ".json"
+_GZIP_SUFFIX = ".json.gz"
+
+
+def payload_paths(cache_dir: str, name: str, token: str) -> Tuple[str, str]:
+    """Return the ``(json, gzip)`` paths of the payload ``name`` at ``token``."""
+    stem = os.path.join(cache_dir, f"{name}-{token}")
+    return stem + _SUFFIX, stem + _GZIP_SUFFIX
+
+
+def load_payload(cache_dir: str, name: str, token: str, gzipped: bool = False) -> Optional[bytes]:
+    """Return the cached payload bytes (gzip-encoded if ``gzipped``), or None on a miss."""
+    json_path, gzip_path = payload_paths(cache_dir, name, token)
+    try:
+        with open(gzip_path if gzipped else json_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def gzip_payload(payload: bytes) -> bytes:
+    """Return the gzip encoding of ``payload``, as stored by ``store_payload``."""
+    return gzip.compress(payload, compresslevel=6, mtime=0)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def store_payload(cache_dir: str, name: str, token: str, payload: bytes):
+    """Write ``payload`` and its gzipped copy, replacing older payloads of ``name``.
+
+    Both files are written to temporary files and moved into place, so
+    readers never see a partial payload.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    json_path, gzip_path = payload_paths(cache_dir, name, token)
+    _write_atomic(gzip_path, gzip_payload(payload))
+    _write_atomic(json_path, payload)
+    for path in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(name)}-*.json*")):
+        if path not in (json_path, gzip_path) and ".tmp-" not in path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def json_with_raw(obj: dict, key: str, raw_json: str) -> bytes:
+    """Encode ``obj`` with ``key`` set to ``raw_json``, an already encoded JSON value.
+
+    Avoids decoding and re-encoding large documents such as
+    ``GeoDataFrame.to_json()`` just to embed them in a response.
+    """
+    head = json.dumps({k: v for k, v in obj.items() if k != key})
+    separator = ", " if head != "{}" else ""
+    return f"{head[:-1]}{separator}{json.dumps(key)}: {raw_json}}}".encode()
@@ -0,0 +1,104 @@
+"""Writing PMTiles v3 archives and byte-range helpers to serve them.
+
+A PMTiles archive (https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md)
+holds every tile of a tileset in one file, addressed by a Hilbert-curve tile
+id through directories stored in the file itself. Map clients read the
+header and directories, then each tile, with HTTP range requests, so a
+plain file served with ``Range`` support replaces a tile server.
+
+Archives are written with the ``pmtiles`` package's ``Writer``, which spools
+tile data to a temporary file and keeps only the directory entries in
+memory.
+"""
+
+import gzip
+import os
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+
+
+def _e7(degrees: float) -> int:
+    return int(round(degrees * 10_000_000))
+
+
+def write_pmtiles(
+    path: str,
+    tiles: Iterable[Tuple[int, int, int, bytes]],
+    metadata: Dict,
+    bounds: Tuple[float, float, float, float],
+    min_zoom: int,
+    max_zoom: int,
+) -> int:
+    """Write ``(z, x, y, mvt_bytes)`` tiles into a PMTiles archive at ``path``.
+
+    ``tiles`` should come in tile id order (``pmtiles.tile.zxy_to_tileid``):
+    they are streamed to disk as they arrive, and an archive written out of
+    order is marked as not clustered. ``bounds`` are ``(min_lon, min_lat,
+    max_lon, max_lat)``. Empty tiles are skipped. The archive is written to a
+    temporary file and moved into place; nothing is written if there is no
+    tile. Returns the number of tiles written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = Writer(f)
+            for z, x, y, data in tiles:
+                if data:
+                    writer.write_tile(zxy_to_tileid(z, x, y), gzip.compress(data, mtime=0))
+                    count += 1
+            if count:
+                min_lon, min_lat, max_lon, max_lat = bounds
+                writer.finalize(
+                    {
+                        "tile_compression": Compression.GZIP,
+                        "tile_type": TileType.MVT,
+                        "min_lon_e7": _e7(min_lon),
+                        "min_lat_e7": _e7(min_lat),
+                        "max_lon_e7": _e7(max_lon),
+                        "max_lat_e7": _e7(max_lat),
+                        "center_zoom": max(min_zoom, min(max_zoom, (min_zoom + max_zoom) // 2)),
+                        "center_lon_e7": _e7((min_lon + max_lon) / 2),
+                        "center_lat_e7": _e7((min_lat + max_lat) / 2),
+                    },
+                    metadata,
+                )
+        if count:
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into inclusive ``(first, last)`` byte offsets.
+
+    Returns None when there is no usable range (the whole file is served).
+
+    Raises:
+        ValueError: the range cannot be satisfied for a file of ``size`` bytes.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None  # malformed or multi-range: ignore the header
+    first, last = match.groups()
+    if first == "":
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    first = int(first)
+    last = size - 1 if last == "" else min(int(last), size - 1)
+    if first >= size or last < first:
+        raise ValueError(header)
+    return first, last
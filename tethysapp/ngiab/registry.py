@@ -0,0 +1,472 @@
+"""In-process views of the visualizer's run registries.
+
+The visualizer keeps its list of model runs in ``ngiab_visualizer.json``
+(written by ``viewOnTethys.sh``) and its downloaded DataStream runs in
+``datastream_ngiab.json``. Both files share the same shape::
+
+    {"<key>": [{"id": "...", "label": "...", "path": "...", ...}, ...]}
+
+where ``<key>`` is ``model_runs`` or ``datastream``. Controllers look runs up
+by id several times per request, so the registry parses the file once, keeps
+an id index, and only re-parses when the file's mtime or size changes.
+
+Two backends share the same interface (``data``, ``entries``, ``get``,
+``get_by_label``, ``add``):
+
+* ``JsonRegistry`` (default) reads and writes the JSON file directly. Writes
+  take an exclusive ``flock`` on the file and replace it atomically (keeping
+  its mode and owner), so concurrent DataStream downloads cannot drop each
+  other's entries.
+* ``SqliteRegistry`` (``NGIAB_REGISTRY_BACKEND=sqlite``) keeps the entries in
+  a WAL-mode SQLite database with indexed id/label lookups and transactional
+  inserts. The JSON file is imported once and then only re-read when it is
+  edited outside the app (e.g. ``viewOnTethys.sh``): changed entries are
+  upserted and removed ones deleted. Runs added by the app only go to the
+  database; ``python -m tethysapp.ngiab.registry <json file> <key>`` exports
+  them back to the JSON file (e.g. before switching back to the JSON
+  backend).
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_BACKEND_ENV = "NGIAB_REGISTRY_BACKEND"
+REGISTRY_DB_ENV = "NGIAB_REGISTRY_DB"
+DEFAULT_REGISTRY_DB_NAME = "ngiab_registry.sqlite3"
+
+
+@contextlib.contextmanager
+def _exclusive_file_lock(path: str):
+    """Hold an exclusive ``flock`` on the file at ``path`` (no-op where unsupported).
+
+    Writers replace the file, so a lock taken on an inode that has since
+    been replaced is dropped and taken again on the current file.
+
+    Raises:
+        FileNotFoundError: ``path`` does not exist.
+    """
+    if fcntl is None:
+        yield
+        return
+    while True:
+        with open(path, "r") as locked:
+            fcntl.flock(locked, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path).st_ino == os.fstat(locked.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                yield
+                return
+
+
+def _write_json_atomic(path: str, data: dict):
+    """Write ``data`` to ``path`` so readers never observe a partial file.
+
+    The replacement keeps the mode and (where permitted) the owner of the
+    file it replaces, since the registries are also edited from the host.
+    Falls back to an in-place write when the file cannot be replaced (e.g.
+    it is bind-mounted on its own rather than via its directory).
+    """
+    directory = os.path.dirname(path) or "."
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        st = None
+    fd, tmp_path = tempfile.mkstemp(prefix=".registry-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+        if st is None:
+            os.chmod(tmp_path, 0o644)
+        else:
+            os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+            with contextlib.suppress(OSError):
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+        os.replace(tmp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+
+
+class JsonRegistry:
+    """Cached, id-indexed view of one JSON registry file.
+
+    The parsed document is shared between callers; treat the returned dicts
+    as read-only.
+    """
+
+    def __init__(self, path: str, key: str):
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._data: dict = {key: []}
+        self._by_id: Dict[str, dict] = {}
+        self._by_label: Dict[str, dict] = {}
+
+    # ---- Loading ---------------------------------------------------------
+
+    def _current_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Re-parse the file if it changed since the last load.
+
+        A missing file raises ``FileNotFoundError`` exactly as the previous
+        ``open()``-per-call code did.
+        """
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            entries = data.get(self.key, [])
+            self._by_id = {entry.get("id"): entry for entry in entries}
+            by_label: Dict[str, dict] = {}
+            for entry in entries:
+                by_label.setdefault(entry.get("label"), entry)
+            self._by_label = by_label
+            self._data = data
+            self._stamp = stamp
+            logger.debug("Loaded %d entries from %s", len(entries), self.path)
+
+    def invalidate(self):
+        """Force the next lookup to re-read the file."""
+        with self._lock:
+            self._stamp = None
+
+    # ---- Lookups ---------------------------------------------------------
+
+    def data(self) -> dict:
+        """Return the whole parsed document."""
+        self._refresh()
+        return self._data
+
+    def entries(self) -> List[dict]:
+        """Return the list stored under ``key``."""
+        return self.data().get(self.key, [])
+
+    def get(self, run_id) -> Optional[dict]:
+        """Return the entry with this id, or None."""
+        self._refresh()
+        return self._by_id.get(run_id)
+
+    def get_by_label(self, label) -> Optional[dict]:
+        """Return the first entry with this label, or None."""
+        self._refresh()
+        return self._by_label.get(label)
+
+    # ---- Writes ----------------------------------------------------------
+
+    def add(self, entry: dict) -> dict:
+        """Append ``entry`` under an exclusive lock and rewrite the file atomically.
+
+        The file is re-read inside the lock, so entries appended by another
+        thread or process in the meantime are preserved.
+        """
+        with self._lock, _exclusive_file_lock(self.path):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            data.setdefault(self.key, []).append(entry)
+            _write_json_atomic(self.path, data)
+            self._stamp = None
+        return entry
+
+
+_UPSERT_RUN = (
+    "INSERT INTO runs (kind, id, label, entry, source) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (kind, id) DO UPDATE SET "
+    "  label = excluded.label, entry = excluded.entry, source = excluded.source"
+)
+
+
+class SqliteRegistry:
+    """SQLite (WAL) registry with the same interface as ``JsonRegistry``.
+
+    ``db_path`` may be shared by several registries; each one only sees the
+    rows for its own ``key``. ``source_path`` is the JSON file imported into
+    the database; rows imported from it carry it as their ``source``, rows
+    added through ``add`` have none until they are exported to it.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS runs ("
+        "  seq INTEGER PRIMARY KEY,"
+        "  kind TEXT NOT NULL,"
+        "  id TEXT NOT NULL,"
+        "  label TEXT,"
+        "  entry TEXT NOT NULL,"
+        "  source TEXT,"
+        "  UNIQUE (kind, id)"
+        ")",
+        "CREATE INDEX IF NOT EXISTS runs_kind_label ON runs (kind, label)",
+        "CREATE TABLE IF NOT EXISTS imports ("
+        "  kind TEXT NOT NULL,"
+        "  source TEXT NOT NULL,"
+        "  stamp TEXT NOT NULL,"
+        "  PRIMARY KEY (kind, source)"
+        ")",
+    )
+
+    def __init__(self, db_path: str, key: str, source_path: Optional[str] = None):
+        self.db_path = db_path
+        self.key = key
+        self.source_path = source_path
+        self._local = threading.local()
+        self._source_stamp: Optional[str] = None
+        self._import_lock = threading.Lock()
+        conn = self._connection()
+        with conn:
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "source" not in columns:
+                # Databases created before rows recorded their JSON source:
+                # re-import so the rows the JSON files list get their source.
+                conn.execute("ALTER TABLE runs ADD COLUMN source TEXT")
+                conn.execute("DELETE FROM imports")
+
+    # ---- Connection ------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- JSON import -----------------------------------------------------
+
+    def _sync_from_source(self):
+        """Mirror ``source_path`` into the database if it changed since the last import.
+
+        Entries that are new or changed are upserted and rows of this
+        ``key`` imported from the file that it no longer lists are deleted;
+        rows added through ``add`` are kept.
+        """
+        if not self.source_path:
+            return
+        try:
+            st = os.stat(self.source_path)
+        except FileNotFoundError:
+            return
+        stamp = f"{st.st_mtime_ns}:{st.st_size}"
+        if stamp == self._source_stamp:
+            return
+        with self._import_lock:
+            if stamp == self._source_stamp:
+                return
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT stamp FROM imports WHERE kind = ? AND source = ?",
+                (self.key, self.source_path),
+            ).fetchone()
+            if row is None or row[0] != stamp:
+                with open(self.source_path, "r") as f:
+                    entries = json.load(f).get(self.key, [])
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._import_entries(conn, entries)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO imports (kind, source, stamp) VALUES (?, ?, ?)",
+                        (self.key, self.source_path, stamp),
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                logger.info("Imported %d %s entries from %s", len(entries), self.key, self.source_path)
+            self._source_stamp = stamp
+
+    def _import_entries(self, conn: sqlite3.Connection, entries: List[dict]):
+        """Make the rows imported from ``source_path`` match ``entries`` (inside a transaction)."""
+        entries = [entry for entry in entries if entry.get("id") is not None]
+        ids = {entry["id"] for entry in entries}
+        imported = dict(
+            conn.execute(
+                "SELECT id, entry FROM runs WHERE kind = ? AND source = ?",
+                (self.key, self.source_path),
+            ).fetchall()
+        )
+        conn.executemany(
+            "DELETE FROM runs WHERE kind = ? AND id = ?",
+            [(self.key, run_id) for run_id in imported if run_id not in ids],
+        )
+        upserts = []
+        for entry in entries:
+            encoded = json.dumps(entry)
+            if imported.get(entry["id"]) != encoded:
+                upserts.append((self.key, entry["id"], entry.get("label"), encoded, self.source_path))
+        conn.executemany(_UPSERT_RUN, upserts)
+
+    # ---- Lookups ---------------------------------------------------------
+
+    def data(self) -> dict:
+        """Return ``{key: [entries]}`` in insertion order."""
+        return {self.key: self.entries()}
+
+    def entries(self) -> List[dict]:
+        self._sync_from_source()
+        rows = self._connection().execute(
+            "SELECT entry FROM runs WHERE kind = ? ORDER BY seq", (self.key,)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get(self, run_id) -> Optional[dict]:
+        self._sync_from_source()
+        row = self._connection().execute(
+            "SELECT entry FROM runs WHERE kind = ? AND id = ?", (self.key, run_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_label(self, label) -> Optional[dict]:
+        self._sync_from_source()
+        row = self._connection().execute(
+            "SELECT entry FROM runs WHERE kind = ? AND label = ? ORDER BY seq LIMIT 1",
+            (self.key, label),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def invalidate(self):
+        """Force the next lookup to re-check the JSON source."""
+        self._source_stamp = None
+
+    # ---- Writes ----------------------------------------------------------
+
+    def add(self, entry: dict) -> dict:
+        """Insert ``entry`` in its own transaction (the JSON file is not rewritten)."""
+        self._sync_from_source()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                _UPSERT_RUN, (self.key, entry.get("id"), entry.get("label"), json.dumps(entry), None)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return entry
+
+    def export_json(self) -> int:
+        """Write every entry of this ``key`` to ``source_path``; returns the number written.
+
+        The file is rewritten under the same lock and atomic replace as
+        ``JsonRegistry.add``, keeping its other keys. Exported rows are then
+        tracked as imported from it, so removing them from the file later
+        removes them from the database too.
+        """
+        if not os.path.exists(self.source_path):
+            _write_json_atomic(self.source_path, {})
+        with _exclusive_file_lock(self.source_path):
+            self._sync_from_source()  # edits made since the last lookup are kept
+            with open(self.source_path, "r") as f:
+                data = json.load(f)
+            with self._import_lock:
+                conn = self._connection()
+                rows = conn.execute(
+                    "SELECT entry FROM runs WHERE kind = ? ORDER BY seq", (self.key,)
+                ).fetchall()
+                data[self.key] = [json.loads(r[0]) for r in rows]
+                _write_json_atomic(self.source_path, data)
+                st = os.stat(self.source_path)
+                stamp = f"{st.st_mtime_ns}:{st.st_size}"
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "UPDATE runs SET source = ? WHERE kind = ? AND source IS NULL",
+                        (self.source_path, self.key),
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO imports (kind, source, stamp) VALUES (?, ?, ?)",
+                        (self.key, self.source_path, stamp),
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._source_stamp = stamp
+        return len(rows)
+
+
+_registries: Dict[tuple, object] = {}
+_registries_lock = threading.Lock()
+
+
+def _registry_backend() -> str:
+    return os.environ.get(REGISTRY_BACKEND_ENV, "json").strip().lower()
+
+
+def _registry_db_path(path: str) -> str:
+    """SQLite file for ``path``: ``NGIAB_REGISTRY_DB`` or a file next to the JSON."""
+    return os.environ.get(REGISTRY_DB_ENV) or os.path.join(
+        os.path.dirname(path), DEFAULT_REGISTRY_DB_NAME
+    )
+
+
+def get_registry(path: str, key: str):
+    """Return the process-wide registry for ``path``, creating it on first use.
+
+    Registries are keyed by path (and backend) so a changed
+    ``VISUALIZER_CONF`` (tests, or a reconfigured container) gets its own
+    cache rather than a stale one.
+    """
+    backend = _registry_backend()
+    db_path = _registry_db_path(path) if backend == "sqlite" else None
+    cache_key = (backend, db_path, path, key)
+    registry = _registries.get(cache_key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(cache_key)
+            if registry is None:
+                if backend == "sqlite":
+                    registry = SqliteRegistry(db_path, key, source_path=path)
+                else:
+                    registry = JsonRegistry(path, key)
+                _registries[cache_key] = registry
+    return registry
+
+
+def main(argv=None):
+    """Export the SQLite registry of a JSON registry file back to that file.
+
+    ``python -m tethysapp.ngiab.registry <json file> <key>``, with ``key``
+    ``model_runs`` or ``datastream``; uses ``NGIAB_REGISTRY_DB`` as the app does.
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 2:
+        print("usage: python -m tethysapp.ngiab.registry <json file> <model_runs|datastream>")
+        return 2
+    path, key = args
+    registry = SqliteRegistry(_registry_db_path(path), key, source_path=path)
+    print(f"{path}: exported {registry.export_json()} {key} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,15 +21,30 @@ See ``docs/plans/2026-04-20-001-feat-teehr-warehouse-compatibility-plan.md`` for
 the full design rationale (OD1, OD2, FR3).
 """
 
+import functools
+import hashlib
 import logging
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import duckdb
+import numpy as np
+import pyarrow as pa
+import shapely
 from packaging.specifiers import SpecifierSet
 from packaging.version import InvalidVersion, Version
 
+from .arrow_ipc import series_table
+from .cache import ByteBudgetLRU
+from .timeseries import downsample_indices, series_payload
+
 logger = logging.getLogger(__name__)
 
 SUPPORTED_TEEHR_VERSIONS = SpecifierSet(">=0.6.0,<0.7.0")
@@ -43,6 +58,22 @@ SUPPORTED_TEEHR_VERSIONS = SpecifierSet(">=0.6.0,<0.7.0")
 # runtime network fetch.
 DEFAULT_DUCKDB_HOME = "/usr/lib/tethys/duckdb_extensions"
 
+# ``ngen_metrics`` columns the visualizer reads; the timestamp columns are
+# skipped because they require pytz.
+METRIC_COLUMNS = (
+    "root_mean_standard_deviation_ratio",
+    "relative_bias",
+    "nash_sutcliffe_efficiency",
+    "kling_gupta_efficiency",
+)
+
+# ``group_by`` periods of ``WarehouseReader.compute_metrics``: the SQL
+# expression over the primary ``value_time`` each group is keyed by.
+METRIC_PERIODS = {
+    "month": "strftime(p.value_time, '%Y-%m')",
+    "water_year": "year(p.value_time) + CASE WHEN month(p.value_time) >= 10 THEN 1 ELSE 0 END",
+}
+
 # Iceberg tables under the `teehr` namespace that the visualizer reads.
 _REQUIRED_TABLES = (
     "configurations",
@@ -86,6 +117,213 @@ class ConfigurationNotFound(TeehrWarehouseError):
     """The requested configuration name is not present in the warehouse."""
 
 
+def _series_label(config_name: str) -> str:
+    """Chart label of a configuration's series, e.g. ``ngen_ngiab`` -> ``Ngen Ngiab``."""
+    return config_name.replace("_", " ").title()
+
+
+def _check_version(catalog_path: Path, version_path: Path) -> Version:
+    """Return the warehouse's TEEHR version.
+
+    Raises:
+        WarehouseUnreachable: the catalog does not exist.
+        UnsupportedWarehouseVersion: the version file is missing, unparseable
+            or outside ``SUPPORTED_TEEHR_VERSIONS``.
+    """
+    if not catalog_path.exists():
+        raise WarehouseUnreachable(
+            f"TEEHR warehouse catalog not found at {catalog_path}"
+        )
+    if not version_path.exists():
+        raise UnsupportedWarehouseVersion(
+            f"TEEHR version file not found at {version_path}"
+        )
+    raw = version_path.read_text().strip()
+    try:
+        version = Version(raw)
+    except InvalidVersion as exc:
+        raise UnsupportedWarehouseVersion(
+            f"Could not parse TEEHR version from {version_path}: {raw!r}"
+        ) from exc
+    if version not in SUPPORTED_TEEHR_VERSIONS:
+        raise UnsupportedWarehouseVersion(
+            f"TEEHR warehouse version {version} is not in supported range "
+            f"{SUPPORTED_TEEHR_VERSIONS}"
+        )
+    return version
+
+
+@contextmanager
+def _utc_time_zone(conn: duckdb.DuckDBPyConnection):
+    """Evaluate the queries of ``conn`` in UTC, then restore its time zone.
+
+    TEEHR times are UTC; in the host's zone, TIMESTAMPTZ values would be
+    grouped into months and water years by local time.
+    """
+    (previous,) = conn.execute("SELECT current_setting('TimeZone')").fetchone()
+    conn.execute("SET TimeZone='UTC'")
+    try:
+        yield conn
+    finally:
+        conn.execute(f"SET TimeZone='{previous}'")
+
+
+def _connect(catalog_path: Path) -> duckdb.DuckDBPyConnection:
+    """Open a DuckDB connection with the extensions loaded and the catalog attached.
+
+    Raises:
+        WarehouseCatalogLocked: the catalog cannot be attached read-only.
+    """
+    conn = duckdb.connect(":memory:")
+    try:
+        # Point DuckDB at a shared, writable extension directory so LOAD
+        # does not try to create ~/.duckdb/ under an unwritable HOME.
+        # See DEFAULT_DUCKDB_HOME comment near the top of this module.
+        duckdb_home = os.environ.get("DUCKDB_HOME", DEFAULT_DUCKDB_HOME)
+        conn.execute(f"SET home_directory='{duckdb_home}'")
+        conn.execute(f"SET extension_directory='{duckdb_home}'")
+        # Extensions are pre-installed at image build time; only LOAD here.
+        conn.execute("LOAD sqlite")
+        conn.execute("LOAD iceberg")
+        conn.execute(f"ATTACH '{catalog_path}' AS cat (TYPE sqlite, READ_ONLY)")
+    except duckdb.Error as exc:
+        try:
+            conn.close()
+        except Exception:  # pragma: no cover
+            pass
+        msg = str(exc).lower()
+        if "locked" in msg or "wal" in msg or "readonly" in msg:
+            raise WarehouseCatalogLocked(
+                f"TEEHR catalog at {catalog_path} is locked or improperly "
+                "closed. The teehr writer may still be running."
+            ) from exc
+        raise
+    return conn
+
+
+# ---- Query result cache -------------------------------------------------------
+
+# Tables read by the joined-timeseries queries.
+_JOINED_TABLES = ("primary_timeseries", "secondary_timeseries", "location_crosswalks")
+
+QUERY_CACHE_BYTES = int(os.environ.get("NGIAB_TEEHR_CACHE_BYTES", str(256 * 1024**2)))
+_query_cache = ByteBudgetLRU(QUERY_CACHE_BYTES)
+
+
+def _result_nbytes(value) -> int:
+    """Approximate in-memory size of a query result."""
+    if isinstance(value, pa.Table):
+        return value.nbytes
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _result_nbytes(key) + _result_nbytes(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_result_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _cached_query(*tables: str):
+    """Cache a ``WarehouseReader`` query method by its arguments and table snapshots.
+
+    Entries are keyed by ``(warehouse, method, arguments)`` and versioned by
+    the ``metadata_location`` of each of ``tables``: as long as none of them
+    is committed to, repeated calls return the cached result, and the first
+    call after a commit replaces it. Results are shared between callers and
+    must not be mutated.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            catalog = self._freeze_catalog()
+            key = (str(self.warehouse_path), method.__name__, args, tuple(sorted(kwargs.items())))
+            version = tuple(catalog.get(table) for table in tables)
+            self._call_catalog = catalog
+            try:
+                try:
+                    hash(key)
+                except TypeError:
+                    # Unhashable arguments: run uncached.
+                    return method(self, *args, **kwargs)
+                return _query_cache.get_or_load(
+                    key, version, lambda: method(self, *args, **kwargs), _result_nbytes
+                )
+            finally:
+                self._call_catalog = None
+
+        return wrapper
+
+    return decorator
+
+
+def query_cache_stats() -> Dict[str, int]:
+    """Return the hit/miss/eviction counters of the query result cache."""
+    return _query_cache.stats()
+
+
+def clear_query_cache():
+    """Drop every cached query result."""
+    _query_cache.clear()
+
+
+# Catalog files modified this recently are not trusted to be settled: a
+# commit within the same timestamp tick can leave mtime and size unchanged.
+_RACY_WINDOW_NS = 2_000_000_000
+
+_catalogs: Dict[str, Tuple[tuple, Dict[str, str]]] = {}
+_catalogs_lock = threading.Lock()
+
+
+def _cached_catalog(catalog_path: Path, read) -> Dict[str, str]:
+    """Return the catalog of ``catalog_path``, calling ``read()`` only when the file changed."""
+    key = str(catalog_path)
+    stamp = _catalog_stamp(catalog_path)
+    cached = _catalogs.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    catalog = read()
+    if _is_settled(stamp):
+        with _catalogs_lock:
+            _catalogs[key] = (stamp, catalog)
+    return catalog
+
+
+@dataclass(frozen=True)
+class CrosswalkIndex:
+    """``location_crosswalks`` of one warehouse snapshot, as dictionaries.
+
+    ``primary_by_secondary`` maps each secondary id (``ngen-…``, ``nwm30-…``)
+    to its primary (USGS) id; ``secondary_by_primary`` maps, per secondary
+    prefix, each primary id to its secondary id. When an id appears more than
+    once, the last pair wins, as in a dict built from the pairs.
+    """
+
+    snapshot: str
+    primary_by_secondary: Dict[str, str] = field(default_factory=dict)
+    secondary_by_primary: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_pairs(cls, snapshot: str, pairs) -> "CrosswalkIndex":
+        primary_by_secondary: Dict[str, str] = {}
+        secondary_by_primary: Dict[str, Dict[str, str]] = {}
+        for primary, secondary in pairs:
+            primary_by_secondary[secondary] = primary
+            prefix = secondary.split("-", 1)[0]
+            secondary_by_primary.setdefault(prefix, {})[primary] = secondary
+        return cls(snapshot, primary_by_secondary, secondary_by_primary)
+
+    def primary_for(self, secondary_id: str) -> Optional[str]:
+        """Return the primary id crosswalked to ``secondary_id``, or None."""
+        return self.primary_by_secondary.get(secondary_id)
+
+    def secondary_for(self, primary_id: str, prefix: str) -> Optional[str]:
+        """Return the ``prefix-…`` secondary id crosswalked to ``primary_id``, or None."""
+        return self.secondary_by_primary.get(prefix, {}).get(primary_id)
+
+
 class WarehouseReader:
     """Read-only view of a TEEHR warehouse, backed by a DuckDB connection.
 
@@ -99,64 +337,28 @@ class WarehouseReader:
             configs = reader.list_configurations_for_run("ngen_my_run")
     """
 
-    def __init__(self, warehouse_path):
+    def __init__(self, warehouse_path, pool: Optional["WarehouseConnectionPool"] = None):
         self.warehouse_path = Path(warehouse_path)
         self._catalog_path = self.warehouse_path / "local" / "local_catalog.db"
         self._version_path = self.warehouse_path / "local" / "version"
         self.teehr_version: Optional[Version] = None
         self._conn: Optional[duckdb.DuckDBPyConnection] = None
-        self._open()
+        self._call_catalog: Optional[Dict[str, str]] = None
+        if pool is None:
+            self._open()
+        else:
+            self._conn, self.teehr_version = pool.cursor()
+
+    @classmethod
+    def from_pool(cls, pool: "WarehouseConnectionPool") -> "WarehouseReader":
+        """Return a reader on a cursor of ``pool``'s connection, skipping the per-reader setup."""
+        return cls(pool.warehouse_path, pool=pool)
 
     # ---- Lifecycle -------------------------------------------------------
 
     def _open(self):
-        if not self._catalog_path.exists():
-            raise WarehouseUnreachable(
-                f"TEEHR warehouse catalog not found at {self._catalog_path}"
-            )
-        self._check_version()
-        try:
-            self._conn = duckdb.connect(":memory:")
-            # Point DuckDB at a shared, writable extension directory so LOAD
-            # does not try to create ~/.duckdb/ under an unwritable HOME.
-            # See DEFAULT_DUCKDB_HOME comment near the top of this module.
-            duckdb_home = os.environ.get("DUCKDB_HOME", DEFAULT_DUCKDB_HOME)
-            self._conn.execute(f"SET home_directory='{duckdb_home}'")
-            self._conn.execute(f"SET extension_directory='{duckdb_home}'")
-            # Extensions are pre-installed at image build time; only LOAD here.
-            self._conn.execute("LOAD sqlite")
-            self._conn.execute("LOAD iceberg")
-            self._conn.execute(
-                f"ATTACH '{self._catalog_path}' AS cat (TYPE sqlite, READ_ONLY)"
-            )
-        except duckdb.Error as exc:
-            self._force_close()
-            msg = str(exc).lower()
-            if "locked" in msg or "wal" in msg or "readonly" in msg:
-                raise WarehouseCatalogLocked(
-                    f"TEEHR catalog at {self._catalog_path} is locked or improperly "
-                    "closed. The teehr writer may still be running."
-                ) from exc
-            raise
-
-    def _check_version(self):
-        if not self._version_path.exists():
-            raise UnsupportedWarehouseVersion(
-                f"TEEHR version file not found at {self._version_path}"
-            )
-        raw = self._version_path.read_text().strip()
-        try:
-            version = Version(raw)
-        except InvalidVersion as exc:
-            raise UnsupportedWarehouseVersion(
-                f"Could not parse TEEHR version from {self._version_path}: {raw!r}"
-            ) from exc
-        if version not in SUPPORTED_TEEHR_VERSIONS:
-            raise UnsupportedWarehouseVersion(
-                f"TEEHR warehouse version {version} is not in supported range "
-                f"{SUPPORTED_TEEHR_VERSIONS}"
-            )
-        self.teehr_version = version
+        self.teehr_version = _check_version(self._catalog_path, self._version_path)
+        self._conn = _connect(self._catalog_path)
 
     def close(self):
         self._force_close()
@@ -178,11 +380,18 @@ class WarehouseReader:
     # ---- Catalog snapshot ------------------------------------------------
 
     def _freeze_catalog(self) -> Dict[str, str]:
-        """Read ``iceberg_tables`` and return ``{table_name: metadata_location}``.
+        """Return ``{table_name: metadata_location}`` of the ``teehr`` tables.
 
         Called once per public method so all queries within the method see the
-        same Iceberg snapshot.
+        same Iceberg snapshot. Inside a cached query the catalog the cache key
+        was built from is returned; otherwise it comes from a process-level
+        copy that is re-read whenever the catalog file changes.
         """
+        if self._call_catalog is not None:
+            return self._call_catalog
+        return _cached_catalog(self._catalog_path, self._read_catalog)
+
+    def _read_catalog(self) -> Dict[str, str]:
         rows = self._conn.execute(
             "SELECT table_name, metadata_location "
             "FROM cat.iceberg_tables "
@@ -190,6 +399,20 @@ class WarehouseReader:
         ).fetchall()
         return {name: location for name, location in rows}
 
+    def snapshot_token(self) -> str:
+        """Return a token that changes whenever any ``teehr`` table is committed to.
+
+        Every Iceberg commit writes a new metadata file, so the set of
+        ``metadata_location`` values identifies the warehouse snapshot.
+        """
+        return self._snapshot_token(self._freeze_catalog())
+
+    def _snapshot_token(self, catalog: Dict[str, str]) -> str:
+        digest = hashlib.sha1(f"{self.teehr_version}\n".encode())
+        for name in sorted(catalog):
+            digest.update(f"{name}={catalog[name]}\n".encode())
+        return digest.hexdigest()
+
     # ---- Query helper ----------------------------------------------------
 
     def _execute(self, sql: str, params=None):
@@ -222,6 +445,7 @@ class WarehouseReader:
         ).fetchone()
         return row is not None
 
+    @_cached_query("secondary_timeseries")
     def list_configurations_for_run(self, config_name: str) -> List[dict]:
         """Return ``[{"value": "<cfg>-<var>", "label": "<cfg> <var>"}]`` for the run.
 
@@ -253,6 +477,7 @@ class WarehouseReader:
             for cfg, var in rows
         ]
 
+    @_cached_query("location_crosswalks", "secondary_timeseries")
     def list_usgs_locations_for_run(self, config_name: str) -> List[str]:
         """Return the USGS primary_location_ids in the crosswalk for this run.
 
@@ -273,6 +498,7 @@ class WarehouseReader:
         ).fetchall()
         return [r[0] for r in rows]
 
+    @_cached_query("location_crosswalks", "secondary_timeseries")
     def usgs_for_ngen(self, config_name: str, ngen_id: str) -> Optional[str]:
         """Return the USGS id crosswalked to ``ngen_id`` for this run, or None.
 
@@ -294,6 +520,7 @@ class WarehouseReader:
         ).fetchone()
         return row[0] if row else None
 
+    @_cached_query("ngen_metrics")
     def get_metrics_for_location(
         self, config_name: str, usgs_location_id: str
     ) -> List[dict]:
@@ -312,14 +539,7 @@ class WarehouseReader:
         metrics_loc = catalog.get("ngen_metrics")
         if metrics_loc is None:
             return []
-        # Pull the metric columns; ignore timestamp columns that require pytz.
-        metric_cols = [
-            "root_mean_standard_deviation_ratio",
-            "relative_bias",
-            "nash_sutcliffe_efficiency",
-            "kling_gupta_efficiency",
-        ]
-        col_list = ", ".join(metric_cols)
+        col_list = ", ".join(METRIC_COLUMNS)
         rows = self._execute(
             f"SELECT configuration_name, {col_list} "
             f"FROM iceberg_scan('{metrics_loc}') "
@@ -332,13 +552,58 @@ class WarehouseReader:
         # Pivot: rows = [(cfg, metric1_val, metric2_val, ...)] -> per-metric dicts.
         by_cfg = {r[0]: r[1:] for r in rows}
         out = []
-        for i, metric in enumerate(metric_cols):
+        for i, metric in enumerate(METRIC_COLUMNS):
             row = {"metric": metric}
             for cfg, values in by_cfg.items():
                 row[cfg] = values[i]
             out.append(row)
         return out
 
+    @_cached_query("ngen_metrics", "locations")
+    def get_metrics_layer(
+        self, config_name: str, include_geometry: bool = False
+    ) -> Optional[pa.Table]:
+        """Return the ``ngen_metrics`` of every location of a configuration in one scan.
+
+        One row per ``primary_location_id`` (sorted), with the
+        ``METRIC_COLUMNS``; with ``include_geometry``, also ``longitude`` and
+        ``latitude`` of the location (its centroid) from the ``locations``
+        table, null when the location has no geometry. Returns None if the
+        metrics table does not exist.
+        """
+        catalog = self._freeze_catalog()
+        metrics_loc = catalog.get("ngen_metrics")
+        if metrics_loc is None:
+            return None
+        col_list = ", ".join(f"m.{col}" for col in METRIC_COLUMNS)
+        locations_loc = catalog.get("locations") if include_geometry else None
+        if locations_loc is not None:
+            geometry_sql = "l.geometry"
+            join_sql = f"LEFT JOIN iceberg_scan('{locations_loc}') l ON l.id = m.primary_location_id "
+        else:
+            geometry_sql = "NULL::BLOB"
+            join_sql = ""
+        table = self._execute(
+            f"SELECT m.primary_location_id, {col_list}, {geometry_sql} AS geometry "
+            f"FROM iceberg_scan('{metrics_loc}') m "
+            f"{join_sql}"
+            f"WHERE m.configuration_name = ? "
+            f"ORDER BY m.primary_location_id",
+            [config_name],
+        ).to_arrow_table()
+        geometry = table.column("geometry")
+        table = table.drop_columns(["geometry"])
+        if not include_geometry:
+            return table
+        points = shapely.centroid(
+            shapely.from_wkb(np.array(geometry.to_pylist(), dtype=object))
+        )
+        longitude = shapely.get_x(points)
+        latitude = shapely.get_y(points)
+        return table.append_column(
+            "longitude", pa.array(longitude, mask=np.isnan(longitude))
+        ).append_column("latitude", pa.array(latitude, mask=np.isnan(latitude)))
+
     def list_crosswalks(
         self, secondary_prefix: Optional[str] = None
     ) -> List[tuple]:
@@ -365,11 +630,140 @@ class WarehouseReader:
             ).fetchall()
         return list(rows)
 
+    def crosswalk_index(self) -> "CrosswalkIndex":
+        """Return every ``location_crosswalks`` pair as a ``CrosswalkIndex``.
+
+        The pairs and the index's ``snapshot`` come from the same catalog
+        snapshot.
+        """
+        catalog = self._freeze_catalog()
+        xwalk_loc = catalog.get("location_crosswalks")
+        rows = []
+        if xwalk_loc is not None:
+            rows = self._execute(
+                f"SELECT primary_location_id, secondary_location_id "
+                f"FROM iceberg_scan('{xwalk_loc}')"
+            ).fetchall()
+        return CrosswalkIndex.from_pairs(self._snapshot_token(catalog), rows)
+
+    def _secondary_location_ids(self, xwalk_loc: str, usgs_location_id: str) -> List[str]:
+        """Return the secondary ids crosswalked to a primary location."""
+        rows = self._execute(
+            f"SELECT DISTINCT secondary_location_id FROM iceberg_scan('{xwalk_loc}') "
+            f"WHERE primary_location_id = ? ORDER BY secondary_location_id",
+            [usgs_location_id],
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _joined_from_sql(
+        self,
+        catalog: Dict[str, str],
+        config_name: str,
+        variable_name: str,
+        usgs_location_id: Optional[str] = None,
+        start=None,
+        end=None,
+    ) -> Optional[Tuple[str, list]]:
+        """Return the ``FROM`` clause of the primary/secondary join and its parameters.
+
+        ``p`` is the primary (USGS) row and ``s`` the paired secondary row,
+        for one location or, if ``usgs_location_id`` is None, all of them.
+        The crosswalk is resolved to the secondary ids first, and every
+        filter (location, variable, configuration, ``start``/``end``) is
+        applied inside each ``iceberg_scan`` as a constant, so DuckDB can
+        skip data files by their Iceberg column bounds and row groups by
+        their Parquet statistics before joining. Returns None when a table
+        is missing.
+        """
+        pri_loc = catalog.get("primary_timeseries")
+        sec_loc = catalog.get("secondary_timeseries")
+        xwalk_loc = catalog.get("location_crosswalks")
+        if pri_loc is None or sec_loc is None or xwalk_loc is None:
+            return None
+        window, window_params = "", []
+        if start is not None:
+            window += " AND value_time >= ?"
+            window_params.append(start)
+        if end is not None:
+            window += " AND value_time <= ?"
+            window_params.append(end)
+        pri_where, pri_params = "variable_name = ?", [variable_name]
+        xwalk_where, xwalk_params = "TRUE", []
+        sec_where, sec_params = "configuration_name = ? AND variable_name = ?", [config_name, variable_name]
+        if usgs_location_id is not None:
+            secondary_ids = self._secondary_location_ids(xwalk_loc, usgs_location_id)
+            pri_where += " AND location_id = ?"
+            pri_params.append(usgs_location_id)
+            xwalk_where = "primary_location_id = ?"
+            xwalk_params.append(usgs_location_id)
+            if secondary_ids:
+                sec_where += f" AND location_id IN ({', '.join('?' * len(secondary_ids))})"
+                sec_params += secondary_ids
+            else:
+                sec_where += " AND FALSE"
+        # Re-implementation of teehr/evaluation/views/joined_timeseries_view.py
+        # based on teehr 0.6.2. Tracked by the drift integration test.
+        sql = (
+            f"FROM ("
+            f"  SELECT location_id, value_time, variable_name, value "
+            f"  FROM iceberg_scan('{pri_loc}') WHERE {pri_where}{window}"
+            f") p "
+            f"JOIN ("
+            f"  SELECT primary_location_id, secondary_location_id "
+            f"  FROM iceberg_scan('{xwalk_loc}') WHERE {xwalk_where}"
+            f") x ON x.primary_location_id = p.location_id "
+            f"JOIN ("
+            f"  SELECT location_id, value_time, variable_name, value "
+            f"  FROM iceberg_scan('{sec_loc}') WHERE {sec_where}{window}"
+            f") s ON s.location_id = x.secondary_location_id "
+            f" AND s.value_time = p.value_time "
+            f" AND s.variable_name = p.variable_name "
+        )
+        params = pri_params + window_params + xwalk_params + sec_params + window_params
+        return sql, params
+
+    def _joined_timeseries_sql(
+        self,
+        catalog: Dict[str, str],
+        time_expr: str,
+        config_name: str,
+        variable_name: str,
+        usgs_location_id: str,
+        start=None,
+        end=None,
+    ) -> Optional[Tuple[str, list]]:
+        """Return the joined-timeseries query of one location and its parameters.
+
+        ``time_expr`` selects ``p.value_time`` as ``value_time``; see
+        ``_joined_from_sql``. Returns None when a table is missing.
+        """
+        joined = self._joined_from_sql(
+            catalog, config_name, variable_name, usgs_location_id, start=start, end=end
+        )
+        if joined is None:
+            return None
+        from_sql, params = joined
+        sql = (
+            f"SELECT "
+            f"  {time_expr} AS value_time, "
+            f"  p.value AS primary_value, "
+            f"  s.value AS secondary_value "
+            f"{from_sql}"
+            f"ORDER BY p.value_time"
+        )
+        return sql, params
+
+    @_cached_query(*_JOINED_TABLES)
     def get_joined_timeseries(
         self,
         config_name: str,
         variable_name: str,
         usgs_location_id: str,
+        max_points: Optional[int] = None,
+        downsample_method: str = "lttb",
+        series_format: str = "records",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
     ) -> List[dict]:
         """Return paired (USGS, secondary) timeseries for plotting.
 
@@ -381,47 +775,309 @@ class WarehouseReader:
                 {"label": "USGS", "data": [{"x": ts, "y": val}, ...]},
                 {"label": "<cfg>", "data": [...]},
             ]
+
+        With ``max_points`` each series is downsampled (see ``timeseries``)
+        and the union of the kept timestamps is returned for both, so the
+        two series stay paired point-for-point.
+
+        ``series_format="columnar"`` returns each ``data`` as
+        ``{"x": [...], "y": [...]}`` built from the NumPy result columns.
+
+        ``start``/``end`` (inclusive) restrict the series to a time window.
         """
-        catalog = self._freeze_catalog()
-        pri_loc = catalog.get("primary_timeseries")
-        sec_loc = catalog.get("secondary_timeseries")
-        xwalk_loc = catalog.get("location_crosswalks")
-        if pri_loc is None or sec_loc is None or xwalk_loc is None:
-            return []
-        # Re-implementation of teehr/evaluation/views/joined_timeseries_view.py
-        # based on teehr 0.6.2. Tracked by the drift integration test.
-        sql = (
-            f"SELECT "
-            # strftime produces 'YYYY-MM-DD HH:MM:SS' that Plotly parses cleanly.
-            # CAST(TIMESTAMPTZ AS VARCHAR) appends a truncated tz offset like
-            # '-07' (not '-07:00'), which Plotly cannot parse and collapses
-            # the x-axis to today's date.
-            f"  strftime(p.value_time, '%Y-%m-%d %H:%M:%S') AS value_time, "
-            f"  p.value AS primary_value, "
-            f"  s.value AS secondary_value "
-            f"FROM iceberg_scan('{pri_loc}') p "
-            f"JOIN iceberg_scan('{xwalk_loc}') x "
-            f"  ON x.primary_location_id = p.location_id "
-            f"JOIN iceberg_scan('{sec_loc}') s "
-            f"  ON s.location_id = x.secondary_location_id "
-            f" AND s.value_time = p.value_time "
-            f" AND s.variable_name = p.variable_name "
-            f"WHERE p.location_id = ? "
-            f"  AND p.variable_name = ? "
-            f"  AND s.configuration_name = ? "
-            f"ORDER BY p.value_time"
+        # strftime produces 'YYYY-MM-DD HH:MM:SS' that Plotly parses cleanly.
+        # CAST(TIMESTAMPTZ AS VARCHAR) appends a truncated tz offset like
+        # '-07' (not '-07:00'), which Plotly cannot parse and collapses
+        # the x-axis to today's date.
+        query = self._joined_timeseries_sql(
+            self._freeze_catalog(),
+            "strftime(p.value_time, '%Y-%m-%d %H:%M:%S')",
+            config_name,
+            variable_name,
+            usgs_location_id,
+            start=start,
+            end=end,
         )
-        rows = self._execute(
-            sql, [usgs_location_id, variable_name, config_name]
-        ).fetchall()
-        if not rows:
+        if query is None:
+            return []
+        columns = self._execute(*query).fetchnumpy()
+        times = columns["value_time"]
+        primary = columns["primary_value"]
+        secondary = columns["secondary_value"]
+        if len(times) == 0:
             return []
-        primary_data = [{"x": r[0], "y": r[1]} for r in rows]
-        secondary_data = [{"x": r[0], "y": r[2]} for r in rows]
+        if max_points and len(times) > max_points:
+            keep = np.union1d(
+                downsample_indices(primary, max_points, downsample_method),
+                downsample_indices(secondary, max_points, downsample_method),
+            )
+            times, primary, secondary = times[keep], primary[keep], secondary[keep]
         return [
-            {"label": "USGS", "data": primary_data},
+            {"label": "USGS", "data": series_payload(times, primary, series_format)},
             {
-                "label": config_name.replace("_", " ").title(),
-                "data": secondary_data,
+                "label": _series_label(config_name),
+                "data": series_payload(times, secondary, series_format),
             },
         ]
+
+    @_cached_query(*_JOINED_TABLES)
+    def get_joined_timeseries_table(
+        self,
+        config_name: str,
+        variable_name: str,
+        usgs_location_id: str,
+        max_points: Optional[int] = None,
+        downsample_method: str = "lttb",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Optional[pa.Table]:
+        """Return the joined timeseries as an Arrow table, or None when empty.
+
+        The table is in the long form of ``arrow_ipc.series_table`` (series
+        ``USGS`` and the configuration label), built from DuckDB's Arrow
+        result without converting values to Python objects. Downsampling
+        and the ``start``/``end`` window match ``get_joined_timeseries``.
+        """
+        query = self._joined_timeseries_sql(
+            self._freeze_catalog(),
+            "p.value_time",
+            config_name,
+            variable_name,
+            usgs_location_id,
+            start=start,
+            end=end,
+        )
+        if query is None:
+            return None
+        table = self._execute(*query).to_arrow_table()
+        if table.num_rows == 0:
+            return None
+        if max_points and table.num_rows > max_points:
+            keep = np.union1d(
+                downsample_indices(table["primary_value"].to_numpy(), max_points, downsample_method),
+                downsample_indices(table["secondary_value"].to_numpy(), max_points, downsample_method),
+            )
+            table = table.take(keep)
+        return series_table(
+            [
+                ("USGS", table["value_time"], table["primary_value"]),
+                (_series_label(config_name), table["value_time"], table["secondary_value"]),
+            ]
+        )
+
+    @_cached_query(*_JOINED_TABLES)
+    def compute_metrics(
+        self,
+        config_name: str,
+        variable_name: str,
+        usgs_location_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        group_by: Optional[str] = None,
+    ) -> Optional[pa.Table]:
+        """Compute the ``METRIC_COLUMNS`` over a time window, aggregated in DuckDB.
+
+        The metrics are computed from the join of ``get_joined_timeseries``
+        (with the same definitions teehr uses for ``ngen_metrics``) for one
+        location, or for every location when ``usgs_location_id`` is None.
+        ``start``/``end`` (inclusive) restrict the window; ``group_by`` is
+        None, ``"month"`` (``period`` like ``"2020-01"``) or
+        ``"water_year"`` (``period`` is the year the October-September water
+        year ends in); periods are evaluated in UTC.
+
+        Returns a table of ``primary_location_id``, ``period`` (when grouped),
+        ``sample_size`` and the metrics, sorted by location and period, or
+        None when a table is missing. Metrics that are undefined for a group
+        (e.g. a constant observed series) are null.
+
+        Raises:
+            ValueError: ``group_by`` is not one of ``METRIC_PERIODS``.
+        """
+        if group_by is not None and group_by not in METRIC_PERIODS:
+            raise ValueError(f"Unknown metric period {group_by!r}; expected one of {sorted(METRIC_PERIODS)}")
+        joined = self._joined_from_sql(
+            self._freeze_catalog(), config_name, variable_name, usgs_location_id, start=start, end=end
+        )
+        if joined is None:
+            return None
+        from_sql, params = joined
+        keys = ["primary_location_id"]
+        period_sql = ""
+        if group_by is not None:
+            keys.append("period")
+            period_sql = f", {METRIC_PERIODS[group_by]} AS period"
+        key_list = ", ".join(keys)
+        with _utc_time_zone(self._conn):
+            return self._execute(
+                f"WITH j AS ("
+                f"  SELECT p.location_id AS primary_location_id{period_sql}, "
+                f"    p.value::DOUBLE AS o, s.value::DOUBLE AS m "
+                f"  {from_sql}"
+                f") "
+                f"SELECT {key_list}, count(*) AS sample_size, "
+                f"  sqrt(avg((m - o) ^ 2)) / NULLIF(stddev_pop(o), 0) "
+                f"    AS root_mean_standard_deviation_ratio, "
+                f"  (sum(m) - sum(o)) / NULLIF(sum(o), 0) AS relative_bias, "
+                f"  1 - sum((m - o) ^ 2) / NULLIF(var_pop(o) * count(*), 0) "
+                f"    AS nash_sutcliffe_efficiency, "
+                f"  1 - sqrt("
+                f"    (corr(o, m) - 1) ^ 2 "
+                f"    + (stddev_pop(m) / NULLIF(stddev_pop(o), 0) - 1) ^ 2 "
+                f"    + (avg(m) / NULLIF(avg(o), 0) - 1) ^ 2"
+                f"  ) AS kling_gupta_efficiency "
+                f"FROM j "
+                f"GROUP BY {key_list} "
+                f"ORDER BY {key_list}",
+                params,
+            ).to_arrow_table()
+
+
+# ---- Connection pool ----------------------------------------------------------
+
+
+class WarehouseConnectionPool:
+    """A long-lived, initialized DuckDB connection to one warehouse, shared through cursors.
+
+    ``WarehouseReader`` setup (connect, ``LOAD sqlite``/``iceberg``,
+    ``ATTACH``) costs hundreds of milliseconds; a cursor of an initialized
+    connection costs well under one. Each cursor is its own DuckDB
+    connection to the same database, so a reader can use it from its own
+    thread while other readers use theirs.
+
+    The connection is replaced when the catalog or version file changes
+    (e.g. the warehouse was regenerated) or when it fails a health check.
+    A replaced connection is not closed, since readers may still be using
+    its cursors; it is released once they are garbage collected.
+    """
+
+    def __init__(self, warehouse_path):
+        self.warehouse_path = Path(warehouse_path)
+        self._catalog_path = self.warehouse_path / "local" / "local_catalog.db"
+        self._version_path = self.warehouse_path / "local" / "version"
+        self._lock = threading.Lock()
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._stamp = None
+        self._version: Optional[Version] = None
+        self.connects = 0
+
+    def _current_stamp(self) -> tuple:
+        stamp = []
+        for path in (self._catalog_path, self._version_path):
+            try:
+                st = path.stat()
+            except OSError:
+                stamp.append(None)
+                continue
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return tuple(stamp)
+
+    def cursor(self) -> Tuple[duckdb.DuckDBPyConnection, Version]:
+        """Return ``(cursor, teehr_version)``, (re)connecting if needed.
+
+        Raises the same errors as opening a ``WarehouseReader``.
+        """
+        stamp = self._current_stamp()
+        with self._lock:
+            if self._conn is not None and self._stamp == stamp:
+                try:
+                    cursor = self._conn.cursor()
+                    cursor.execute("SELECT 1").fetchall()
+                    return cursor, self._version
+                except duckdb.Error as exc:
+                    logger.info("Reconnecting to TEEHR warehouse %s (%s)", self.warehouse_path, exc)
+            self._conn = None
+            self._version = _check_version(self._catalog_path, self._version_path)
+            self._conn = _connect(self._catalog_path)
+            self._stamp = stamp
+            self.connects += 1
+            return self._conn.cursor(), self._version
+
+    def close(self):
+        """Close the connection (and every cursor handed out from it)."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:  # pragma: no cover
+                    pass
+            self._conn = None
+            self._stamp = None
+
+
+_pools: Dict[str, WarehouseConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(warehouse_path) -> WarehouseConnectionPool:
+    """Return the process-wide connection pool of a warehouse."""
+    key = str(warehouse_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = WarehouseConnectionPool(warehouse_path)
+        return pool
+
+
+def close_connection_pools():
+    """Close and forget every connection pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# ---- Process-level crosswalk cache ------------------------------------------
+
+_crosswalk_indexes: Dict[str, Tuple[tuple, CrosswalkIndex]] = {}
+_crosswalk_lock = threading.Lock()
+
+
+def _catalog_stamp(catalog_path: Path) -> tuple:
+    """``(mtime_ns, size)`` of the catalog and its WAL; every commit changes one of them."""
+    stamp = []
+    for path in (Path(catalog_path), Path(f"{catalog_path}-wal")):
+        try:
+            st = path.stat()
+        except OSError:
+            stamp.append(None)
+            continue
+        stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _is_settled(stamp: tuple) -> bool:
+    now = time.time_ns()
+    return all(part is None or now - part[0] > _RACY_WINDOW_NS for part in stamp)
+
+
+def get_crosswalk_index(warehouse_path) -> CrosswalkIndex:
+    """Return the crosswalk index of the warehouse, built once per snapshot.
+
+    While the catalog file is unchanged the cached index is returned without
+    opening the warehouse. Otherwise a reader is opened to read the snapshot
+    token, and the crosswalk table is only re-read if the snapshot changed.
+
+    Raises:
+        TeehrWarehouseError: the warehouse cannot be opened.
+    """
+    key = str(warehouse_path)
+    stamp = _catalog_stamp(Path(warehouse_path) / "local" / "local_catalog.db")
+    cached = _crosswalk_indexes.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with WarehouseReader.from_pool(get_connection_pool(warehouse_path)) as reader:
+        if cached is not None and cached[1].snapshot == reader.snapshot_token():
+            index = cached[1]
+        else:
+            index = reader.crosswalk_index()
+    if _is_settled(stamp):
+        with _crosswalk_lock:
+            _crosswalk_indexes[key] = (stamp, index)
+    return index
+
+
+def clear_crosswalk_indexes():
+    """Drop every cached crosswalk index (they are rebuilt on next use)."""
+    with _crosswalk_lock:
+        _crosswalk_indexes.clear()
@@ -0,0 +1,182 @@
+"""Server-side helpers shared by the time-series endpoints.
+
+Multi-decade hourly runs produce hundreds of thousands of points per series,
+far more than a chart can show. ``downsample`` reduces a series to at most
+``max_points`` points while keeping its visual shape:
+
+* ``lttb`` -- Largest-Triangle-Three-Buckets (Steinarsson, 2013). Keeps the
+  point of each bucket that forms the largest triangle with the previously
+  kept point and the next bucket's mean, which preserves peaks and troughs.
+* ``minmax`` -- keeps the minimum and maximum of each bucket. Fully
+  vectorized and guarantees every extreme survives, at the cost of a less
+  smooth line.
+
+Points are treated as equally spaced, which holds for ngen, t-route and
+TEEHR output.
+
+``series_payload`` builds the chart data of one series either as the
+default list of ``{"x": t, "y": v}`` records or, with ``format=columnar``,
+as ``{"x": [...], "y": [...]}`` arrays converted straight from NumPy/pandas
+without a Python object per point.
+
+``parse_time_window`` reads the ``start``/``end`` query parameters that
+restrict a series to a time window; readers push the window down to the
+storage layer.
+"""
+
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+SERIES_FORMATS = ("records", "columnar")
+
+
+def parse_max_points(value) -> Optional[int]:
+    """Parse a ``max_points`` query value; missing or invalid values mean "no limit"."""
+    try:
+        max_points = int(value)
+    except (TypeError, ValueError):
+        return None
+    return max_points if max_points > 0 else None
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        timestamp = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    if timestamp is pd.NaT:
+        return None
+    if timestamp.tzinfo is not None:
+        # Run outputs are naive UTC times.
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def parse_time_window(start, end) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse ``start``/``end`` query values (ISO 8601) into naive UTC datetimes.
+
+    Missing or invalid values mean "unbounded" on that side. Both bounds
+    are inclusive.
+    """
+    return _parse_time(start), _parse_time(end)
+
+
+def parse_series_format(value) -> str:
+    """Parse a ``format`` query value; anything but ``columnar`` means ``records``."""
+    return "columnar" if value == "columnar" else "records"
+
+
+def _as_list(values) -> list:
+    if isinstance(values, list):
+        return values
+    return values.tolist()
+
+
+def series_payload(times, values, series_format: str = "records"):
+    """Return the ``data`` of one chart series in the requested format.
+
+    ``times`` and ``values`` may be lists, NumPy arrays or pandas objects.
+    """
+    if series_format == "columnar":
+        return {"x": _as_list(times), "y": _as_list(values)}
+    return [{"x": t, "y": v} for t, v in zip(_as_list(times), _as_list(values))]
+
+
+def _endpoint_indices(n: int, max_points: int) -> np.ndarray:
+    """Indices kept when ``max_points`` is too small for a method's buckets."""
+    return np.array([0, n - 1][:max_points], dtype=np.int64)
+
+
+def lttb_indices(y, max_points: int) -> np.ndarray:
+    """Return the sorted indices LTTB keeps out of ``y``.
+
+    Bucket means are computed in one pass with ``np.add.reduceat``; the
+    per-bucket triangle areas are vectorized, leaving only the (inherently
+    sequential) walk over buckets in Python.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return _endpoint_indices(n, max_points)
+    finite = np.isfinite(y)
+    y_filled = np.where(finite, y, 0.0)
+    n_buckets = max_points - 2
+    # Interior points 1..n-2 split into n_buckets contiguous buckets.
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+    sums = np.add.reduceat(y_filled[: n - 1], edges[:-1])
+    counts = np.add.reduceat(finite[: n - 1].astype(np.int64), edges[:-1])
+    mean_y = sums / np.maximum(counts, 1)
+    mean_x = (edges[:-1] + edges[1:] - 1) / 2.0
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < n_buckets:
+            cx, cy = mean_x[b + 1], mean_y[b + 1]
+        else:
+            cx, cy = n - 1, y_filled[n - 1]
+        ay = y_filled[a]
+        xs = np.arange(lo, hi, dtype=np.float64)
+        area = np.abs((a - cx) * (y_filled[lo:hi] - ay) - (a - xs) * (cy - ay))
+        area[~finite[lo:hi]] = -1.0
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def minmax_indices(y, max_points: int) -> np.ndarray:
+    """Return the sorted indices of each bucket's minimum and maximum (plus the endpoints)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 4:
+        return _endpoint_indices(n, max_points)
+    n_buckets = (max_points - 2) // 2
+    bucket = (np.arange(n) * n_buckets) // n
+    starts = np.searchsorted(bucket, np.arange(n_buckets), side="left")
+    ends = np.searchsorted(bucket, np.arange(n_buckets), side="right")
+    # lexsort orders by bucket, then by value; NaNs go to the end of the min
+    # ordering and the start of the max ordering so they are never picked
+    # while a finite value exists in the bucket.
+    by_min = np.lexsort((np.where(np.isnan(y), np.inf, y), bucket))
+    by_max = np.lexsort((np.where(np.isnan(y), -np.inf, y), bucket))
+    keep = np.concatenate(([0, n - 1], by_min[starts], by_max[ends - 1]))
+    return np.unique(keep)
+
+
+def downsample_indices(y, max_points: Optional[int], method: str = "lttb") -> Optional[np.ndarray]:
+    """Return the indices to keep, or None when no reduction is needed."""
+    if not max_points or len(y) <= max_points:
+        return None
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    return lttb_indices(y, max_points)
+
+
+def take(values: Sequence, indices: Optional[np.ndarray]) -> list:
+    """Return ``values`` restricted to ``indices`` as a list (all of it when None)."""
+    if indices is None:
+        return list(values)
+    return np.asarray(values)[indices].tolist()
+
+
+def downsample(
+    times: Sequence, values: Sequence, max_points: Optional[int], method: str = "lttb"
+) -> Tuple[list, list]:
+    """Reduce a ``(times, values)`` series to at most ``max_points`` points."""
+    indices = downsample_indices(values, max_points, method)
+    if indices is None:
+        return times, values
+    return take(times, indices), take(values, indices)
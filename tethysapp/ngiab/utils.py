@@ -2,12 +2,31 @@ import os
 import json
 import re
 import logging
+import numpy as np
 import pandas as pd
 import glob
+import threading
+import time
 import duckdb
 import xarray as xr
-from collections import defaultdict
-
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import ByteBudgetLRU
+from .output_store import (
+    CATCHMENT_STORE_NAME,
+    TIME_FORMAT,
+    TROUTE_STORE_NAME,
+    catchment_store_variables,
+    is_store_current,
+    read_catchment_store,
+    read_troute_store,
+    write_catchment_store,
+    write_troute_store,
+)
+from .geopackage import read_layer
+from .output_index import get_output_index
+from .registry import get_registry
 from .teehr_warehouse import (
     ConfigurationNotFound,
     TeehrWarehouseError,
@@ -16,10 +35,33 @@ from .teehr_warehouse import (
     WarehouseMountMirrorBroken,
     WarehouseReader,
     WarehouseUnreachable,
+    get_connection_pool,
+    get_crosswalk_index,
 )
+from .validators import combine_validators, stat_validator
+from .vector_tiles import build_pmtiles
 
 logger = logging.getLogger(__name__)
 
+# Worker threads used by read_time_series_batch.
+BATCH_READ_WORKERS = int(os.environ.get("NGIAB_BATCH_READ_WORKERS", "8"))
+
+# Most (distinct) ids one getTimeSeriesBatch request may ask for.
+BATCH_MAX_IDS = int(os.environ.get("NGIAB_BATCH_MAX_IDS", "500"))
+
+# Memory budget of the loaded t-route DataFrames kept between requests.
+TROUTE_CACHE_BYTES = int(os.environ.get("NGIAB_TROUTE_CACHE_BYTES", str(2 * 1024**3)))
+_troute_cache = ByteBudgetLRU(TROUTE_CACHE_BYTES)
+
+# Runs whose TrouteReader (and open NetCDF chunks) is kept between requests.
+TROUTE_MAX_READERS = int(os.environ.get("NGIAB_TROUTE_MAX_READERS", "8"))
+
+# Build a run's t-route store in the background the first time a reach is read.
+TROUTE_STORE_AUTOBUILD = os.environ.get("NGIAB_TROUTE_STORE_AUTOBUILD", "").lower() in ("1", "true", "yes")
+
+# Seconds before a failed background t-route store build is attempted again.
+TROUTE_STORE_RETRY_SECONDS = float(os.environ.get("NGIAB_TROUTE_STORE_RETRY_SECONDS", "300"))
+
 # ---- TEEHR warehouse integration helpers ----------------------------------
 
 
@@ -49,8 +91,7 @@ def _resolve_configuration_name(model_run_id):
 
     Returns the configuration name or None if it cannot be resolved.
     """
-    model_runs = _get_list_model_runs().get("model_runs", [])
-    entry = next((m for m in model_runs if m.get("id") == model_run_id), None)
+    entry = _get_model_run_entry(model_run_id)
     if entry is None:
         return None
     persisted = entry.get("teehr_configuration_name")
@@ -64,7 +105,7 @@ def _resolve_configuration_name(model_run_id):
     if not warehouse:
         return None
     try:
-        with WarehouseReader(warehouse) as reader:
+        with WarehouseReader.from_pool(get_connection_pool(warehouse)) as reader:
             if reader.configuration_exists(derived):
                 return derived
     except TeehrWarehouseError:
@@ -84,19 +125,23 @@ def _detect_legacy_teehr_layout(model_run_id):
 def _open_warehouse():
     """Open a WarehouseReader from TEEHR_WAREHOUSE_PATH. Returns None if unset.
 
+    The reader runs on a cursor of the warehouse's shared connection pool.
     Caller is responsible for closing (or using a `with` block on the result).
     """
     path = _teehr_warehouse_path()
     if not path:
         return None
-    return WarehouseReader(path)
+    return WarehouseReader.from_pool(get_connection_pool(path))
 
 def _get_conf_file():
     home_path = os.environ.get("HOME", "/tmp")
     conf_base_path = os.environ.get("VISUALIZER_CONF", f"{home_path}/ngiab_visualizer/ngiab_visualizer.json")
-    print(conf_base_path)
     return conf_base_path
 
+def _get_model_run_registry():
+    """Return the cached registry for the current ``VISUALIZER_CONF`` file."""
+    return get_registry(_get_conf_file(), "model_runs")
+
 def _get_list_model_runs():
     """
         {
@@ -113,12 +158,11 @@ def _get_list_model_runs():
             ]
         }
     """
-    print("get_list_model_runs")
-    conf_file = _get_conf_file()
-    
-    with open(conf_file, "r") as f:
-        data = json.load(f)
-    return data
+    return _get_model_run_registry().data()
+
+def _get_model_run_entry(model_run_id):
+    """Return the registry entry for ``model_run_id`` (O(1) lookup), or None."""
+    return _get_model_run_registry().get(model_run_id)
 
 def get_model_runs_selectable():
     
@@ -143,12 +187,10 @@ def _find_gpkg_file_path(model_path):
     return gpkg_files[0]
 
 def _get_model_run_path_by_id(id):
-    model_runs = _get_list_model_runs()
-    for model_run in model_runs["model_runs"]:
-
-        if model_run["id"] == id:
-            return model_run["path"]
-    return None
+    model_run = _get_model_run_entry(id)
+    if model_run is None:
+        return None
+    return model_run["path"]
 
 def find_gpkg_file_path(model_run_id):
     gpkg_model_run_path = None
@@ -160,31 +202,46 @@ def find_gpkg_file_path(model_run_id):
     return gpkg_model_run_path
 
 
+# Nexus attributes used by the map; the other columns of the layer are not read.
+NEXUS_COLUMNS = ("id", "toid", "type")
+
+
+def read_nexus_layer(gpkg_file_path, bbox=None, bbox_crs=None):
+    """Read the ``NEXUS_COLUMNS`` of a GeoPackage's nexus layer, optionally within ``bbox``."""
+    return read_layer(gpkg_file_path, "nexus", columns=NEXUS_COLUMNS, bbox=bbox, bbox_crs=bbox_crs)
+
+
+def _crosswalk_index():
+    """Return the warehouse crosswalk index, or None if no warehouse is configured.
+
+    Raises:
+        TeehrWarehouseError: the warehouse cannot be opened.
+    """
+    path = _teehr_warehouse_path()
+    if not path:
+        return None
+    return get_crosswalk_index(path)
+
 
 def append_ngen_usgs_column(gdf, model_id):
     """Add ``ngen_usgs`` column mapping nexus IDs on the map to USGS gauge IDs.
 
-    Reads the warehouse's ``location_crosswalks`` table filtered to ngen entries.
-    Rows with no matching USGS gauge get ``"none"``. Warehouse unreachable or
-    absent → every row gets ``"none"``.
+    Uses the warehouse's ``location_crosswalks`` ngen entries. Rows with no
+    matching USGS gauge get ``"none"``. Warehouse unreachable or absent →
+    every row gets ``"none"``.
     """
     try:
-        reader = _open_warehouse()
-        if reader is None:
-            gdf["ngen_usgs"] = "none"
-            return gdf
-        with reader:
-            crosswalks = reader.list_crosswalks(secondary_prefix="ngen")
+        index = _crosswalk_index()
     except TeehrWarehouseError as exc:
         logger.info("append_ngen_usgs_column: warehouse unavailable (%s)", exc)
+        index = None
+    if index is None:
         gdf["ngen_usgs"] = "none"
         return gdf
     # secondary is "ngen-XXXXX"; the gpkg nexus IDs are "nex-XXXXX". Map accordingly.
-    nex_to_usgs = {
-        secondary.replace("ngen-", "nex-", 1): primary
-        for primary, secondary in crosswalks
-    }
-    gdf["ngen_usgs"] = gdf["id"].apply(lambda x: nex_to_usgs.get(x, "none"))
+    gdf["ngen_usgs"] = gdf["id"].map(
+        lambda x: index.primary_for(str(x).replace("nex-", "ngen-", 1)) or "none"
+    )
     return gdf
 
 
@@ -192,22 +249,18 @@ def append_nwm_usgs_column(gdf, model_id):
     """Add ``nwm_usgs`` column mapping USGS gauge IDs to NWM reach IDs.
 
     Depends on ``ngen_usgs`` already being present on the GeoDataFrame (call
-    ``append_ngen_usgs_column`` first). Reads the warehouse's
-    ``location_crosswalks`` filtered to ``nwm30`` entries.
+    ``append_ngen_usgs_column`` first). Uses the warehouse's
+    ``location_crosswalks`` nwm30 entries.
     """
     try:
-        reader = _open_warehouse()
-        if reader is None:
-            gdf["nwm_usgs"] = "none"
-            return gdf
-        with reader:
-            crosswalks = reader.list_crosswalks(secondary_prefix="nwm30")
+        index = _crosswalk_index()
     except TeehrWarehouseError as exc:
         logger.info("append_nwm_usgs_column: warehouse unavailable (%s)", exc)
+        index = None
+    if index is None:
         gdf["nwm_usgs"] = "none"
         return gdf
-    usgs_to_nwm = {primary: secondary for primary, secondary in crosswalks}
-    gdf["nwm_usgs"] = gdf["ngen_usgs"].apply(lambda x: usgs_to_nwm.get(x, "none"))
+    gdf["nwm_usgs"] = gdf["ngen_usgs"].map(lambda x: index.secondary_for(x, "nwm30") or "none")
     return gdf
 
 
@@ -219,10 +272,69 @@ def _get_base_troute_output(model_id):
     return base_output_path
 
 
+def _read_troute_file(file_type, file_path):
+    if file_type == "CSV":
+        # Read the CSV file into a DataFrame
+        return pd.read_csv(file_path)
+    # Read the NetCDF file and convert to a DataFrame
+    with xr.open_dataset(file_path) as ds:
+        return ds.to_dataframe()
+
+
+def _load_troute_df(file_type, file_paths):
+    """Load and concatenate the t-route output chunks ``file_paths`` (read in parallel)."""
+    with ThreadPoolExecutor(max_workers=min(BATCH_READ_WORKERS, len(file_paths))) as pool:
+        frames = list(pool.map(lambda path: _read_troute_file(file_type, path), file_paths))
+    if len(frames) == 1:
+        df = frames[0]
+    elif file_type == "CSV":
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = pd.concat(frames).sort_index()
+    # Replace NaN values with -9999
+    df.fillna(-9999, inplace=True)
+    return df
+
+
+def _troute_files_version(file_paths):
+    """Return the ``(path, st_mtime_ns, st_size)`` of every output chunk."""
+    version = []
+    for file_path in file_paths:
+        st = os.stat(file_path)
+        version.append((file_path, st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+
+def _get_cached_troute_df(model_id, file_type, file_paths):
+    """Return the t-route DataFrame of ``file_paths`` through the process-level LRU cache.
+
+    Entries are keyed by run and output type and versioned by every chunk's
+    path, mtime and size. The returned DataFrame is shared between requests:
+    do not modify it.
+    """
+    df = _troute_cache.get_or_load(
+        (model_id, file_type),
+        _troute_files_version(file_paths),
+        lambda: _load_troute_df(file_type, file_paths),
+        sizeof=lambda df: int(df.memory_usage(index=True, deep=True).sum()),
+    )
+    logger.debug("t-route cache: %s", _troute_cache.stats())
+    return df
+
+
+def troute_cache_stats():
+    """Return the hit/miss/eviction counters of the t-route DataFrame cache."""
+    return _troute_cache.stats()
+
+
 def get_troute_df(model_id):
     """
-    Load the first T-Route data file from the workspace as a DataFrame.
+    Load the T-Route output of a run as a DataFrame.
     Supports both CSV and NetCDF (.nc) files, and replaces NaN values with -9999.
+    When t-route wrote several output chunks, all of them are concatenated.
+
+    Loaded DataFrames are cached per run (see ``NGIAB_TROUTE_CACHE_BYTES``)
+    and shared between requests, so callers must not modify them.
     """
     base_output_path = _get_base_troute_output(model_id)
 
@@ -230,32 +342,327 @@ def get_troute_df(model_id):
     file_types = [("CSV", "*.csv"), ("NetCDF", "*.nc")]
 
     for file_type, pattern in file_types:
-        files = glob.glob(os.path.join(base_output_path, pattern))
+        files = sorted(glob.glob(os.path.join(base_output_path, pattern)))
 
         if files:
-            file_path = files[0]
-            print(f"Found {file_type} file: {file_path}")
-
             try:
-                if file_type == "CSV":
-                    # Read the CSV file into a DataFrame
-                    df = pd.read_csv(file_path)
-                elif file_type == "NetCDF":
-                    # Read the NetCDF file and convert to a DataFrame
-                    ds = xr.open_dataset(file_path)
-                    df = ds.to_dataframe()
-
-                # Replace NaN values with -9999
-                df.fillna(-9999, inplace=True)
-                return df
+                return _get_cached_troute_df(model_id, file_type, files)
             except Exception as e:
-                print(f"Error reading {file_type} file '{file_path}': {e}")
+                print(f"Error reading {file_type} files in '{base_output_path}': {e}")
 
     # If no files found, return None
     print(f"No supported T-Route output files found in {base_output_path}.")
     return None
 
 
+def _find_troute_files(model_id):
+    """Return ``(file_type, paths)`` of the run's t-route output chunks (CSV first), or None."""
+    base_output_path = _get_base_troute_output(model_id)
+    for file_type, pattern in (("CSV", "*.csv"), ("NetCDF", "*.nc")):
+        files = sorted(glob.glob(os.path.join(base_output_path, pattern)))
+        if files:
+            return file_type, files
+    return None
+
+
+def _select_troute_chunk(ds, feature_id, variable, start, end):
+    """Load one reach of one NetCDF chunk, or None if the chunk cannot contain it."""
+    if feature_id not in ds.indexes["feature_id"]:
+        return None
+    times = ds.indexes["time"]
+    if len(times) == 0:
+        return None
+    if (start is not None and times.max() < start) or (end is not None and times.min() > end):
+        return None
+    series = ds[variable].sel(feature_id=feature_id)
+    if start is not None or end is not None:
+        series = series.sel(time=slice(start, end))
+    return series.load()
+
+
+class TrouteReader:
+    """Per-feature access to a run's t-route output.
+
+    t-route writes one file per output chunk on long runs; all chunks of the
+    run are read as one time-concatenated dataset. NetCDF chunks are opened
+    lazily: ``series`` selects one reach (and time window) with ``sel`` in
+    each chunk that can contain it, on a thread pool, and reads only those
+    slabs from disk, so per-reach latency does not grow with the network
+    size. CSV output is parsed once into the cached DataFrame of
+    ``get_troute_df`` plus an index of each feature's row positions, so a
+    reach is a positional take instead of a scan of the whole table.
+
+    When the run's feature-major t-route store (see ``output_store``) is
+    built and newer than every chunk, ``series`` reads from it instead.
+
+    ``variables`` and ``has_feature`` only read metadata: the NetCDF header
+    and ``feature_id`` coordinate, or the CSV header and ``featureID``
+    column. Feature ids are kept as a sorted array and looked up by binary
+    search, so populating the variable dropdown does not load the outputs.
+
+    Missing values are returned as -9999, as in ``get_troute_df``.
+
+    Requests use a reader in a ``with`` block. Once ``retire`` is called
+    (the reader was replaced or evicted by ``get_troute_reader``), its
+    NetCDF chunks are closed as soon as no ``with`` block holds it.
+    """
+
+    def __init__(self, model_id, file_type, file_paths, store_path=None):
+        self.model_id = model_id
+        self.file_type = file_type
+        self.file_paths = list(file_paths)
+        self.store_path = store_path
+        self._datasets = None
+        self._datasets_lock = threading.Lock()
+        self._variables = None
+        self._feature_ids = None
+        self._users = 0
+        self._retired = False
+        self._users_lock = threading.Lock()
+
+    def _open_datasets(self):
+        """Return the NetCDF chunks as lazily loaded datasets, opening them on first use."""
+        if self._datasets is None:
+            with self._datasets_lock:
+                if self._datasets is None:
+                    self._datasets = [xr.open_dataset(path) for path in self.file_paths]
+        return self._datasets
+
+    def close(self):
+        """Close the NetCDF chunks (they are reopened if the reader is used again)."""
+        with self._datasets_lock:
+            datasets, self._datasets = self._datasets, None
+        for ds in datasets or ():
+            ds.close()
+
+    def __enter__(self):
+        with self._users_lock:
+            self._users += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._users_lock:
+            self._users -= 1
+            close = self._retired and not self._users
+        if close:
+            self.close()
+
+    def retire(self):
+        """Close the reader now, or when the last ``with`` block using it exits."""
+        with self._users_lock:
+            self._retired = True
+            close = not self._users
+        if close:
+            self.close()
+
+    def _csv(self):
+        """Return the cached ``(df, {feature_id: row positions})`` of a CSV output."""
+        df = _get_cached_troute_df(self.model_id, self.file_type, self.file_paths)
+        rows = _troute_cache.get_or_load(
+            (self.model_id, self.file_type, "rows"),
+            _troute_files_version(self.file_paths),
+            lambda: df.groupby("featureID").indices,
+            sizeof=lambda rows: sum(positions.nbytes for positions in rows.values()),
+        )
+        return df, rows
+
+    def variables(self):
+        """Return the names of the per-feature output variables (from metadata only).
+
+        Only ``(feature_id, time)`` variables are time series (and kept in
+        the t-route store); per-reach constants are left out.
+        """
+        if self._variables is None:
+            if self.file_type == "NetCDF":
+                self._variables = [
+                    name
+                    for name, var in self._open_datasets()[0].data_vars.items()
+                    if set(var.dims) == {"feature_id", "time"}
+                ]
+            else:
+                header = pd.read_csv(self.file_paths[0], nrows=0).columns
+                self._variables = header.tolist()[3:]  # Skip featureID, Type and time
+        return self._variables
+
+    def feature_ids(self):
+        """Return the sorted array of the output's reach ids (over all chunks)."""
+        if self._feature_ids is None:
+            if self.file_type == "NetCDF":
+                ids = [ds["feature_id"].values for ds in self._open_datasets()]
+            else:
+                ids = [
+                    pd.read_csv(path, usecols=["featureID"])["featureID"].to_numpy()
+                    for path in self.file_paths
+                ]
+            self._feature_ids = np.unique(np.concatenate(ids))
+        return self._feature_ids
+
+    def has_feature(self, feature_id):
+        """Return True if the output has a reach ``feature_id`` (binary search)."""
+        ids = self.feature_ids()
+        position = np.searchsorted(ids, int(feature_id))
+        return bool(position < len(ids) and ids[position] == int(feature_id))
+
+    def has_store(self):
+        """Return True if the run's t-route store is built and current."""
+        return self.store_path is not None and is_store_current(
+            self.store_path, os.path.dirname(self.file_paths[0]), *self.file_paths
+        )
+
+    def series(self, feature_id, variable, start=None, end=None):
+        """Return ``(times, values)`` of one reach and variable, in time order.
+
+        ``start``/``end`` (inclusive datetimes) restrict the series to a time
+        window. Times repeated at chunk boundaries are kept once. Raises
+        ``KeyError`` for unknown features or variables.
+        """
+        feature_id = int(feature_id)
+        if self.has_store():
+            if not self.has_feature(feature_id):
+                raise KeyError(feature_id)
+            return read_troute_store(self.store_path, feature_id, variable, start, end)
+        if TROUTE_STORE_AUTOBUILD and self.store_path is not None:
+            schedule_troute_store_build(self.model_id)
+        if self.file_type == "NetCDF":
+            datasets = self._open_datasets()
+            with ThreadPoolExecutor(
+                max_workers=min(BATCH_READ_WORKERS, len(datasets))
+            ) as pool:
+                chunks = [
+                    chunk
+                    for chunk in pool.map(
+                        lambda ds: _select_troute_chunk(ds, feature_id, variable, start, end),
+                        datasets,
+                    )
+                    if chunk is not None
+                ]
+            if not chunks and not self.has_feature(feature_id):
+                raise KeyError(feature_id)
+            times = pd.DatetimeIndex(
+                np.concatenate([chunk["time"].values for chunk in chunks]) if chunks else []
+            )
+            values = pd.Series(
+                np.concatenate([chunk.values for chunk in chunks]) if chunks else [], dtype=float
+            )
+            order = np.argsort(times.values, kind="stable")
+            times, values = times[order], values.iloc[order]
+            keep = ~times.duplicated()
+            return (
+                times[keep].strftime(TIME_FORMAT).tolist(),
+                values[keep].fillna(-9999).tolist(),
+            )
+        df, rows = self._csv()
+        df = df.iloc[rows[feature_id]]
+        if start is not None or end is not None:
+            df = df[_in_window(df["current_time"], start, end)]
+        if len(self.file_paths) > 1:
+            df = df.sort_values("current_time", kind="stable").drop_duplicates("current_time")
+        return df["current_time"].astype(str).tolist(), df[variable].tolist()
+
+
+# model_id -> (((path, st_mtime_ns, st_size), ...), TrouteReader), least recently used first
+_troute_readers = OrderedDict()
+_troute_readers_lock = threading.Lock()
+
+
+def get_troute_reader(model_id):
+    """Return the (cached) ``TrouteReader`` of a run, or None if it has no t-route output.
+
+    A reader is reused until an output chunk is added, removed or changed.
+    At most ``TROUTE_MAX_READERS`` runs keep a reader (least recently used
+    first out). Replaced and evicted readers are retired: requests may
+    still be reading from them, and they close their files once the last
+    ``with`` block using them exits.
+    """
+    found = _find_troute_files(model_id)
+    if found is None:
+        return None
+    file_type, file_paths = found
+    version = _troute_files_version(file_paths)
+    with _troute_readers_lock:
+        cached = _troute_readers.get(model_id)
+        if cached is not None and cached[0] == version:
+            _troute_readers.move_to_end(model_id)
+            return cached[1]
+        store_path = os.path.join(get_run_cache_dir(model_id), TROUTE_STORE_NAME)
+        reader = TrouteReader(model_id, file_type, file_paths, store_path)
+        retired = [cached[1]] if cached is not None else []
+        _troute_readers[model_id] = (version, reader)
+        _troute_readers.move_to_end(model_id)
+        while len(_troute_readers) > TROUTE_MAX_READERS:
+            retired.append(_troute_readers.popitem(last=False)[1][1])
+    for old_reader in retired:
+        old_reader.retire()
+    return reader
+
+
+def build_troute_store(model_id):
+    """Convert the run's t-route outputs into its feature-major Parquet store.
+
+    Returns the store path, or None if the run has no t-route outputs.
+    """
+    found = _find_troute_files(model_id)
+    if found is None:
+        return None
+    file_type, file_paths = found
+    store_path = os.path.join(get_run_cache_dir(model_id), TROUTE_STORE_NAME)
+    return write_troute_store(file_type, file_paths, store_path)
+
+
+# Runs whose background t-route store build is running.
+_troute_store_builds = set()
+# Run id -> time.monotonic() of its last failed build, for the retry throttle.
+_troute_store_failures = {}
+_troute_store_builds_lock = threading.Lock()
+
+
+def schedule_troute_store_build(model_id):
+    """Build the run's t-route store on a background thread.
+
+    Returns the thread, or None when a build for the run is already running
+    or failed less than ``TROUTE_STORE_RETRY_SECONDS`` ago.
+    """
+    with _troute_store_builds_lock:
+        if model_id in _troute_store_builds:
+            return None
+        failed_at = _troute_store_failures.get(model_id)
+        if failed_at is not None and time.monotonic() - failed_at < TROUTE_STORE_RETRY_SECONDS:
+            return None
+        _troute_store_builds.add(model_id)
+
+    def _build():
+        failed = False
+        try:
+            build_troute_store(model_id)
+        except Exception:
+            logger.exception("Building the t-route store of %s failed", model_id)
+            failed = True
+        finally:
+            with _troute_store_builds_lock:
+                _troute_store_builds.discard(model_id)
+                if failed:
+                    _troute_store_failures[model_id] = time.monotonic()
+                else:
+                    _troute_store_failures.pop(model_id, None)
+
+    thread = threading.Thread(target=_build, name=f"troute-store-{model_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def read_troute_series(model_id, feature_id, variable, start=None, end=None):
+    """Return ``(times, values)`` of one t-route feature and variable, or None.
+
+    See ``TrouteReader.series``; returns None when the run has no t-route
+    output.
+    """
+    reader = get_troute_reader(model_id)
+    if reader is None:
+        return None
+    with reader:
+        return reader.series(feature_id, variable, start, end)
+
+
 def get_base_output(model_id):
     base_path = _get_model_run_path_by_id(model_id)
     # print(base_path)
@@ -265,10 +672,279 @@ def get_base_output(model_id):
     )
     return base_output_path
 
+def get_run_cache_dir(model_id):
+    """Return the directory holding derived data (stores, caches) for a run.
+
+    Defaults to ``<run path>/.ngiab_cache``. Set ``NGIAB_CACHE_DIR`` to keep
+    derived data outside the run directories (e.g. when they are mounted
+    read-only); each run then gets ``$NGIAB_CACHE_DIR/<model_id>``.
+    """
+    cache_root = os.environ.get("NGIAB_CACHE_DIR")
+    if cache_root:
+        return os.path.join(cache_root, model_id)
+    return os.path.join(_get_model_run_path_by_id(model_id), ".ngiab_cache")
+
+
+def get_catchment_store_path(model_id):
+    """Return the run's catchment Parquet store if it is current, else None."""
+    store_path = os.path.join(get_run_cache_dir(model_id), CATCHMENT_STORE_NAME)
+    if is_store_current(store_path, get_base_output(model_id)):
+        return store_path
+    return None
+
+
+def build_catchment_store(model_id):
+    """Convert the run's ``cat-*.csv`` outputs into its catchment Parquet store.
+
+    Returns the store path, or None if the run has no catchment outputs.
+    """
+    store_path = os.path.join(get_run_cache_dir(model_id), CATCHMENT_STORE_NAME)
+    return write_catchment_store(get_base_output(model_id), store_path)
+
+
+HYDROFABRIC_PMTILES_NAME = "hydrofabric.pmtiles"
+
+
+def get_run_pmtiles_file(model_id):
+    """Return where the run's hydrofabric PMTiles archive lives (None for unknown runs)."""
+    if _get_model_run_path_by_id(model_id) is None:
+        return None
+    return os.path.join(get_run_cache_dir(model_id), HYDROFABRIC_PMTILES_NAME)
+
+
+def get_run_pmtiles_path(model_id):
+    """Return the run's hydrofabric PMTiles archive if it is newer than its GeoPackage, else None."""
+    pmtiles_path = get_run_pmtiles_file(model_id)
+    if pmtiles_path is None:
+        return None
+    try:
+        gpkg_file_path = find_gpkg_file_path(model_id)
+    except IndexError:
+        return None
+    if is_store_current(pmtiles_path, gpkg_file_path):
+        return pmtiles_path
+    return None
+
+
+def build_run_pmtiles(model_id):
+    """Render the run's GeoPackage layers into its PMTiles archive.
+
+    Returns the archive path, or None if the run has no GeoPackage or no
+    hydrofabric layers in it.
+    """
+    pmtiles_path = get_run_pmtiles_file(model_id)
+    if pmtiles_path is None:
+        return None
+    try:
+        gpkg_file_path = find_gpkg_file_path(model_id)
+    except IndexError:
+        return None
+    if build_pmtiles(gpkg_file_path, pmtiles_path) is None:
+        return None
+    return pmtiles_path
+
+
+def _in_window(time_col, start=None, end=None):
+    """Boolean mask of the ``TIME_FORMAT`` strings in ``time_col`` within ``[start, end]``.
+
+    The format is fixed-width, so string comparison orders like time and
+    the column does not need to be parsed.
+    """
+    time_col = time_col.astype(str).str.strip()
+    mask = pd.Series(True, index=time_col.index)
+    if start is not None:
+        mask &= time_col >= start.strftime(TIME_FORMAT)
+    if end is not None:
+        mask &= time_col <= end.strftime(TIME_FORMAT)
+    return mask
+
+
+def read_catchment_series(model_id, catchment_id, variable_column=None, start=None, end=None):
+    """Return ``(variables, variable, times, values)`` for one catchment.
+
+    Reads the run's catchment store when one is built and current; otherwise
+    parses ``<catchment_id>.csv``. ``variable`` defaults to the first output
+    variable when ``variable_column`` is None. ``start``/``end`` (inclusive
+    datetimes, see ``timeseries.parse_time_window``) restrict the series to
+    a time window.
+    """
+    return _read_catchment_series_at(
+        get_base_output(model_id),
+        get_catchment_store_path(model_id),
+        catchment_id,
+        variable_column,
+        start,
+        end,
+    )
+
+
+def _read_catchment_series_at(
+    base_output_path, store_path, catchment_id, variable_column=None, start=None, end=None
+):
+    """``read_catchment_series`` with the run's paths already resolved.
+
+    The store is only read when it is newer than the catchment's CSV: a
+    rerun may rewrite ``<catchment_id>.csv`` in place without changing the
+    output directory's mtime.
+    """
+    catchment_output_file_path = os.path.join(
+        base_output_path,
+        "{}.csv".format(catchment_id),
+    )
+    if store_path is not None and (
+        is_store_current(store_path, catchment_output_file_path)
+        or not os.path.exists(catchment_output_file_path)
+    ):
+        list_variables = catchment_store_variables(store_path)
+        variable = variable_column if variable_column else list_variables[0]
+        times, values = read_catchment_store(store_path, catchment_id, variable, start, end)
+        return list_variables, variable, times, values
+
+    df = pd.read_csv(catchment_output_file_path)
+    list_variables = df.columns.tolist()[2:]  # remove time and timestep
+    if start is not None or end is not None:
+        df = df[_in_window(df.iloc[:, 1], start, end)]
+    time_col = df.iloc[:, 1]
+    variable = variable_column if variable_column else list_variables[0]
+    return list_variables, variable, time_col.tolist(), df[variable].tolist()
+
+
+def read_nexus_series(model_id, nexus_id, start=None, end=None):
+    """Return ``(times, streamflow)`` for one nexus, or None if it has no output file.
+
+    ``start``/``end`` restrict the series to a time window (inclusive).
+    """
+    return _read_nexus_series_at(get_base_output(model_id), nexus_id, start, end)
+
+
+def _read_nexus_series_at(base_output_path, nexus_id, start=None, end=None):
+    nexus_output_file_path = os.path.join(
+        base_output_path,
+        "{}_output.csv".format(nexus_id),
+    )
+    if not os.path.exists(nexus_output_file_path):
+        return None
+    df = pd.read_csv(nexus_output_file_path, header=None)
+    if start is not None or end is not None:
+        df = df[_in_window(df.iloc[:, 1], start, end)]
+    return df.iloc[:, 1].tolist(), df.iloc[:, 2].tolist()
+
+
+def read_time_series_batch(model_id, ids, variable_column=None, start=None, end=None):
+    """Read the series for many catchments (``cat-*``) and nexuses (``nex-*``) at once.
+
+    The run's output path and catchment store are resolved once and the
+    files are read concurrently on a thread pool (the CSV and Parquet
+    readers release the GIL while parsing).
+
+    Returns ``(series, missing)`` where ``series`` is a list of
+    ``(id, variable, times, values)`` in the order of ``ids`` and ``missing``
+    lists the ids that have no readable output (within the window, when
+    ``start``/``end`` restrict every series to one; both are inclusive).
+    Repeated ids are read and returned once.
+    """
+    ids = list(dict.fromkeys(ids))
+    base_output_path = get_base_output(model_id)
+    store_path = get_catchment_store_path(model_id)
+
+    def _read(feature_id):
+        try:
+            if feature_id.startswith("nex-"):
+                result = _read_nexus_series_at(base_output_path, feature_id, start, end)
+                if result is None:
+                    return None
+                return (feature_id, "Streamflow") + result
+            _, variable, times, values = _read_catchment_series_at(
+                base_output_path, store_path, feature_id, variable_column, start, end
+            )
+            if not times:
+                return None
+            return feature_id, variable, times, values
+        except (OSError, KeyError, ValueError) as exc:
+            logger.info("read_time_series_batch: cannot read %s (%s)", feature_id, exc)
+            return None
+
+    if not ids:
+        return [], []
+    with ThreadPoolExecutor(max_workers=min(BATCH_READ_WORKERS, len(ids))) as pool:
+        results = list(pool.map(_read, ids))
+    series = [r for r in results if r is not None]
+    missing = [feature_id for feature_id, r in zip(ids, results) if r is None]
+    return series, missing
+
+
+# ---- Cache validators (see validators.py) -----------------------------------
+
+
+def get_run_output_validator(model_id, file_names=()):
+    """Validator over a run's output listing, its catchment store and ``file_names``.
+
+    ``file_names`` are relative to the run's ngen output directory. Returns
+    None for unknown runs.
+    """
+    base_path = _get_model_run_path_by_id(model_id)
+    if base_path is None:
+        return None
+    base_output_path = get_base_output(model_id)
+    return stat_validator(
+        [
+            os.path.join(base_path, "config", "realization.json"),
+            base_output_path,
+            os.path.join(get_run_cache_dir(model_id), CATCHMENT_STORE_NAME),
+        ]
+        + [os.path.join(base_output_path, name) for name in file_names]
+    )
+
+
+def get_troute_validator(model_id):
+    """Validator over a run's t-route output files, or None for unknown runs."""
+    if _get_model_run_path_by_id(model_id) is None:
+        return None
+    troute_path = _get_base_troute_output(model_id)
+    files = sorted(
+        glob.glob(os.path.join(troute_path, "*.csv")) + glob.glob(os.path.join(troute_path, "*.nc"))
+    )
+    return stat_validator([troute_path] + files)
+
+
+def get_teehr_validator():
+    """Validator over the TEEHR warehouse snapshot, or None if no warehouse is configured.
+
+    An unreadable warehouse still yields a validator (keyed by the error),
+    so responses change once it becomes readable again.
+    """
+    warehouse = _teehr_warehouse_path()
+    if not warehouse:
+        return None
+    try:
+        with WarehouseReader.from_pool(get_connection_pool(warehouse)) as reader:
+            token = reader.snapshot_token()
+    except TeehrWarehouseError as exc:
+        token = f"unavailable:{type(exc).__name__}"
+    catalog_path = os.path.join(warehouse, "local", "local_catalog.db")
+    return combine_validators((token, None), stat_validator([catalog_path]))
+
+
+def get_run_entry_validator(model_id):
+    """Validator over the run registry file and the run's legacy TEEHR output."""
+    paths = [_get_conf_file()]
+    model_path = _get_model_run_path_by_id(model_id)
+    if model_path is not None:
+        paths.append(os.path.join(model_path, "teehr", "metrics.csv"))
+    return stat_validator(paths)
+
+
+# realization.json path -> ((st_mtime_ns, st_size), output_root)
+_output_root_cache = {}
+
+
 def get_output_path(base_path):
     """
     Retrieve the value of the 'output_root' key from a JSON file.
 
+    The value is cached per file and re-read only when the file's mtime or
+    size changes.
+
     Args:
     json_filepath (str): The file path of the JSON file.
 
@@ -281,9 +957,16 @@ def get_output_path(base_path):
     )
 
     try:
+        st = os.stat(realizations_output_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _output_root_cache.get(realizations_output_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
         with open(realizations_output_path, "r") as file:
             data = json.load(file)
-        return data.get("output_root", None)
+        output_root = data.get("output_root", None)
+        _output_root_cache[realizations_output_path] = (stamp, output_root)
+        return output_root
     except FileNotFoundError:
         print(f"Error: The file {realizations_output_path} does not exist.")
         return None
@@ -295,33 +978,6 @@ def get_output_path(base_path):
         return None
 
 
-def _list_prefixed_csv_files(directory, prefix):
-    """
-    List all CSV files in a specified directory that start with a given prefix.
-
-    Args:
-    directory (str): The directory to search for files.
-    prefix (str): The prefix the file names should start with.
-
-    Returns:
-    list: A list of filenames (str) that match the criteria.
-    """
-    # Check if the directory exists
-    if not os.path.exists(directory):
-        print("The specified directory does not exist.")
-        return []
-
-    # List all files in the directory
-    files = os.listdir(directory)
-
-    # Filter files to find those that are CSVs and start with the given prefix
-    csv_files = [
-        file for file in files if file.startswith(prefix) and file.endswith(".csv")
-    ]
-
-    return csv_files
-
-
 def getCatchmentsIds(model_run_id):
     """
     Get a list of catchment IDs.
@@ -333,27 +989,18 @@ def getCatchmentsIds(model_run_id):
         list: A list of dictionaries containing catchment IDs and labels.
               Each dictionary has the keys 'value' and 'label'.
     """
-    output_base_file = get_base_output(model_run_id)
-    catchment_prefix = "cat-"
-    catchment_ids_list = _list_prefixed_csv_files(output_base_file, catchment_prefix)
     return [
-        {"value": id.split(".csv")[0], "label": id.split(".csv")[0]}
-        for id in catchment_ids_list
+        {"value": id, "label": id}
+        for id in getCatchmentsList(model_run_id)
     ]
 
 
 def getCatchmentsList(model_id):
-    output_base_file = get_base_output(model_id)
-    catchment_prefix = "cat-"
-    catchment_ids_list = _list_prefixed_csv_files(output_base_file, catchment_prefix)
-    return [id.split(".csv")[0] for id in catchment_ids_list]
+    return get_output_index(get_base_output(model_id)).catchment_ids
 
 
 def getNexusList(model_id):
-    output_base_file = get_base_output(model_id)
-    nexus_prefix = "nex-"
-    nexus_ids_list = _list_prefixed_csv_files(output_base_file, nexus_prefix)
-    return [id.split(".csv")[0].split("_output")[0] for id in nexus_ids_list]
+    return get_output_index(get_base_output(model_id)).nexus_ids
 
 
 def getNexusIDs(model_run_id):
@@ -366,60 +1013,24 @@ def getNexusIDs(model_run_id):
     Returns:
         list: A list of dictionaries containing the Nexus IDs. Each dictionary has a 'value' and 'label' key.
     """
-    output_base_file = get_base_output(model_run_id)
-    nexus_prefix = "nex-"
-    nexus_ids_list = _list_prefixed_csv_files(output_base_file, nexus_prefix)
     return [
-        {"value": id.split("_output.csv")[0], "label": id.split("_output.csv")[0]}
-        for id in nexus_ids_list
+        {"value": id, "label": id}
+        for id in getNexusList(model_run_id)
     ]
 
 
 def get_usgs_from_ngen_id(model_run_id, nexus_id):
     """Return the USGS gauge id for a map nexus id (e.g. ``nex-485431``), or None.
 
-    Reads the warehouse's ``location_crosswalks`` table. Warehouse unreachable →
-    returns None.
+    Looks the id up in the warehouse's crosswalk index. Warehouse unreachable
+    → returns None.
     """
     corrected = nexus_id.replace("nex-", "ngen-", 1) if nexus_id.startswith("nex-") else nexus_id
     try:
-        reader = _open_warehouse()
-        if reader is None:
-            return None
-        with reader:
-            crosswalks = reader.list_crosswalks(secondary_prefix="ngen")
+        index = _crosswalk_index()
     except TeehrWarehouseError as exc:
         logger.info("get_usgs_from_ngen_id: warehouse unavailable (%s)", exc)
         return None
-    for primary, secondary in crosswalks:
-        if secondary == corrected:
-            return primary
-    return None
-
-
-def get_troute_vars(df):
-    # Check if the DataFrame has a MultiIndex
-    if isinstance(df.index, pd.MultiIndex):
-        # For multi-indexed DataFrame
-        list_variables = df.columns.tolist()  # All columns are variables
-    else:
-        # For flat-indexed DataFrame
-        list_variables = df.columns.tolist()[
-            3:
-        ]  # Skip the first three columns (featureID, Type, time)
-
-    # Format the variables for display
-    variables = [
-        {"value": variable, "label": variable.lower()} for variable in list_variables
-    ]
-    return variables
-
-
-def check_troute_id(df, id):
-    if isinstance(df.index, pd.MultiIndex):
-        # Multi-indexed DataFrame: Check in the `feature_id` level
-        return int(id) in df.index.get_level_values("feature_id")
-    else:
-        # Flat-indexed DataFrame: Check in the `featureID` column
-        return int(id) in df["featureID"].values
-
+    if index is None:
+        return None
+    return index.primary_for(corrected)
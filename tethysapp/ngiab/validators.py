@@ -0,0 +1,58 @@
+"""Cache validators for responses derived from run outputs.
+
+A validator is a ``(token, last_modified)`` pair: ``token`` changes whenever
+the data a response is built from changes, and ``last_modified`` is the
+newest source modification time (a timezone-aware ``datetime``, or None when
+unknown). The controllers turn them into ``ETag``/``Last-Modified`` headers
+and answer matching conditional requests with ``304 Not Modified``.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+Validator = Tuple[str, Optional[datetime]]
+
+
+def _from_ns(mtime_ns: int) -> datetime:
+    return datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc)
+
+
+def stat_validator(paths: Iterable[str]) -> Optional[Validator]:
+    """Return a validator over the ``(mtime, size)`` of ``paths``.
+
+    Missing paths are part of the token (so creating them changes it), but
+    None is returned when none of them exist.
+    """
+    parts = []
+    latest = None
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            parts.append(f"{path}:-")
+            continue
+        parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+        latest = st.st_mtime_ns if latest is None else max(latest, st.st_mtime_ns)
+    if latest is None:
+        return None
+    token = hashlib.sha1("\n".join(parts).encode()).hexdigest()
+    return token, _from_ns(latest)
+
+
+def combine_validators(*validators: Optional[Validator]) -> Optional[Validator]:
+    """Combine validators into one; None when all of them are None."""
+    if all(validator is None for validator in validators):
+        return None
+    digest = hashlib.sha1()
+    latest = None
+    for validator in validators:
+        if validator is None:
+            digest.update(b"-\n")
+            continue
+        token, last_modified = validator
+        digest.update(f"{token}\n".encode())
+        if last_modified is not None:
+            latest = last_modified if latest is None else max(latest, last_modified)
+    return digest.hexdigest(), latest
@@ -0,0 +1,303 @@
+"""Mapbox Vector Tiles of a run's hydrofabric layers.
+
+``render_tile`` reads only the features of one GeoPackage layer that fall in
+a tile (through the GeoPackage's R-tree index), clips them to the tile plus
+a small buffer, simplifies them to the tile's resolution (so low zooms stay
+small) and encodes them as an MVT (https://github.com/mapbox/vector-tile-spec,
+version 2) with ``mapbox_vector_tile``.
+
+Rendered tiles are cached on disk under the run's cache directory by
+``cached_tile``, keyed by a token of the GeoPackage they were built from.
+``build_pmtiles`` renders every tile of a run up to a zoom level into a
+single PMTiles archive instead, for maps served without a tile endpoint.
+"""
+
+import glob
+import math
+import os
+import shutil
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import geopandas as gpd
+import mapbox_vector_tile
+import numpy as np
+import pyogrio
+import shapely
+from pmtiles.tile import zxy_to_tileid
+from shapely.geometry import box
+
+from .geopackage import read_layer
+from .pmtiles import write_pmtiles
+
+# Layers of the NextGen hydrofabric GeoPackage that can be tiled.
+TILE_LAYERS = ("nexus", "divides", "flowpaths")
+# Attributes kept in tiles, per layer: the ids the map filters and links on.
+TILE_COLUMNS = {
+    "nexus": ["id", "toid", "type"],
+    "divides": ["divide_id", "id", "toid", "type", "areasqkm"],
+    "flowpaths": ["id", "toid", "order", "lengthkm"],
+}
+TILE_MIME = "application/vnd.mapbox-vector-tile"
+EXTENT = 4096
+# Tile units kept around each tile so lines and fills join without seams.
+BUFFER = 64
+MAX_ZOOM = 22
+# Douglas-Peucker tolerance in tile units: geometry detail below it is not visible.
+SIMPLIFY_TOLERANCE = 1.0
+# Layer names in PMTiles archives: divides and flowpaths use the names of the
+# CONUS hydrofabric archive, so the map's layer styles apply to both.
+PMTILES_LAYERS = {"divides": "conus_divides", "flowpaths": "conus_flowpaths", "nexus": "nexus"}
+PMTILES_MAX_ZOOM = 12
+
+_WEB_MERCATOR = "EPSG:3857"
+_ORIGIN = math.pi * 6378137.0
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    """Return True if ``z/x/y`` addresses an existing tile."""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return the Web Mercator ``(minx, miny, maxx, maxy)`` of tile ``z/x/y`` (XYZ scheme)."""
+    size = 2 * _ORIGIN / 2**z
+    minx = -_ORIGIN + x * size
+    maxy = _ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+# -- encoding ---------------------------------------------------------------
+
+
+def _single_type(geometry):
+    """Return a geometry that MVT can encode: one type, no GeometryCollection.
+
+    clip_by_rect can split a geometry into mixed parts; the parts of the
+    first part's type are kept.
+    """
+    if geometry.geom_type != "GeometryCollection":
+        return geometry
+    parts = [part for part in geometry.geoms if not part.is_empty]
+    if not parts:
+        return None
+    return shapely.union_all([part for part in parts if part.geom_type == parts[0].geom_type])
+
+
+def encode_tile(layers: Dict[str, Iterable[Tuple[object, Dict]]]) -> bytes:
+    """Encode ``{layer name: [(geometry, properties), ...]}`` as an MVT tile.
+
+    Geometries are in integer tile coordinates (y down). Features whose
+    geometry is empty are skipped; properties that are None are omitted.
+    """
+    return mapbox_vector_tile.encode(
+        [
+            {
+                "name": name,
+                "features": [{"geometry": geometry, "properties": properties} for geometry, properties in features],
+            }
+            for name, features in layers.items()
+        ],
+        default_options={"extents": EXTENT, "y_coord_down": True},
+    )
+
+
+# -- rendering --------------------------------------------------------------
+
+
+def _to_tile_coords(gdf: gpd.GeoDataFrame, bounds) -> gpd.GeoSeries:
+    minx, miny, maxx, maxy = bounds
+    scale_x = EXTENT / (maxx - minx)
+    scale_y = EXTENT / (maxy - miny)
+
+    def affine(coords):
+        out = np.empty_like(coords)
+        out[:, 0] = (coords[:, 0] - minx) * scale_x
+        out[:, 1] = (maxy - coords[:, 1]) * scale_y
+        return out
+
+    return gpd.GeoSeries(shapely.transform(gdf.geometry.values, affine), index=gdf.index)
+
+
+def _prepare_geometries(geometries: gpd.GeoSeries) -> np.ndarray:
+    """Clip, simplify and snap tile-coordinate geometries to the integer grid."""
+    clipped = shapely.clip_by_rect(geometries.values, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+    lines_or_polygons = shapely.get_type_id(clipped) >= 1
+    clipped[lines_or_polygons] = shapely.simplify(clipped[lines_or_polygons], SIMPLIFY_TOLERANCE)
+    return shapely.set_precision(clipped, 1.0)
+
+
+def _properties(row: dict) -> dict:
+    row = {key: value.item() if isinstance(value, np.generic) else value for key, value in row.items()}
+    return {key: value for key, value in row.items() if not (isinstance(value, float) and math.isnan(value))}
+
+
+def load_layer(gpkg_path: str, layer: str, bounds=None) -> gpd.GeoDataFrame:
+    """Read the ``TILE_COLUMNS`` of a GeoPackage layer in Web Mercator.
+
+    Only the features within the Web Mercator ``bounds`` are read if given.
+    """
+    gdf = read_layer(gpkg_path, layer, columns=TILE_COLUMNS.get(layer), bbox=bounds, bbox_crs=_WEB_MERCATOR)
+    return gdf[gdf.geometry.notna()].to_crs(_WEB_MERCATOR)
+
+
+def _buffered_bounds(z: int, x: int, y: int):
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    margin = (maxx - minx) * BUFFER / EXTENT
+    return minx - margin, miny - margin, maxx + margin, maxy + margin
+
+
+def tile_features(gdf: gpd.GeoDataFrame, z: int, x: int, y: int) -> List[Tuple[object, Dict]]:
+    """Return the ``(geometry, properties)`` of a Web Mercator layer in tile ``z/x/y``.
+
+    Geometries are in integer tile coordinates, clipped and simplified.
+    """
+    hits = gdf.sindex.query(box(*_buffered_bounds(z, x, y)))
+    if not len(hits):
+        return []
+    gdf = gdf.iloc[np.sort(hits)]
+    geometries = _prepare_geometries(_to_tile_coords(gdf, tile_bounds(z, x, y)))
+    attributes = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+    geometries = [_single_type(geometry) if geometry is not None else None for geometry in geometries]
+    return [
+        (geometry, _properties(row))
+        for geometry, row in zip(geometries, attributes)
+        if geometry is not None and not geometry.is_empty
+    ]
+
+
+def render_tile(gpkg_path: str, layer: str, z: int, x: int, y: int) -> bytes:
+    """Render one layer of a GeoPackage as the MVT tile ``z/x/y``.
+
+    Returns an empty tile (``b""``) when no feature falls in it.
+    """
+    gdf = load_layer(gpkg_path, layer, _buffered_bounds(z, x, y))
+    features = tile_features(gdf, z, x, y) if not gdf.empty else []
+    if not features:
+        return b""
+    return encode_tile({layer: features})
+
+
+def _tile_range(bounds, z: int) -> Tuple[range, range]:
+    """Return the x and y ranges of the tiles at zoom ``z`` covering Web Mercator ``bounds``."""
+    size = 2 * _ORIGIN / 2**z
+    last = 2**z - 1
+
+    def index(value):
+        return min(max(int(math.floor(value / size)), 0), last)
+
+    minx, miny, maxx, maxy = bounds
+    return (
+        range(index(minx + _ORIGIN), index(maxx + _ORIGIN) + 1),
+        range(index(_ORIGIN - maxy), index(_ORIGIN - miny) + 1),
+    )
+
+
+def _field_type(dtype) -> str:
+    if dtype.kind == "b":
+        return "Boolean"
+    if dtype.kind in "iuf":
+        return "Number"
+    return "String"
+
+
+def build_pmtiles(
+    gpkg_path: str,
+    pmtiles_path: str,
+    min_zoom: int = 0,
+    max_zoom: int = PMTILES_MAX_ZOOM,
+) -> Optional[int]:
+    """Render the hydrofabric layers of a GeoPackage into a PMTiles archive.
+
+    Each tile holds every layer (named as in ``PMTILES_LAYERS``) that has
+    features in it; a tile is only rendered if its parent had features.
+    Returns the number of tiles written, or None if the GeoPackage has none
+    of the layers (or no tile has features) and no archive was written.
+    """
+    available = set(pyogrio.list_layers(gpkg_path)[:, 0])
+    layers = {
+        name: load_layer(gpkg_path, layer)
+        for layer, name in PMTILES_LAYERS.items()
+        if layer in available
+    }
+    layers = {name: gdf for name, gdf in layers.items() if not gdf.empty}
+    if not layers:
+        return None
+    bounds = np.array([gdf.total_bounds for gdf in layers.values()])
+    merc_bounds = (*bounds[:, :2].min(axis=0), *bounds[:, 2:].max(axis=0))
+
+    def tiles():
+        # Zoom by zoom, each in tile id order, so tiles stream to the archive in order.
+        xs, ys = _tile_range(merc_bounds, min_zoom)
+        level = [(x, y) for x in xs for y in ys]
+        for z in range(min_zoom, max_zoom + 1):
+            rendered = []
+            for x, y in sorted(level, key=lambda xy: zxy_to_tileid(z, *xy)):
+                features = {name: tile_features(gdf, z, x, y) for name, gdf in layers.items()}
+                features = {name: layer_features for name, layer_features in features.items() if layer_features}
+                if features:
+                    rendered.append((x, y))
+                    yield z, x, y, encode_tile(features)
+            level = [(2 * x + dx, 2 * y + dy) for x, y in rendered for dx in (0, 1) for dy in (0, 1)]
+
+    lonlat = gpd.GeoSeries([box(*merc_bounds)], crs=_WEB_MERCATOR).to_crs("EPSG:4326").total_bounds
+    metadata = {
+        "name": os.path.splitext(os.path.basename(gpkg_path))[0],
+        "format": "pbf",
+        "vector_layers": [
+            {
+                "id": name,
+                "fields": {
+                    column: _field_type(dtype)
+                    for column, dtype in gdf.dtypes.items()
+                    if column != gdf.geometry.name
+                },
+                "minzoom": min_zoom,
+                "maxzoom": max_zoom,
+            }
+            for name, gdf in layers.items()
+        ],
+    }
+    return write_pmtiles(pmtiles_path, tiles(), metadata, tuple(lonlat), min_zoom, max_zoom) or None
+
+
+# -- disk cache -------------------------------------------------------------
+
+
+def _tile_cache_root(cache_dir: str, token: str) -> str:
+    return os.path.join(cache_dir, f"tiles-{token}")
+
+
+def cached_tile(
+    cache_dir: str,
+    token: str,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    render: Callable[[], bytes],
+) -> bytes:
+    """Return the cached tile ``layer/z/x/y`` built at ``token``, rendering it on a miss.
+
+    Tiles of older tokens are removed when the first tile of a new token is
+    written. Failing to write the cache is not an error.
+    """
+    root = _tile_cache_root(cache_dir, token)
+    path = os.path.join(root, layer, str(z), str(x), f"{y}.pbf")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    tile = render()
+    try:
+        if not os.path.isdir(root):
+            for stale in glob.glob(os.path.join(glob.escape(cache_dir), "tiles-*")):
+                shutil.rmtree(stale, ignore_errors=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return tile